@@ -0,0 +1,108 @@
+"""
+Screenshot annotation cost for a synthetic 2,000-element tree.
+
+    python benchmarks/annotation.py [-e 2000] [-n 10]
+
+Compares the per-element PIL drawing the builder used to do with AnnotationRenderer,
+cold (first step: font and label bitmaps rasterised) and warm (caches filled).
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.mac.annotation import COLOR_PALETTE, AnnotationRenderer
+from src.mac.element import MacElementNode
+
+
+def synthetic_tree(elements: int, seed: int = 0) -> MacElementNode:
+    rng = random.Random(seed)
+    root = MacElementNode(role='AXWindow', identifier='window', attributes={}, is_visible=True, app_pid=0, on_screen=True)
+    parents = [root]
+    for index in range(elements):
+        x, y = rng.uniform(0, 0.95), rng.uniform(0, 0.95)
+        node = MacElementNode(
+            role='AXButton',
+            identifier=f'element-{index}',
+            attributes={'position': (x, y), 'size': (rng.uniform(0.005, 0.05), rng.uniform(0.005, 0.03))},
+            is_visible=True,
+            app_pid=0,
+            on_screen=True,
+            highlight_index=index,
+        )
+        parent = rng.choice(parents)
+        node.parent = parent
+        parent.children.append(node)
+        parents.append(node)
+    return root
+
+
+def naive_annotate(screenshot: Image.Image, root: MacElementNode) -> Image.Image:
+    """The previous implementation: recursive walk, new font, one draw call per box and label"""
+    annotated = screenshot.copy()
+    draw = ImageDraw.Draw(annotated)
+    width, height = screenshot.size
+    font = ImageFont.load_default().font_variant(size=16)
+
+    def process(node):
+        if node.on_screen and node.highlight_index is not None:
+            x, y = node.attributes['position']
+            w, h = node.attributes['size']
+            x, y, w, h = x * width, y * height, w * width, h * height
+            color = COLOR_PALETTE[node.highlight_index % len(COLOR_PALETTE)]
+            draw.rectangle([x, y, x + w, y + h], width=1, outline=color)
+            draw.textbbox((0, 0), str(node.highlight_index), font=font)
+            draw.text((x, y), str(node.highlight_index), fill=color, font=font)
+        for child in node.children:
+            process(child)
+
+    process(root)
+    return annotated
+
+
+def timed(fn, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, default=2000)
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.elements * 4))
+    screenshot = Image.new('RGB', (1512, 982), (240, 240, 240))
+    root = synthetic_tree(args.elements)
+
+    naive_ms = timed(lambda: naive_annotate(screenshot, root), args.iterations)
+
+    def cold():
+        renderer = AnnotationRenderer()
+        renderer.render(screenshot, *renderer.collect_boxes(root))
+
+    cold_ms = timed(cold, args.iterations)
+    renderer = AnnotationRenderer()
+    renderer.render(screenshot, *renderer.collect_boxes(root))
+    warm_ms = timed(lambda: renderer.render(screenshot, *renderer.collect_boxes(root)), args.iterations)
+    collect_ms = timed(lambda: renderer.collect_boxes(root), args.iterations)
+
+    print(f'{args.elements} elements on {screenshot.width}x{screenshot.height}, median of {args.iterations}')
+    print(f'{"per-element PIL drawing":<32}{naive_ms:>10.1f} ms')
+    print(f'{"renderer, cold caches":<32}{cold_ms:>10.1f} ms')
+    print(f'{"renderer, warm caches":<32}{warm_ms:>10.1f} ms  (of which tree walk {collect_ms:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
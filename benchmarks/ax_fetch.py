@@ -0,0 +1,104 @@
+"""
+Accessibility round trips per tree build, batched vs one attribute at a time.
+
+    python benchmarks/ax_fetch.py                  # synthetic app on FakeAXBackend
+    python benchmarks/ax_fetch.py -e 5000 -l 0.0002
+    python benchmarks/ax_fetch.py -p 1234          # a running app (macOS)
+
+`latency` is slept per fake round trip to stand in for accessibility IPC.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from src.mac.ax_backend import FakeAXBackend, FakeAXElement, SystemAXBackend
+from src.mac.capture import FakeCapture
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.tree import MacUITreeBuilder
+
+ROLES = [
+    ('AXButton', ['AXPress']),
+    ('AXStaticText', []),
+    ('AXTextField', ['AXSetValue', 'AXConfirm']),
+    ('AXCheckBox', ['AXPress']),
+    ('AXImage', []),
+]
+
+
+def synthetic_app(elements: int, seed: int = 0) -> FakeAXElement:
+    """An application whose main window holds `elements` nested elements laid out on a 1512x982 screen"""
+    rng = random.Random(seed)
+    window = FakeAXElement('AXWindow', Title='Window', Position=(40, 40), Size=(1400, 900))
+    groups = [window]
+    for index in range(elements):
+        parent = rng.choice(groups)
+        if rng.random() < 0.2:
+            element = FakeAXElement('AXGroup', Position=(60, 60), Size=(1300, 800))
+            groups.append(element)
+        else:
+            role, actions = rng.choice(ROLES)
+            element = FakeAXElement(
+                role,
+                actions=actions,
+                Title=f'{role[2:]} {index}',
+                Enabled=True,
+                Position=(rng.uniform(60, 1300), rng.uniform(60, 880)),
+                Size=(rng.uniform(20, 120), rng.uniform(14, 30)),
+            )
+        parent.append(element)
+    return FakeAXElement('AXApplication', MainWindow=window, Windows=[window])
+
+
+def timed_build(builder: MacUITreeBuilder, pid: int, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        asyncio.run(builder.build_tree(pid))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), builder.last_build_stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, default=1000)
+    parser.add_argument('-l', '--latency', type=float, default=0.0001, help='Seconds per fake round trip')
+    parser.add_argument('-p', '--pid', type=int, help='Build the tree of this running app instead')
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.pid:
+        pid = args.pid
+        backends = {'batched': SystemAXBackend(batch=True), 'per attribute': SystemAXBackend(batch=False)}
+    else:
+        pid = 1
+        app = {pid: synthetic_app(args.elements)}
+        backends = {
+            'batched': FakeAXBackend(app, latency=args.latency, batch=True),
+            'per attribute': FakeAXBackend(app, latency=args.latency, batch=False),
+        }
+
+    print(f'median of {args.iterations}')
+    print(f'{"fetch":<16}{"build ms":>10}{"AX calls":>10}{"elements":>10}')
+    for label, backend in backends.items():
+        builder = MacUITreeBuilder(
+            ax_backend=backend,
+            capture_backend=FakeCapture([Image.new('RGB', (756, 491))]),
+            incremental=False,
+            geometry=None if args.pid else FixedScreenGeometry(),
+        )
+        builder.capture_screenshot()
+        build_ms, stats = timed_build(builder, pid, args.iterations)
+        print(f'{label:<16}{build_ms:>10.1f}{stats.calls:>10}{stats.elements:>10}')
+
+
+if __name__ == '__main__':
+    main()
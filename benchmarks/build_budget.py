@@ -0,0 +1,56 @@
+"""
+Tree build latency with and without a time or node budget.
+
+    python benchmarks/build_budget.py [-e 20000] [-l 0.0002] [-d 0.25 1.0] [-m 500 2000]
+
+Builds the synthetic app from benchmarks/ax_fetch.py on FakeAXBackend, sleeping `latency`
+per round trip to stand in for accessibility IPC. For each budget it reports the build
+time, the nodes kept, the elements left unread and the highlighted (clickable) elements.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+
+
+def run(app, latency: float, iterations: int, deadline=None, max_nodes=None):
+    timings = []
+    for _ in range(iterations):
+        builder = make_builder(app)
+        builder.ax.latency = latency
+        builder.build_deadline, builder.max_nodes = deadline, max_nodes
+        start = time.perf_counter()
+        asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), builder.highlight_index, builder.last_crawl_stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, default=20000)
+    parser.add_argument('-l', '--latency', type=float, default=0.0002, help='Seconds per fake round trip')
+    parser.add_argument('-d', '--deadlines', type=float, nargs='+', default=[0.25, 1.0])
+    parser.add_argument('-m', '--max-nodes', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    app = synthetic_app(args.elements)
+    print(f'{"budget":>14}{"build ms":>10}{"nodes":>8}{"skipped":>9}{"highlighted":>13}  truncated')
+    budgets = [('none', {})]
+    budgets += [(f'{deadline:g} s', dict(deadline=deadline)) for deadline in args.deadlines]
+    budgets += [(f'{nodes} nodes', dict(max_nodes=nodes)) for nodes in args.max_nodes]
+    for label, budget in budgets:
+        build_ms, highlighted, stats = run(app, args.latency, args.iterations, **budget)
+        print(f'{label:>14}{build_ms:>10.0f}{stats.emitted:>8}{stats.skipped:>9}{highlighted:>13}  {stats.truncated}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Screenshot capture cost per backend.
+
+    python benchmarks/capture.py                   # pyautogui vs Quartz (macOS)
+    python benchmarks/capture.py -f fixtures/      # replay PNG fixtures (any OS)
+
+On macOS the window-only mode is timed on the centre quarter of the screen.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mac.capture import FakeCapture, PyAutoGUICapture, QuartzCapture
+from src.mac.frames import frame_fingerprint
+
+
+def timed(fn, iterations: int):
+    timings = []
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-f', '--fixtures', help='Directory of PNG frames to replay with FakeCapture')
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        cases = {'fake (fixtures)': (FakeCapture(args.fixtures), None)}
+    else:
+        window = (0.25, 0.25, 0.5, 0.5)
+        cases = {
+            'pyautogui + thumbnail': (PyAutoGUICapture(), None),
+            'quartz nominal': (QuartzCapture(), None),
+            'quartz window only': (QuartzCapture(), window),
+        }
+
+    print(f'median of {args.iterations}')
+    print(f'{"backend":<26}{"capture ms":>12}{"fingerprint ms":>18}{"size":>12}')
+    for label, (backend, window) in cases.items():
+        capture_ms, frame = timed(lambda: backend.capture(window), args.iterations)
+        fingerprint_ms, _ = timed(lambda: frame_fingerprint(frame), args.iterations)
+        print(f'{label:<26}{capture_ms:>12.1f}{fingerprint_ms:>18.1f}{f"{frame.width}x{frame.height}":>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+UI-state tokens per step with full element lists vs delta state messages.
+
+    python benchmarks/delta_ui_state.py                      # synthetic run
+    python benchmarks/delta_ui_state.py -d runs/tree_dumps   # trees recorded with Agent(tree_snapshot_dir=...)
+
+The synthetic run edits a 150-element app between steps (benchmarks/incremental_tree.py's
+mutate), leaving the screen as it was on a share of steps. Tokens are estimated at three
+characters each, as MessageManager does for models without a tokenizer. In delta mode the
+baseline list is part of every request but only changes on full steps; on the others it is
+a cacheable prompt prefix, so "uncached" counts it on full steps only.
+"""
+import argparse
+import asyncio
+import random
+import re
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.incremental_tree import mutate
+from benchmarks.node_memory import make_builder
+from src.agent.ui_state import UIStateDelta
+from src.mac.observer import FakeNotificationSource
+from src.mac.snapshot import load_snapshot
+
+
+def tokens(text: str) -> int:
+    return len(text) // 3
+
+
+def recorded_trees(directory: Path):
+    paths = sorted(directory.glob('tree_*.json*'), key=lambda path: int(re.search(r'tree_(\d+)', path.name).group(1)))
+    for path in paths:
+        yield load_snapshot(path)
+
+
+def synthetic_trees(steps: int, elements: int, changes: int, stable: float, seed: int):
+    rng = random.Random(seed)
+    app = synthetic_app(elements, seed)
+    builder = make_builder(app)
+    asyncio.run(builder.build_tree(1))
+    for _ in range(steps):
+        if rng.random() >= stable:
+            mutate(app.attributes['AXMainWindow'], FakeNotificationSource(), changes, rng)
+        yield asyncio.run(builder.build_tree(1))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-d', '--directory', type=Path, help='Replay recorded tree snapshots')
+    parser.add_argument('-s', '--steps', type=int, default=30)
+    parser.add_argument('-e', '--elements', type=int, default=150)
+    parser.add_argument('-c', '--changes', type=int, default=3, help='Edits on a step that changes the screen')
+    parser.add_argument('--stable', type=float, default=0.5, help='Share of steps that leave the screen as it was')
+    parser.add_argument('-f', '--full-every', type=int, nargs='+', default=[5, 10])
+    args = parser.parse_args()
+
+    def trees():
+        if args.directory:
+            return recorded_trees(args.directory)
+        return synthetic_trees(args.steps, args.elements, args.changes, args.stable, seed=0)
+
+    full_lists = [root._get_visible_clickable_elements_string() for root in trees()]
+    full_tokens = sum(tokens(text) for text in full_lists)
+    print(f'{len(full_lists)} steps, full lists: {full_tokens} state tokens')
+    print(f'{"full every":>11}{"full steps":>12}{"state tokens":>14}{"baseline sent":>15}{"uncached":>10}{"saved":>8}')
+    for full_every in args.full_every:
+        tracker = UIStateDelta(full_every=full_every)
+        state_tokens = baseline_tokens = cacheable = full_steps = 0
+        current_baseline = ''
+        for root, text in zip(trees(), full_lists):
+            baseline, state = tracker.update(root, text)
+            state_tokens += tokens(state)
+            if baseline is not None:
+                current_baseline = baseline
+                full_steps += 1
+            else:
+                cacheable += tokens(current_baseline)
+            baseline_tokens += tokens(current_baseline)
+        uncached = state_tokens + baseline_tokens - cacheable
+        saved = 1 - uncached / full_tokens if full_tokens else 0.0
+        print(f'{full_every:>11}{full_steps:>12}{state_tokens:>14}{baseline_tokens:>15}{uncached:>10}{saved:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Element queries by action and role: walking the tree per query vs ElementIndex.
+
+    python benchmarks/element_index.py [-e 1000 10000]
+
+Builds the synthetic app from benchmarks/ax_fetch.py on FakeAXBackend. The recursive
+column is find_elements_by_action as it was (lists built and extended at every node), the
+walk column is the current iterative one, the index column asks the builder's
+element_index. Build overhead is the crawl with indexing against the crawl without it.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+
+ACTIONS = ['AXPress', 'AXSetValue', 'AXConfirm', 'AXShowMenu']
+
+
+def recursive_find(node, action: str) -> list:
+    """find_elements_by_action before the index"""
+    elements = []
+    if action in node.actions:
+        elements.append(node)
+    for child in node.children:
+        elements.extend(recursive_find(child, action))
+    return elements
+
+
+def per_query_us(fn, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for action in ACTIONS:
+            fn(action)
+        timings.append((time.perf_counter() - start) / len(ACTIONS) * 1e6)
+    return statistics.median(timings)
+
+
+def build_ms(app, index: bool, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        builder = make_builder(app)
+        if not index:
+            builder.element_index.add = lambda node: None
+        start = time.perf_counter()
+        asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"elements":>9}{"recursive us":>14}{"walk us":>10}{"index us":>10}'
+          f'{"build ms":>10}{"unindexed ms":>14}  same')
+    for count in args.elements:
+        app = synthetic_app(count)
+        builder = make_builder(app)
+        root = asyncio.run(builder.build_tree(1))
+        index = builder.element_index
+        same = all(
+            index.by_action(action) == root.find_elements_by_action(action) == recursive_find(root, action)
+            for action in ACTIONS
+        )
+        recursive = per_query_us(lambda action: recursive_find(root, action), args.iterations)
+        walk = per_query_us(root.find_elements_by_action, args.iterations)
+        indexed = per_query_us(index.by_action, args.iterations)
+        print(f'{count:>9}{recursive:>14.0f}{walk:>10.0f}{indexed:>10.1f}'
+              f'{build_ms(app, True, args.iterations):>10.1f}{build_ms(app, False, args.iterations):>14.1f}  {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-node cost of telling crawled elements apart: AXBackend.element_key vs str(element).
+
+    python benchmarks/element_keys.py [-e 1000 10000] [-n 5]
+
+Builds the synthetic app from benchmarks/ax_fetch.py on FakeAXBackend, once with the
+backend's element keys and once with element_key swapped for str, which is what the crawl
+used to dedup on and store as every node's identifier. The dedup columns time only the
+key and set operations over the same elements. A FakeAXElement formats its description in
+Python; a PyObjC AXUIElement goes through CFCopyDescription, so on macOS the gap is wider.
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+
+
+def all_elements(app) -> list:
+    elements, stack = [], [app]
+    while stack:
+        element = stack.pop()
+        elements.append(element)
+        stack.extend(element.attributes.get('AXChildren') or [])
+    return elements
+
+
+def dedup_ns(elements: list, key, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        seen = set()
+        start = time.perf_counter()
+        for element in elements:
+            k = key(element)
+            if k not in seen:
+                seen.add(k)
+        timings.append((time.perf_counter() - start) / len(elements) * 1e9)
+    return statistics.median(timings)
+
+
+def build(app, key, iterations: int):
+    """(median build ms, bytes held per node) for a builder keying elements with `key`"""
+    timings = []
+    for _ in range(iterations):
+        builder = make_builder(app)
+        if key is not None:
+            builder.ax.element_key = key
+        start = time.perf_counter()
+        asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    builder = make_builder(app)
+    if key is not None:
+        builder.ax.element_key = key
+    gc.collect()
+    tracemalloc.start()
+    root = asyncio.run(builder.build_tree(1))
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = len(builder._nodes)
+    del root
+    return statistics.median(timings), held / max(nodes, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"elements":>9}{"key":>13}{"dedup ns/node":>15}{"build ms":>10}{"bytes/node":>12}')
+    for count in args.elements:
+        app = synthetic_app(count)
+        elements = all_elements(app)
+        backend_key = make_builder(app).ax.element_key
+        for label, key in (('description', str), ('element_key', None)):
+            ns = dedup_ns(elements, key or backend_key, args.iterations)
+            build_ms, per_node = build(app, key, args.iterations)
+            print(f'{count:>9}{label:>13}{ns:>15.0f}{build_ms:>10.1f}{per_node:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
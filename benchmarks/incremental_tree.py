@@ -0,0 +1,111 @@
+"""
+Steady-state tree refresh: full crawl vs patching from accessibility notifications.
+
+    python benchmarks/incremental_tree.py [-e 10000] [-c 1 10 50] [-l 0.0001]
+
+Each step changes `c` random elements of a synthetic app (a title edit, an added and a
+removed child in turn) and posts the matching notifications on FakeNotificationSource.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from benchmarks.ax_fetch import synthetic_app
+from src.mac.ax_backend import FakeAXBackend, FakeAXElement
+from src.mac.capture import FakeCapture
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.observer import FakeNotificationSource
+from src.mac.tree import MacUITreeBuilder
+
+PID = 1
+
+
+def elements_of(window: FakeAXElement) -> list:
+    elements, stack = [], list(window.attributes['AXChildren'])
+    while stack:
+        element = stack.pop()
+        elements.append(element)
+        stack.extend(element.attributes['AXChildren'])
+    return elements
+
+
+def mutate(window: FakeAXElement, source: FakeNotificationSource, changes: int, rng: random.Random) -> None:
+    elements = elements_of(window)
+    for index in range(changes):
+        element = rng.choice(elements)
+        kind = index % 3
+        if kind == 0:
+            element.attributes['AXTitle'] = f'edited {rng.random():.6f}'
+            source.post(PID, element, 'AXTitleChanged')
+        elif kind == 1:
+            child = element.append(FakeAXElement(
+                'AXButton', actions=['AXPress'], Title='added', Enabled=True, Position=(300, 300), Size=(60, 20)
+            ))
+            source.post(PID, child, 'AXCreated')
+        elif element.attributes['AXParent'] is not window:
+            element.attributes['AXParent'].attributes['AXChildren'].remove(element)
+            source.post(PID, element, 'AXUIElementDestroyed')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, default=10000)
+    parser.add_argument('-c', '--changes', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('-l', '--latency', type=float, default=0.0001, help='Seconds per fake round trip')
+    parser.add_argument('-s', '--steps', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{args.elements} elements, median of {args.steps} steps')
+    print(f'{"changes":>8}{"full ms":>10}{"full calls":>12}{"patch ms":>10}{"patch calls":>13}')
+    for changes in args.changes:
+        app = synthetic_app(args.elements)
+        window = app.attributes['AXMainWindow']
+        source = FakeNotificationSource()
+        frame = FakeCapture([Image.new('RGB', (756, 491))])
+        geometry = FixedScreenGeometry()
+        full = MacUITreeBuilder(
+            ax_backend=FakeAXBackend({PID: app}, latency=args.latency),
+            capture_backend=frame,
+            incremental=False,
+            geometry=geometry,
+        )
+        patched = MacUITreeBuilder(
+            ax_backend=FakeAXBackend({PID: app}, latency=args.latency),
+            capture_backend=frame,
+            notification_source=source,
+            incremental=True,
+            geometry=geometry,
+        )
+        rng = random.Random(changes)
+        results = {'full': ([], []), 'incremental': ([], [])}
+        for builder in (full, patched):
+            builder.capture_screenshot()
+            # The first build finds the window, the second judges visibility against it
+            asyncio.run(builder.build_tree(PID))
+            asyncio.run(builder.build_tree(PID))
+        for _ in range(args.steps):
+            mutate(window, source, changes, rng)
+            for builder in (full, patched):
+                start = time.perf_counter()
+                asyncio.run(builder.build_tree(PID))
+                timings, calls = results[builder.last_build_mode]
+                timings.append((time.perf_counter() - start) * 1000)
+                calls.append(builder.last_build_stats.calls)
+        (full_ms, full_calls), (patch_ms, patch_calls) = (
+            (statistics.median(timings), statistics.median(calls)) if timings else (float('nan'), 0)
+            for timings, calls in results.values()
+        )
+        print(f'{changes:>8}{full_ms:>10.1f}{full_calls:>12.0f}{patch_ms:>10.1f}{patch_calls:>13.0f}')
+
+
+if __name__ == '__main__':
+    main()
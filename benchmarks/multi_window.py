@@ -0,0 +1,92 @@
+"""
+Multi-window tree builds: windows crawled together under per-window budgets, with
+unchanged background windows reused from the previous tree.
+
+    python benchmarks/multi_window.py [-w 4] [-e 1500] [-l 0.0002] [-m 800]
+
+The synthetic app from benchmarks/ax_fetch.py gets `w - 1` extra panels in front of and
+behind its main window, one of them large. Builds are compared in single-window mode, with
+windows crawled one after another (one window thread), and concurrently; `latency` is
+slept per fake round trip to stand in for accessibility IPC.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+from src.mac.ax_backend import FakeAXElement
+
+
+def panel(title: str, buttons: int, x: int) -> FakeAXElement:
+    window = FakeAXElement('AXWindow', Title=title, Position=(x, 120), Size=(300, 700))
+    # Sections of 50 rows keep every element under the builder's max_children
+    section = None
+    for index in range(buttons):
+        if index % 50 == 0:
+            section = window.append(FakeAXElement('AXGroup', Position=(x + 5, 125), Size=(290, 690)))
+        row = section.append(FakeAXElement('AXGroup', Position=(x + 10, 130 + index % 30 * 22), Size=(280, 20)))
+        row.append(FakeAXElement('AXButton', actions=['AXPress'], Title=f'{title} {index}', Enabled=True,
+                                 Position=(x + 20, 132 + index % 30 * 22), Size=(80, 16)))
+    return window
+
+
+def multi_window_app(windows: int, elements: int) -> FakeAXElement:
+    app = synthetic_app(elements)
+    main = app.attributes['AXMainWindow']
+    panels = [panel(f'Panel {index}', 2000 if index == 1 else 20, 1000 + index * 40) for index in range(windows - 1)]
+    # Front to back: a small panel, the main window, then the rest
+    app.attributes['AXWindows'] = [*panels[:1], main, *panels[1:]]
+    return app
+
+
+def run(app, latency: float, iterations: int, window_threads: Optional[int] = None, **settings):
+    builder = make_builder(app)
+    builder.ax.latency = latency
+    for name, value in settings.items():
+        setattr(builder, name, value)
+    if window_threads is not None:
+        builder._window_pool = ThreadPoolExecutor(max_workers=window_threads)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        root = asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, root, builder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-w', '--windows', type=int, default=4)
+    parser.add_argument('-e', '--elements', type=int, default=1500, help='Elements in the main window')
+    parser.add_argument('-l', '--latency', type=float, default=0.0002, help='Seconds per fake round trip')
+    parser.add_argument('-m', '--window-max-nodes', type=int, default=800)
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    app = multi_window_app(args.windows, args.elements)
+    multi = dict(multi_window=True, max_windows=args.windows, window_max_nodes=args.window_max_nodes)
+    modes = [
+        ('main window', {}),
+        ('serial', dict(multi, window_threads=1)),
+        ('concurrent', multi),
+    ]
+    print(f'{"mode":>12}{"first ms":>10}{"later ms":>10}{"windows":>9}{"reused":>8}{"nodes":>7}{"highlighted":>13}')
+    for label, settings in modes:
+        timings, root, builder = run(app, args.latency, args.iterations, **settings)
+        stats = builder.last_crawl_stats
+        later = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+        print(f'{label:>12}{timings[0]:>10.0f}{later:>10.0f}{len(root.children):>9}{stats.reused_windows:>8}'
+              f'{stats.emitted:>7}{builder.highlight_index:>13}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Memory per node and build time of UI trees, slotted MacElementNode vs the previous dataclass.
+
+    python benchmarks/node_memory.py [-e 1000 10000 50000]
+
+Builds the synthetic app from benchmarks/ax_fetch.py on FakeAXBackend. Memory is what
+tracemalloc sees allocated, and still held, by one build; the AX elements themselves
+belong to the fake app and are not counted.
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+import src.mac.tree as tree_module
+from benchmarks.ax_fetch import synthetic_app
+from src.mac.ax_backend import FakeAXBackend
+from src.mac.capture import FakeCapture
+from src.mac.element import MacElementNode
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.tree import MacUITreeBuilder
+
+
+@dataclass(eq=False)
+class DataclassNode:
+    """The previous node: a dataclass with an attributes dict and a strong parent reference"""
+    role: str
+    identifier: str
+    attributes: Dict[str, Any]
+    is_visible: bool
+    app_pid: int
+    on_screen: bool
+    children: List['DataclassNode'] = field(default_factory=list)
+    parent: Optional['DataclassNode'] = None
+    is_interactive: bool = False
+    highlight_index: Optional[int] = None
+    _element = None
+
+    @property
+    def actions(self) -> List[str]:
+        return self.attributes.get('actions', [])
+
+    def invalidate_path(self) -> None:
+        pass
+
+
+def make_builder(app) -> MacUITreeBuilder:
+    builder = MacUITreeBuilder(
+        ax_backend=FakeAXBackend({1: app}),
+        capture_backend=FakeCapture([Image.new('RGB', (756, 491))]),
+        incremental=False,
+        geometry=FixedScreenGeometry(),
+    )
+    builder.capture_screenshot()
+    return builder
+
+
+def measure(node_class, app, iterations: int):
+    tree_module.MacElementNode = node_class
+    try:
+        timings = []
+        for _ in range(iterations):
+            builder = make_builder(app)
+            start = time.perf_counter()
+            asyncio.run(builder.build_tree(1))
+            timings.append((time.perf_counter() - start) * 1000)
+        builder = make_builder(app)
+        # Only the tree (and the builder's lookups into it) should remain allocated
+        gc.collect()
+        tracemalloc.start()
+        root = asyncio.run(builder.build_tree(1))
+        gc.collect()
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        nodes, stack = 0, [root]
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            stack.extend(node.children)
+        return statistics.median(timings), held / nodes, nodes
+    finally:
+        tree_module.MacElementNode = MacElementNode
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'median of {args.iterations}')
+    print(f'{"elements":>9}{"node":>11}{"build ms":>10}{"bytes/node":>12}{"nodes":>8}')
+    for elements in args.elements:
+        app = synthetic_app(elements)
+        for label, node_class in (('dataclass', DataclassNode), ('slotted', MacElementNode)):
+            build_ms, per_node, nodes = measure(node_class, app, args.iterations)
+            print(f'{elements:>9}{label:>11}{build_ms:>10.1f}{per_node:>12.0f}{nodes:>8}')
+
+
+if __name__ == '__main__':
+    main()
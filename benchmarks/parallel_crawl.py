@@ -0,0 +1,82 @@
+"""
+Serial vs parallel accessibility crawling on a latency-injecting fake backend.
+
+    python benchmarks/parallel_crawl.py [-e 5000] [-w 2 4 8] [-l 0.0002]
+
+Every fake round trip sleeps `latency` seconds, as a blocking IPC call would. Each
+parallel tree is checked against the serial one, highlight indexes included.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from benchmarks.ax_fetch import synthetic_app
+from src.mac.ax_backend import FakeAXBackend
+from src.mac.capture import FakeCapture
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.tree import MacUITreeBuilder
+
+
+def flatten(root) -> list:
+    rows, stack = [], [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        rows.append((depth, node.identifier, node.highlight_index, node.on_screen))
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return rows
+
+
+def timed_build(builder: MacUITreeBuilder, iterations: int):
+    # The first build finds the window, later ones judge visibility against it
+    asyncio.run(builder.build_tree(1))
+    timings = []
+    root = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        root = asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), root
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, default=5000)
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('-l', '--latency', type=float, default=0.0002, help='Seconds per fake round trip')
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    app = {1: synthetic_app(args.elements)}
+    frame = FakeCapture([Image.new('RGB', (756, 491))])
+
+    def builder(workers: int) -> MacUITreeBuilder:
+        tree_builder = MacUITreeBuilder(
+            ax_backend=FakeAXBackend(app, latency=args.latency),
+            capture_backend=frame,
+            incremental=False,
+            crawl_workers=workers,
+            geometry=FixedScreenGeometry(),
+        )
+        tree_builder.capture_screenshot()
+        return tree_builder
+
+    serial_ms, serial_root = timed_build(builder(1), args.iterations)
+    expected = flatten(serial_root)
+    print(f'{args.elements} elements, {args.latency * 1000:.2f} ms per round trip, median of {args.iterations}')
+    print(f'{"workers":>8}{"build ms":>10}{"speed-up":>10}  same tree')
+    print(f'{1:>8}{serial_ms:>10.1f}{1.0:>9.2f}x  -')
+    for workers in args.workers:
+        build_ms, root = timed_build(builder(workers), args.iterations)
+        print(f'{workers:>8}{build_ms:>10.1f}{serial_ms / build_ms:>9.2f}x  {flatten(root) == expected}')
+
+
+if __name__ == '__main__':
+    main()
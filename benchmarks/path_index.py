@@ -0,0 +1,93 @@
+"""
+Resolving accessibility paths on a fresh tree: the previous recursive search vs PathIndex.
+
+    python benchmarks/path_index.py [-e 1000 10000] [-q 20]
+
+After every build the nodes are new, so their paths are not cached yet. The previous
+find_element_by_path computed each node's path bottom-up (scanning all siblings at every
+level) until it reached the one asked for; PathIndex computes every path in one top-down
+pass and answers from a dict. `q` remembered paths are resolved per tree.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+from src.mac.paths import PathIndex
+
+
+def all_nodes(root) -> list:
+    nodes, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+    return nodes
+
+
+def recursive_find(node, path: str):
+    """find_element_by_path before the index"""
+    if node.accessibility_path == path:
+        return node
+    for child in node.children:
+        result = recursive_find(child, path)
+        if result:
+            return result
+    return None
+
+
+def fresh(nodes: list) -> None:
+    for node in nodes:
+        node.invalidate_path()
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-q', '--queries', type=int, default=20)
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f'{"elements":>9}{"search ms":>11}{"index ms":>10}{"lookup us":>11}  same nodes')
+    for count in args.elements:
+        builder = make_builder(synthetic_app(count))
+        root = asyncio.run(builder.build_tree(1))
+        nodes = all_nodes(root)
+        paths = [node.accessibility_path for node in rng.sample(nodes, min(args.queries, len(nodes)))]
+
+        search, build, lookup = [], [], []
+        for _ in range(args.iterations):
+            fresh(nodes)
+            search.append(timed(lambda: [recursive_find(root, path) for path in paths]))
+            expected = [recursive_find(root, path) for path in paths]
+            fresh(nodes)
+            index = None
+
+            def index_tree():
+                nonlocal index
+                index = PathIndex(root)
+
+            build.append(timed(index_tree))
+            lookup.append(timed(lambda: [index.get(path) for path in paths]) * 1000 / len(paths))
+        same = [index.get(path) for path in paths] == expected
+        print(f'{count:>9}{statistics.median(search):>11.1f}{statistics.median(build):>10.1f}'
+              f'{statistics.median(lookup):>11.2f}  {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Cost of asking whether the target app is still running, and how soon an exit is noticed.
+
+    python benchmarks/process_liveness.py [-n 200]
+
+Compares the `ps -p <pid>` subprocess build_tree used to run every step with a signal 0
+probe and ProcessMonitor.is_alive on a watched pid. The exit test starts a short-lived
+child, watches it and polls the monitor until the termination callback fires.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.mac.liveness import ProcessMonitor, pid_exists
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def exit_notice_ms(lifetime: float) -> float:
+    """Time from the child's exit to the monitor's callback, polling every millisecond"""
+    monitor = ProcessMonitor()
+    child = subprocess.Popen([sys.executable, '-c', f'import time; time.sleep({lifetime})'])
+    exited_at = []
+    # Reap the child as soon as it exits, a zombie still answers signal 0
+    reaper = threading.Thread(target=lambda: (child.wait(), exited_at.append(time.perf_counter())))
+    reaper.start()
+    noticed = []
+    monitor.on_terminated(lambda pid: noticed.append(time.perf_counter()))
+    monitor.watch(child.pid)
+    while not noticed:
+        monitor.poll()
+        time.sleep(0.001)
+    reaper.join()
+    monitor.close()
+    return (noticed[0] - exited_at[0]) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    parser.add_argument('--exits', type=int, default=5, help='Child processes for the exit test')
+    args = parser.parse_args()
+
+    pid = os.getpid()
+    monitor = ProcessMonitor()
+    monitor.watch(pid)
+    rows = {
+        'ps -p <pid>': lambda: subprocess.run(['ps', '-p', str(pid)], capture_output=True, text=True).returncode == 0,
+        'os.kill(pid, 0)': lambda: pid_exists(pid),
+        'ProcessMonitor.is_alive': lambda: monitor.is_alive(pid),
+    }
+    print(f'{"":<26}{"us per call":>12}')
+    for label, fn in rows.items():
+        iterations = args.iterations if label.startswith('ps') else args.iterations * 100
+        print(f'{label:<26}{per_call_us(fn, iterations):>12.2f}')
+
+    notices = [exit_notice_ms(0.05) for _ in range(args.exits)]
+    mechanism = 'kqueue NOTE_EXIT' if monitor._kqueue is not None else f'signal 0, {monitor.ttl:.1f} s cache'
+    print(f'exit noticed after {statistics.median(notices):.1f} ms (median of {args.exits}, {mechanism})')
+
+
+if __name__ == '__main__':
+    main()
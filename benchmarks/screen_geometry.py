@@ -0,0 +1,62 @@
+"""
+Per-element geometry cost: display queries and AXValue parsing (macOS).
+
+    python benchmarks/screen_geometry.py [-n 20000]
+
+Compares what the tree builder did per element before (pyautogui.size() twice and a
+regex over str(AXValue) for position and size) with the cached ScreenGeometry and
+AXValueGetValue.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import ApplicationServices as AS
+import pyautogui
+import Quartz
+
+from src.mac.geometry import ScreenGeometry
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    geometry = ScreenGeometry()
+    point = AS.AXValueCreate(AS.kAXValueCGPointType, Quartz.CGPoint(123.5, 456.0))
+    pattern = re.compile(r'x:([-+]?\d+\.?\d*)\s+y:([-+]?\d+\.?\d*)')
+
+    def regex_point():
+        match = pattern.search(str(point))
+        return float(match.group(1)), float(match.group(2))
+
+    def structural_point():
+        ok, value = AS.AXValueGetValue(point, AS.kAXValueCGPointType, None)
+        return value.x, value.y
+
+    rows = {
+        'pyautogui.size()': lambda: pyautogui.size(),
+        'ScreenGeometry.size': lambda: geometry.size,
+        'regex over str(AXValue)': regex_point,
+        'AXValueGetValue': structural_point,
+    }
+    print(f'{"":<26}{"us per call":>12}')
+    for label, fn in rows.items():
+        print(f'{label:<26}{per_call_us(fn, args.iterations):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
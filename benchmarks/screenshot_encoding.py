@@ -0,0 +1,69 @@
+"""
+Encode latency and payload size per screenshot format.
+
+    python benchmarks/screenshot_encoding.py                 # synthetic Retina-sized frame
+    python benchmarks/screenshot_encoding.py -i shot.png -n 20
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image, ImageDraw
+
+from src.agent.image_encoder import PROVIDER_PROFILES, EncodingProfile, encode_image
+
+
+def synthetic_screenshot(width: int = 1512, height: int = 982) -> Image.Image:
+    """A desktop-like frame: flat background, windows, toolbars and lines of text"""
+    image = Image.new('RGB', (width, height), (236, 236, 236))
+    draw = ImageDraw.Draw(image)
+    for w in range(3):
+        x0, y0 = 60 + w * 180, 50 + w * 90
+        draw.rectangle([x0, y0, x0 + 820, y0 + 560], fill=(255, 255, 255), outline=(180, 180, 180))
+        draw.rectangle([x0, y0, x0 + 820, y0 + 28], fill=(222, 222, 222))
+        for line in range(24):
+            draw.text((x0 + 16, y0 + 40 + line * 20), f'Line {line} of window {w} - lorem ipsum dolor sit amet', fill=(30, 30, 30))
+    return image
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-i', '--image', help='Screenshot to encode (defaults to a synthetic frame)')
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    image = Image.open(args.image) if args.image else synthetic_screenshot()
+    image.load()
+
+    profiles = {
+        'png (level 6)': EncodingProfile('PNG', compress_level=6),
+        'png (level 1)': EncodingProfile('PNG', compress_level=1),
+        'jpeg q85': EncodingProfile('JPEG', quality=85),
+        'jpeg q70': EncodingProfile('JPEG', quality=70),
+        'webp q80': EncodingProfile('WEBP', quality=80),
+    }
+    for provider, profile in PROVIDER_PROFILES.items():
+        profiles[f'{provider} profile'] = profile
+
+    print(f'{image.width}x{image.height} {image.mode}, {args.iterations} iterations')
+    print(f'{"profile":<34}{"median ms":>10}{"p95 ms":>10}{"bytes":>12}{"data url":>12}')
+    for label, profile in profiles.items():
+        timings = []
+        encoded = None
+        for _ in range(args.iterations):
+            encoded = encode_image(image, profile)
+            timings.append(encoded.encode_seconds * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(
+            f'{label:<34}{statistics.median(timings):>10.1f}{p95:>10.1f}'
+            f'{encoded.num_bytes:>12}{len(encoded.data_url):>12}'
+        )
+
+
+if __name__ == '__main__':
+    main()
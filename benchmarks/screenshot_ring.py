@@ -0,0 +1,57 @@
+"""
+Memory and latency of ScreenshotRing over a long run.
+
+    python benchmarks/screenshot_ring.py [-s 600] [--max-mb 32]
+
+Replays `steps` synthetic frames (every third step leaves the screen unchanged) and
+compares the bytes held by the ring against keeping every decoded frame around.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import ImageDraw
+
+from benchmarks.screenshot_encoding import synthetic_screenshot
+from src.agent.screenshot_ring import ScreenshotRing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--steps', type=int, default=600)
+    parser.add_argument('--max-mb', type=float, default=32)
+    args = parser.parse_args()
+
+    base = synthetic_screenshot()
+    ring = ScreenshotRing(max_bytes=int(args.max_mb * 1024 * 1024))
+    add_ms, get_ms = [], []
+    decoded_bytes = 0
+    for step in range(1, args.steps + 1):
+        start = time.perf_counter()
+        if step % 3 == 0:
+            ring.add_unchanged(step)
+        else:
+            frame = base.copy()
+            ImageDraw.Draw(frame).text((80, 20 + step % 900), f'step {step}', fill=(0, 0, 0))
+            ring.add(step, frame)
+        add_ms.append((time.perf_counter() - start) * 1000)
+        decoded_bytes += base.width * base.height * 3
+
+        start = time.perf_counter()
+        ring.latest(before=step)
+        get_ms.append((time.perf_counter() - start) * 1000)
+
+        if step % (args.steps // 5 or 1) == 0:
+            print(f'step {step:>5}: ring {ring.nbytes / 2**20:7.1f} MB in {len(ring):>4} frames '
+                  f'({ring.evicted} evicted), decoded frames would be {decoded_bytes / 2**20:8.1f} MB')
+
+    print(f'median add {statistics.median(add_ms):.1f} ms, median decode {statistics.median(get_ms):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Point queries against tree elements: SpatialIndex vs a scan over every highlighted node.
+
+    python benchmarks/spatial_index.py [-e 500 2000 10000] [-q 2000]
+
+Uses the random tree from benchmarks/annotation.py. Each grid answer is checked against
+the scan, both for the containing element and the nearest one within 0.02.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.annotation import synthetic_tree
+from src.mac.spatial import SpatialIndex
+
+
+def elements(root) -> list:
+    nodes, stack = [], list(root.children)
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.children)
+    return nodes
+
+
+def scan_nearest(nodes: list, x: float, y: float, max_distance: float):
+    """Containing element with the smallest area, else the closest within max_distance"""
+    best, best_area = None, math.inf
+    closest, closest_distance = None, max_distance
+    for node in nodes:
+        (x1, y1), (w, h) = node.position, node.size
+        x2, y2 = x1 + w, y1 + h
+        if x1 <= x <= x2 and y1 <= y <= y2 and w * h < best_area:
+            best, best_area = node, w * h
+        distance = math.hypot(max(x1 - x, 0, x - x2), max(y1 - y, 0, y - y2))
+        if distance <= closest_distance:
+            closest, closest_distance = node, distance
+    return best if best is not None else closest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[500, 2000, 10000])
+    parser.add_argument('-q', '--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f'{"elements":>9}{"index ms":>10}{"scan us":>10}{"grid us":>10}  same answers')
+    for count in args.elements:
+        nodes = elements(synthetic_tree(count))
+        points = [(rng.random(), rng.random()) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        index = SpatialIndex(nodes)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        expected = [scan_nearest(nodes, x, y, 0.02) for x, y in points]
+        scan_us = (time.perf_counter() - start) / len(points) * 1e6
+
+        start = time.perf_counter()
+        answers = [index.nearest(x, y, 0.02) for x, y in points]
+        grid_us = (time.perf_counter() - start) / len(points) * 1e6
+
+        # Equal-area or equidistant ties may resolve to different nodes
+        same = all(
+            a is b or (a is not None and b is not None and a.size == b.size)
+            for a, b in zip(answers, expected)
+        )
+        print(f'{count:>9}{build_ms:>10.1f}{scan_us:>10.1f}{grid_us:>10.1f}  {same}')
+
+
+if __name__ == '__main__':
+    main()
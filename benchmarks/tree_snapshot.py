@@ -0,0 +1,62 @@
+"""
+Tree snapshot size and speed, and the cost of diffing consecutive trees.
+
+    python benchmarks/tree_snapshot.py [-e 1000 10000] [-c 10]
+
+Builds the synthetic app from benchmarks/ax_fetch.py, snapshots it, applies `c` random
+edits (benchmarks/incremental_tree.py's mutate) and diffs the rebuilt tree against the
+loaded snapshot. get_detailed_string is listed for scale, it was the only dump before.
+"""
+import argparse
+import asyncio
+import gzip
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.incremental_tree import mutate
+from benchmarks.node_memory import make_builder
+from src.mac.observer import FakeNotificationSource
+from src.mac.snapshot import diff_trees, dumps, loads
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-c', '--changes', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f'{"elements":>9}{"debug KB":>10}{"json KB":>9}{"gzip KB":>9}{"dump ms":>9}{"load ms":>9}'
+          f'{"diff ms":>9}  round trip, diff')
+    for elements in args.elements:
+        app = synthetic_app(elements)
+        builder = make_builder(app)
+        asyncio.run(builder.build_tree(1))
+        root = asyncio.run(builder.build_tree(1))
+
+        debug = root.get_detailed_string().encode('utf-8')
+        payload, dump_ms = timed(dumps, root)
+        loaded, load_ms = timed(loads, payload)
+        same = not diff_trees(root, loaded) and loaded.get_detailed_string().encode('utf-8') == debug
+
+        mutate(app.attributes['AXMainWindow'], FakeNotificationSource(), args.changes, random.Random(elements))
+        rebuilt = asyncio.run(builder.build_tree(1))
+        diff, diff_ms = timed(diff_trees, loaded, rebuilt)
+        print(f'{elements:>9}{len(debug) / 1024:>10.0f}{len(payload) / 1024:>9.0f}'
+              f'{len(gzip.compress(payload)) / 1024:>9.0f}{dump_ms:>9.1f}{load_ms:>9.1f}{diff_ms:>9.1f}'
+              f'  {same}, {diff}')
+
+
+if __name__ == '__main__':
+    main()
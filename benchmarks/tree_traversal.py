@@ -0,0 +1,110 @@
+"""
+Tree build time with the iterative crawl vs the previous recursive coroutine per node.
+
+    python benchmarks/tree_traversal.py [-s 1000 10000 50000] [-n 3]
+
+Runs on FakeAXBackend without latency, so the numbers are the traversal and node
+building overhead alone. A deep chain (depth 2,000) shows the recursion limit.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from benchmarks.ax_fetch import synthetic_app
+from src.mac.ax_backend import FakeAXBackend, FakeAXElement
+from src.mac.capture import FakeCapture
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.tree import MacUITreeBuilder
+
+
+class RecursiveTreeBuilder(MacUITreeBuilder):
+    """The previous traversal: one awaited coroutine per child"""
+
+    async def _process_element(self, element, pid, parent=None, depth=0):
+        node, children = self._build_node(element, pid, parent, depth)
+        if node is None:
+            return None
+        for child in children:
+            child_node = await self._process_element(child, pid, node, depth + 1)
+            if child_node:
+                node.children.append(child_node)
+        return node
+
+
+def deep_app(depth: int) -> FakeAXElement:
+    window = FakeAXElement('AXWindow', Position=(40, 40), Size=(1400, 900))
+    parent = window
+    for _ in range(depth):
+        group = FakeAXElement('AXGroup', Position=(60, 60), Size=(500, 500))
+        parent.append(group)
+        parent = group
+    return FakeAXElement('AXApplication', MainWindow=window)
+
+
+def make_builder(cls, app: FakeAXElement, max_depth: int = 30) -> MacUITreeBuilder:
+    builder = cls(
+        ax_backend=FakeAXBackend({1: app}),
+        capture_backend=FakeCapture([Image.new('RGB', (756, 491))]),
+        incremental=False,
+        geometry=FixedScreenGeometry(),
+    )
+    builder.capture_screenshot()
+    builder.max_depth = max_depth
+    return builder
+
+
+def timed_build(builder: MacUITreeBuilder, iterations: int):
+    timings = []
+    root = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        root = asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), root
+
+
+def count(root) -> int:
+    total, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(node.children)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'median of {args.iterations}')
+    print(f'{"tree":<18}{"recursive ms":>14}{"iterative ms":>14}{"nodes":>8}')
+    for size in args.sizes:
+        app = synthetic_app(size)
+        recursive_ms, _ = timed_build(make_builder(RecursiveTreeBuilder, app), args.iterations)
+        iterative_ms, root = timed_build(make_builder(MacUITreeBuilder, app), args.iterations)
+        print(f'{f"{size} elements":<18}{recursive_ms:>14.1f}{iterative_ms:>14.1f}{count(root):>8}')
+
+    app = deep_app(args.depth)
+    results = []
+    for cls in (RecursiveTreeBuilder, MacUITreeBuilder):
+        try:
+            build_ms, root = timed_build(make_builder(cls, app, max_depth=args.depth + 1), 1)
+            results.append(f'{build_ms:.1f}' if root else 'failed')
+        except RecursionError:
+            results.append('RecursionError')
+    print(f'{f"chain of {args.depth}":<18}{results[0]:>14}{results[1]:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+The UI element list for the prompt: the previous two-pass string vs the budgeted single pass.
+
+    python benchmarks/ui_state_budget.py [-e 150 400 1000 5000] [-t 10000]
+
+The previous version built a detailed string of every node only to estimate its tokens,
+returned nothing past 10,000, and otherwise walked the tree again for the list. Trees are
+the synthetic app from benchmarks/ax_fetch.py; tokens are estimated at three characters each.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.ax_fetch import synthetic_app
+from benchmarks.node_memory import make_builder
+
+
+def previous_state_string(root) -> str:
+    """_get_visible_clickable_elements_string before the token budget"""
+    formatted_text = []
+
+    def process_node(node) -> None:
+        attrs_str = ''
+        for key in ['title', 'value', 'description', 'enabled', 'position', 'size']:
+            if key in node.attributes:
+                if key == 'position':
+                    attrs_str += f' Top left: "{node.attributes[key]}"'
+                else:
+                    attrs_str += f'(w,h): "{node.attributes[key]}"'
+        formatted_text.append(f'{node.highlight_index}[:]<{node.role}{attrs_str}> [interactive]')
+        if (node.role in ['AXStaticText', 'AXTextField'] and not node.is_interactive
+                and (node.parent is None or node.parent.role == 'AXWindow' or node.parent.is_interactive)):
+            formatted_text.append(f'_[:]<{node.role}{attrs_str}> [context]')
+        for child in node.children:
+            process_node(child)
+
+    process_node(root)
+    if len('\n'.join(formatted_text)) // 3 > 10000:
+        return ''
+    return root._get_visible_clickable_elements_string_short()
+
+
+def timed(fn, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--elements', type=int, nargs='+', default=[150, 400, 1000, 5000])
+    parser.add_argument('-t', '--max-tokens', type=int, default=10000)
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"elements":>9}{"listable":>10}{"previous ms":>13}{"tokens":>8}{"listed":>8}'
+          f'{"budgeted ms":>13}{"tokens":>8}{"listed":>8}')
+    for count in args.elements:
+        builder = make_builder(synthetic_app(count))
+        # The second build judges visibility against the window found by the first
+        asyncio.run(builder.build_tree(1))
+        root = asyncio.run(builder.build_tree(1))
+        listable = sum(1 for _ in root.iter_state_lines())
+
+        previous, previous_ms = timed(lambda: previous_state_string(root), args.iterations)
+        budgeted, budgeted_ms = timed(lambda: root._get_visible_clickable_elements_string(args.max_tokens), args.iterations)
+        previous_listed = previous.count('\n') + 1 if previous else 0
+        budgeted_listed = sum(1 for line in budgeted.split('\n') if '[:]' in line)
+        print(f'{count:>9}{listable:>10}{previous_ms:>13.1f}{len(previous) // 3:>8}{previous_listed:>8}'
+              f'{budgeted_ms:>13.1f}{len(budgeted) // 3:>8}{budgeted_listed:>8}')
+
+
+if __name__ == '__main__':
+    main()
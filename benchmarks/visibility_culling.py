@@ -0,0 +1,95 @@
+"""
+Tree build on a long list with and without off-screen culling.
+
+    python benchmarks/visibility_culling.py [-r 200 2000 10000] [-l 0.0001]
+
+A synthetic mail-style window: a sidebar and a scroll area whose list holds `r` rows of
+four elements each, 24 points apart, so only the first few dozen rows are on screen.
+Both builds must list the same elements; their highlight indexes may differ, as the
+culled build numbers fewer elements.
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from src.mac.ax_backend import FakeAXBackend, FakeAXElement
+from src.mac.capture import FakeCapture
+from src.mac.geometry import FixedScreenGeometry
+from src.mac.tree import MacUITreeBuilder
+
+ROW_HEIGHT = 24
+
+
+def mail_app(rows: int) -> FakeAXElement:
+    window = FakeAXElement('AXWindow', Title='Inbox', Position=(40, 40), Size=(1400, 900))
+    sidebar = window.append(FakeAXElement('AXGroup', Position=(40, 80), Size=(220, 860)))
+    for index in range(20):
+        sidebar.append(FakeAXElement(
+            'AXButton', actions=['AXPress'], Title=f'Mailbox {index}', Enabled=True,
+            Position=(50, 90 + index * 30), Size=(200, 24),
+        ))
+    scroll = window.append(FakeAXElement('AXScrollArea', Position=(270, 80), Size=(1160, 860)))
+    table = scroll.append(FakeAXElement('AXTable', Position=(270, 80), Size=(1160, rows * ROW_HEIGHT)))
+    for index in range(rows):
+        y = 80 + index * ROW_HEIGHT
+        row = table.append(FakeAXElement('AXRow', actions=['AXPress'], Enabled=True, Position=(270, y), Size=(1160, ROW_HEIGHT)))
+        row.append(FakeAXElement('AXCheckBox', actions=['AXPress'], Enabled=True, Position=(280, y + 4), Size=(16, 16)))
+        row.append(FakeAXElement('AXStaticText', Value=f'Sender {index}', Position=(310, y + 4), Size=(200, 16)))
+        row.append(FakeAXElement('AXStaticText', Value=f'Subject of message {index}', Position=(520, y + 4), Size=(700, 16)))
+    return FakeAXElement('AXApplication', MainWindow=window, Windows=[window])
+
+
+def timed_build(builder: MacUITreeBuilder, iterations: int):
+    # The first build finds the window, later ones judge visibility against it
+    asyncio.run(builder.build_tree(1))
+    timings = []
+    root = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        root = asyncio.run(builder.build_tree(1))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), root
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--rows', type=int, nargs='+', default=[200, 2000, 10000])
+    parser.add_argument('-l', '--latency', type=float, default=0.0001, help='Seconds per fake round trip')
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'median of {args.iterations}')
+    print(f'{"rows":>6}{"mode":>6}{"build ms":>10}{"AX calls":>10}{"visited":>9}{"emitted":>9}{"culled":>8}{"listed":>8}  same list')
+    for rows in args.rows:
+        app = {1: mail_app(rows)}
+        expected = None
+        for cull in (False, True):
+            builder = MacUITreeBuilder(
+                ax_backend=FakeAXBackend(app, latency=args.latency),
+                capture_backend=FakeCapture([Image.new('RGB', (756, 491))]),
+                incremental=False,
+                geometry=FixedScreenGeometry(),
+                cull_offscreen=cull,
+            )
+            # Read every row, so culling is measured on its own
+            builder.max_children = rows + 1
+            builder.capture_screenshot()
+            build_ms, root = timed_build(builder, args.iterations)
+            listed = {re.sub(r'^\d+', '', line) for line in root._get_visible_clickable_elements_string_short().splitlines()}
+            expected = expected if expected is not None else listed
+            stats = builder.last_crawl_stats
+            print(f'{rows:>6}{"cull" if cull else "full":>6}{build_ms:>10.1f}{builder.last_build_stats.calls:>10}'
+                  f'{stats.visited:>9}{stats.emitted:>9}{stats.culled:>8}{len(listed):>8}  {"-" if not cull else listed == expected}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import io
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """How a screenshot is encoded before it is sent to the LLM"""
+    format: str = 'PNG'
+    quality: int = 85           # JPEG / WebP only
+    compress_level: int = 1     # PNG only, 1 is ~5x faster than the default 6 for a few % more bytes
+    webp_method: int = 0        # WebP only, 0 = fastest
+
+    def save_kwargs(self) -> dict:
+        if self.format == 'PNG':
+            return {'format': 'PNG', 'compress_level': self.compress_level}
+        if self.format == 'JPEG':
+            return {'format': 'JPEG', 'quality': self.quality}
+        if self.format == 'WEBP':
+            return {'format': 'WEBP', 'quality': self.quality, 'method': self.webp_method}
+        raise ValueError(f'Unsupported image format: {self.format}')
+
+
+DEFAULT_PROFILE = EncodingProfile('PNG')
+
+# Keyed by the class name of the (unwrapped) chat model
+PROVIDER_PROFILES: Dict[str, EncodingProfile] = {
+    'ChatOpenAI': EncodingProfile('PNG'),
+    'AzureChatOpenAI': EncodingProfile('JPEG', quality=85),
+    'ChatAnthropic': EncodingProfile('JPEG', quality=85),
+    'ChatGoogleGenerativeAI': EncodingProfile('WEBP', quality=80),
+}
+
+
+def image_provider(llm) -> str:
+    """
+    Provider key for image formats and token costs: the chat model class name. OpenAI-compatible
+    servers other than OpenAI itself (e.g. the TuriX model) are reported as 'OpenAICompatible',
+    since OpenAI's resizing and pricing rules do not apply to them.
+    """
+    name = llm.__class__.__name__
+    base_url = getattr(llm, 'openai_api_base', None)
+    if name == 'ChatOpenAI' and base_url and 'api.openai.com' not in base_url:
+        return 'OpenAICompatible'
+    return name
+
+
+def get_profile(name: Optional[str] = None, provider: Optional[str] = None) -> EncodingProfile:
+    """
+    Resolve an encoding profile.
+    `name` is an explicit format ('png', 'jpeg', 'webp') and wins over the provider default.
+    """
+    if name:
+        fmt = name.upper()
+        if fmt == 'JPG':
+            fmt = 'JPEG'
+        if fmt not in MIME_TYPES:
+            raise ValueError(f'Unsupported image format: {name}')
+        base = PROVIDER_PROFILES.get(provider, DEFAULT_PROFILE)
+        if base.format == fmt:
+            return base
+        return EncodingProfile(fmt, quality=base.quality)
+    return PROVIDER_PROFILES.get(provider, DEFAULT_PROFILE)
+
+
+@dataclass
+class EncodedImage:
+    """A screenshot encoded as a data URL together with what it cost to produce"""
+    data_url: str
+    format: str
+    width: int
+    height: int
+    num_bytes: int        # encoded payload before base64
+    encode_seconds: float
+
+
+def encode_image(image: Image.Image, profile: EncodingProfile = DEFAULT_PROFILE,
+                 size: Optional[Tuple[int, int]] = None) -> EncodedImage:
+    """Encode a PIL image into a base64 data URL (blocking), resizing it to `size` first if given"""
+    start_time = time.perf_counter()
+    if size and size != image.size:
+        image = image.resize(size, Image.BILINEAR)
+    if profile.format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, **profile.save_kwargs())
+    payload = buffer.getvalue()
+    base64_encoded = base64.b64encode(payload).decode('utf-8')
+    return EncodedImage(
+        data_url=f'data:{MIME_TYPES[profile.format]};base64,{base64_encoded}',
+        format=profile.format,
+        width=image.width,
+        height=image.height,
+        num_bytes=len(payload),
+        encode_seconds=time.perf_counter() - start_time,
+    )
+
+
+def screenshot_to_dataurl(screenshot: Image.Image) -> str:
+    return encode_image(screenshot).data_url
+
+
+class ScreenshotEncoder:
+    """
+    Encodes screenshots on a small thread pool so the event loop is free while PIL compresses.
+
+    Typical use in a step: `submit()` right after capture, build the UI tree, then await the
+    returned future. Pillow releases the GIL while compressing, so both run concurrently.
+    """
+
+    def __init__(self, profile: EncodingProfile = DEFAULT_PROFILE, max_workers: int = 2):
+        self.profile = profile
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='screenshot-encoder')
+
+    def encode(self, image: Image.Image, profile: Optional[EncodingProfile] = None) -> EncodedImage:
+        """Encode on the calling thread"""
+        return encode_image(image, profile or self.profile)
+
+    def submit(self, image: Image.Image, profile: Optional[EncodingProfile] = None,
+               size: Optional[Tuple[int, int]] = None) -> 'asyncio.Future[EncodedImage]':
+        """Start encoding (and resizing to `size`) in the pool and return an awaitable for the result"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, encode_image, image, profile or self.profile, size)
+
+    async def encode_async(self, image: Image.Image, profile: Optional[EncodingProfile] = None) -> EncodedImage:
+        encoded = await self.submit(image, profile)
+        logger.debug(
+            f'Encoded {encoded.width}x{encoded.height} {encoded.format} screenshot: '
+            f'{encoded.num_bytes} bytes in {encoded.encode_seconds * 1000:.1f} ms'
+        )
+        return encoded
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# ---------------------------------------------------------------------------
+# Image token accounting, per provider
+# ---------------------------------------------------------------------------
+
+OPENAI_PROVIDERS = ('ChatOpenAI', 'AzureChatOpenAI')
+# Providers whose image cost depends on the image size
+SIZED_PROVIDERS = OPENAI_PROVIDERS + ('ChatAnthropic', 'ChatGoogleGenerativeAI')
+# Used for providers without a known formula
+DEFAULT_IMAGE_TOKENS = 800
+# Never shrink a screenshot below this fraction of its size to fit the budget
+MIN_IMAGE_SCALE = 0.25
+
+
+def image_dimensions(data_url: str) -> Optional[Tuple[int, int]]:
+    """Read width and height from the header of a base64 image data URL without decoding it all"""
+    try:
+        header, _, payload = data_url.partition(',')
+        if ';base64' not in header:
+            return None
+        # PNG headers sit in the first bytes and PIL's own JPEGs put SOF within the first few KB;
+        # anything PIL cannot open from that prefix (e.g. WebP) is decoded in full
+        try:
+            with Image.open(io.BytesIO(base64.b64decode(payload[:8192]))) as image:
+                return image.size
+        except Exception:
+            with Image.open(io.BytesIO(base64.b64decode(payload))) as image:
+                return image.size
+    except Exception:
+        return None
+
+
+def effective_size(provider: Optional[str], width: int, height: int, detail: str = 'high') -> Tuple[int, int]:
+    """The size a provider actually looks at once it has downscaled the image"""
+    if provider in OPENAI_PROVIDERS:
+        if detail == 'low':
+            scale = min(1.0, 512 / max(width, height))
+        else:
+            # Fit in 2048x2048, then shortest side to 768
+            scale = min(1.0, 2048 / max(width, height))
+            shortest = min(width, height) * scale
+            if shortest > 768:
+                scale *= 768 / shortest
+        return max(1, int(width * scale)), max(1, int(height * scale))
+    if provider == 'ChatAnthropic':
+        # Long edge capped at 1568 px and the area at ~1.15 megapixels
+        scale = min(1.0, 1568 / max(width, height), math.sqrt(1_150_000 / (width * height)))
+        return max(1, int(width * scale)), max(1, int(height * scale))
+    return width, height
+
+
+def image_tokens(provider: Optional[str], width: int, height: int, detail: str = 'high') -> int:
+    """Input tokens an image of this size costs with the given provider"""
+    if not width or not height:
+        return DEFAULT_IMAGE_TOKENS
+    if provider in OPENAI_PROVIDERS:
+        if detail == 'low':
+            return 85
+        w, h = effective_size(provider, width, height, detail)
+        return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+    if provider == 'ChatAnthropic':
+        w, h = effective_size(provider, width, height, detail)
+        return math.ceil(w * h / 750)
+    if provider == 'ChatGoogleGenerativeAI':
+        if width <= 384 and height <= 384:
+            return 258
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+    return DEFAULT_IMAGE_TOKENS
+
+
+def fit_to_budget(provider: Optional[str], width: int, height: int, budget: int) -> Tuple[int, int, str]:
+    """
+    Largest (width, height, detail) for an image that the provider can still use and whose
+    token cost fits in `budget`. Pixels beyond the provider's own downscale are never sent.
+    """
+    width, height = effective_size(provider, width, height)
+    if provider not in SIZED_PROVIDERS:
+        return width, height, 'high'
+    scale = 1.0
+    while True:
+        w, h = max(1, int(width * scale)), max(1, int(height * scale))
+        if image_tokens(provider, w, h) <= budget or scale * 0.8 < MIN_IMAGE_SCALE:
+            break
+        scale *= 0.8
+    if image_tokens(provider, w, h) > budget and provider in OPENAI_PROVIDERS:
+        w, h = effective_size(provider, width, height, 'low')
+        return w, h, 'low'
+    return w, h, 'high'
@@ -14,6 +14,7 @@ from langchain_core.messages import (
 )
 from langchain_openai import ChatOpenAI
 
+from src.agent.image_encoder import SIZED_PROVIDERS, image_dimensions, image_tokens
 from src.agent.message_manager.views import MessageHistory, MessageMetadata
 from src.agent.prompts import AgentMessagePrompt, SystemPrompt
 from src.agent.views import ActionResult, AgentOutput, AgentStepInfo
@@ -36,6 +37,7 @@ class MessageManager:
 		max_error_length: int = 400,
 		max_actions_per_step: int = 5,
 		new_task: bool = False,
+		image_provider: Optional[str] = None,
 	):
 		self.llm = llm
 		self.system_prompt_class = system_prompt_class
@@ -45,6 +47,11 @@ class MessageManager:
 		self.action_descriptions = action_descriptions
 		self.ESTIMATED_TOKENS_PER_CHARACTER = estimated_tokens_per_character
 		self.IMG_TOKENS = image_tokens
+		# Chat model class name used for exact image costs, see src.agent.image_encoder.image_provider
+		self.image_provider = image_provider or llm.__class__.__name__
+		self.last_state_text_tokens = 0
+		# Full UI element list that delta state messages refer to, see set_ui_baseline
+		self._ui_baseline: Optional[HumanMessage] = None
 		self.include_attributes = include_attributes
 		self.max_error_length = max_error_length
 		self.new_task = new_task
@@ -119,10 +126,40 @@ class MessageManager:
 			max_error_length=self.max_error_length,
 			step_info=step_info,
 		).get_user_message()
+		self.last_state_text_tokens = sum(
+			self._count_text_tokens(item['text'])
+			for item in state_message.content
+			if isinstance(item, dict) and item.get('type') == 'text'
+		)
 		self._add_message_with_tokens(state_message)
 
+	def image_token_budget(self) -> int:
+		"""Tokens left for the next state message's images, assuming its text costs what the last one did"""
+		return self.max_input_tokens - self.history.total_tokens - self.last_state_text_tokens
+
+	def set_ui_baseline(self, text: str) -> None:
+		"""
+		Replace the full UI element list kept right after the task, or drop it when `text` is
+		empty. Unlike state messages it stays in the history across steps, and at a fixed
+		position, so it is part of a prompt prefix providers can cache.
+		"""
+		if self._ui_baseline is not None:
+			index = next(
+				(i for i, m in enumerate(self.history.messages) if m.message is self._ui_baseline), None
+			)
+			if index is not None:
+				self.history.remove_message(index=index)
+			self._ui_baseline = None
+		if text:
+			self._ui_baseline = HumanMessage(content=f'UI ELEMENTS (full list; later states may only list changes to it):\n{text}')
+			self._add_message_with_tokens(self._ui_baseline, position=2)
+
 	def _remove_last_state_message(self) -> None:
-		while len(self.history.messages) > 2 and isinstance(self.history.messages[-1].message, HumanMessage):
+		while (
+			len(self.history.messages) > 2
+			and isinstance(self.history.messages[-1].message, HumanMessage)
+			and self.history.messages[-1].message is not self._ui_baseline
+		):
 			self.history.remove_message()
 	def _remove_last_AIntool_message(self) -> None:
 		while len(self.history.messages) > 2 and (isinstance(self.history.messages[-1].message, AIMessage) or isinstance(self.history.messages[-1].message, ToolMessage)):
@@ -202,23 +239,13 @@ class MessageManager:
 		return tokens
 	
 	def _count_image_tokens(self, image_url: dict) -> int:
-		"""Calculate tokens for images based on OpenAI's token rules"""
-		if not isinstance(self.llm, ChatOpenAI):
+		"""Calculate tokens for an image from its real dimensions and the provider's pricing rules"""
+		if self.image_provider not in SIZED_PROVIDERS:
 			return self.IMG_TOKENS  # Default for other models
-		
-		detail = image_url.get('detail', 'low')
-		
-		if detail == 'low':
-			return 85  # Fixed token cost for low-res images
-		
-		# High-detail calculation (512x512 tiles)
-		width = image_url.get('width', 0)
-		height = image_url.get('height', 0)
-		
-		# Resize logic
-		scaled_width, scaled_height = self._resize_dimensions(width, height)
-		tile_count = ((scaled_width + 511) // 512) * ((scaled_height + 511) // 512)
-		return 85 + (tile_count * 170)
+		dimensions = image_dimensions(image_url.get('url', ''))
+		if not dimensions:
+			return self.IMG_TOKENS
+		return image_tokens(self.image_provider, *dimensions, detail=image_url.get('detail', 'high'))
 	
 	def _handle_embedded_images(self, text: str) -> int:
 		"""Count tokens for <image> markers in text content"""
@@ -229,14 +256,6 @@ class MessageManager:
 		tokens += self._count_text_tokens(clean_text)
 		return tokens
 	
-	def _resize_dimensions(self, width: int, height: int) -> tuple[int, int]:
-		"""Resize logic matching OpenAI's image processing"""
-		max_dim = 2048
-		if max(width, height) > max_dim:
-			ratio = max_dim / max(width, height)
-			return (int(width * ratio), int(height * ratio))
-		return (width, height)
-
 	def _count_text_tokens(self, text: str) -> int:
 		if isinstance(self.llm, ChatOpenAI):
 			try:
@@ -259,11 +278,12 @@ class MessageManager:
 			for item in msg.message.content:
 				if 'image_url' in item:
 					msg.message.content.remove(item)
-					diff -= self.IMG_TOKENS
-					msg.metadata.input_tokens -= self.IMG_TOKENS
-					self.history.total_tokens -= self.IMG_TOKENS
+					removed_tokens = self._count_image_tokens(item['image_url'])
+					diff -= removed_tokens
+					msg.metadata.input_tokens -= removed_tokens
+					self.history.total_tokens -= removed_tokens
 					logger.debug(
-						f'Removed image with {self.IMG_TOKENS} tokens - total tokens now: {self.history.total_tokens}/{self.max_input_tokens}'
+						f'Removed image with {removed_tokens} tokens - total tokens now: {self.history.total_tokens}/{self.max_input_tokens}'
 					)
 				elif 'text' in item and isinstance(item, dict):
 					text += item['text']
@@ -170,10 +170,10 @@ class AgentMessagePrompt:
         """
         # Unpack the text item and all image items
         text_item = next(item for item in state_content if item['type'] == 'text')
-        image_items = [item['image_url']['url'] for item in state_content if item['type'] == 'image_url']
+        image_items = [item['image_url'] for item in state_content if item['type'] == 'image_url']
         
         self.state = text_item['content']
-        self.image_urls = image_items  # Now storing all image URLs in a list
+        self.image_urls = image_items  # Whole image_url dicts, so a per-image detail is kept
         self.result = result
         self.max_error_length = max_error_length
         self.include_attributes = include_attributes
@@ -195,7 +195,7 @@ class AgentMessagePrompt:
         for image_url in self.image_urls:
             content.append({
                 "type": "image_url",
-                "image_url": {"url": image_url}
+                "image_url": dict(image_url)
             })
 
         # Add action results as text
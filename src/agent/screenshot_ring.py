@@ -0,0 +1,110 @@
+import io
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredFrame:
+    """One compressed frame; steps where the screen did not change share the same payload"""
+    step: int
+    payload: bytes
+    size: Tuple[int, int]
+    shared: bool = False  # payload belongs to an earlier step and is not counted twice
+
+
+class ScreenshotRing:
+    """
+    Recent screenshots kept PNG-compressed in memory, oldest evicted first.
+
+    A desktop frame compresses to a few hundred KB instead of the ~4.5 MB of a decoded
+    1512x982 RGB image, and the ring never holds more than `max_bytes` of payload (or
+    `max_frames` frames), so memory stays flat however long the agent runs. Frames are
+    decoded on demand by `get` / `latest`.
+
+    `add` compresses on the calling thread; the agent calls it through `asyncio.to_thread`.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_frames: Optional[int] = None, compress_level: int = 1):
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.compress_level = compress_level
+        self.nbytes = 0
+        self.evicted = 0
+        self._frames: OrderedDict = OrderedDict()  # step -> StoredFrame, oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __contains__(self, step: int) -> bool:
+        return step in self._frames
+
+    def add(self, step: int, image: Image.Image) -> StoredFrame:
+        """Compress `image` and store it as the frame for `step`"""
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', compress_level=self.compress_level)
+        return self._store(StoredFrame(step, buffer.getvalue(), image.size))
+
+    def add_unchanged(self, step: int) -> Optional[StoredFrame]:
+        """Record that `step` saw the same screen as the latest frame, without storing it again"""
+        with self._lock:
+            if not self._frames:
+                return None
+            latest = next(reversed(self._frames.values()))
+            if latest.step == step:
+                # Wait steps do not advance the step count; the frame is already there
+                return latest
+        return self._store(StoredFrame(step, latest.payload, latest.size, shared=True))
+
+    def _store(self, frame: StoredFrame) -> StoredFrame:
+        with self._lock:
+            old = self._frames.pop(frame.step, None)
+            if old is not None and not old.shared:
+                self.nbytes -= len(old.payload)
+            self._frames[frame.step] = frame
+            if not frame.shared:
+                self.nbytes += len(frame.payload)
+            self._evict()
+        return frame
+
+    def _evict(self) -> None:
+        # Always keep the newest frame, even if it alone is over the cap
+        while len(self._frames) > 1 and (
+            self.nbytes > self.max_bytes or (self.max_frames and len(self._frames) > self.max_frames)
+        ):
+            _, frame = self._frames.popitem(last=False)
+            self.evicted += 1
+            # A shared payload stays alive in the later steps; hand its accounting to the next one
+            following = next(iter(self._frames.values()))
+            if following.payload is frame.payload and following.shared:
+                following.shared = frame.shared
+            elif not frame.shared:
+                self.nbytes -= len(frame.payload)
+
+    def get(self, step: int) -> Optional[Image.Image]:
+        """Decoded frame for `step`, or None if it was never stored or has been evicted"""
+        with self._lock:
+            frame = self._frames.get(step)
+        if frame is None:
+            return None
+        image = Image.open(io.BytesIO(frame.payload))
+        image.load()
+        return image
+
+    def latest(self, before: Optional[int] = None) -> Optional[Image.Image]:
+        """Decoded newest frame, or the newest one older than step `before`"""
+        with self._lock:
+            steps = [step for step in self._frames if before is None or step < before]
+        return self.get(steps[-1]) if steps else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
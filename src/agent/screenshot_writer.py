@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MODES = ('all', 'sampled', 'disabled')
+
+
+class ScreenshotWriter:
+    """
+    Persists debug screenshots from a background thread.
+
+    Frames go through a bounded queue: when the disk cannot keep up, `save` waits at most
+    `put_timeout` seconds for room and then drops the frame, so debug capture never stalls a
+    step for long. Files are written with a fast PNG level. Once the files this writer has
+    written exceed `max_bytes` or `max_files`, the oldest of them are deleted; anything else in
+    `directory`, from earlier runs or not, is left alone.
+
+    Modes: 'all' saves every step, 'sampled' every `sample_every`-th step, 'disabled' nothing.
+    """
+
+    def __init__(
+        self,
+        directory: str = 'images',
+        mode: str = 'all',
+        sample_every: int = 5,
+        max_queue: int = 8,
+        put_timeout: float = 0.05,
+        compress_level: int = 1,
+        max_bytes: Optional[int] = 512 * 1024 * 1024,
+        max_files: Optional[int] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f'Unknown screenshot mode {mode!r}, expected one of {MODES}')
+        self.directory = directory
+        self.mode = mode
+        self.sample_every = max(1, sample_every)
+        self.put_timeout = put_timeout
+        self.compress_level = compress_level
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+        self._files: OrderedDict = OrderedDict()  # path -> size, oldest first
+        self._total_bytes = 0
+
+    def should_save(self, step: int) -> bool:
+        if self.mode == 'disabled':
+            return False
+        if self.mode == 'sampled':
+            return step % self.sample_every == 0
+        return True
+
+    async def save(self, image: Optional[Image.Image], filename: str) -> bool:
+        """Queue `image` to be written as `directory/filename`. Returns False if it was dropped."""
+        if image is None or self.mode == 'disabled':
+            return False
+        self._ensure_worker()
+        item = (image, os.path.join(self.directory, filename))
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        try:
+            await asyncio.to_thread(self._queue.put, item, True, self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f'Screenshot queue full, dropped {filename} ({self.dropped} dropped so far)')
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending frames and stop the worker thread"""
+        if self._worker is None:
+            return
+        self._queue.put(None)
+        self._worker.join(timeout)
+        self._worker = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, name='screenshot-writer', daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                image, path = item
+                self._write(image, path)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image: Image.Image, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            image.save(path, format='PNG', compress_level=self.compress_level)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logger.warning(f'Failed to save screenshot {path}: {e}')
+            return
+        self._track(path, size)
+        self._enforce_retention()
+
+    def _track(self, path: str, size: int) -> None:
+        # A rerun overwrites screenshot_1.png etc., which then counts as the newest file
+        self._total_bytes -= self._files.pop(path, 0)
+        self._files[path] = size
+        self._total_bytes += size
+
+    def _enforce_retention(self) -> None:
+        while self._files and (
+            (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+            or (self.max_files is not None and len(self._files) > self.max_files)
+        ):
+            path, size = self._files.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
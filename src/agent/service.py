@@ -27,7 +27,18 @@ from datetime import datetime
 from openai import RateLimitError
 from PIL import Image, ImageDraw, ImageFont
 from pydantic import BaseModel, ValidationError
+from src.agent.image_encoder import (
+    OPENAI_PROVIDERS,
+    ScreenshotEncoder,
+    fit_to_budget,
+    get_profile,
+    image_provider,
+    image_tokens,
+)
 from src.agent.message_manager.service import MessageManager
+from src.agent.screenshot_ring import ScreenshotRing
+from src.agent.screenshot_writer import ScreenshotWriter
+from src.agent.ui_state import UIStateDelta
 from src.agent.prompts import (
     SystemPrompt_turix,
     SystemPrompt,
@@ -43,6 +54,9 @@ from src.agent.views import (
 )
 from src.controller.registry.views import ActionModel
 from src.controller.service import Controller
+from src.mac.element import UI_STATE_MAX_TOKENS
+from src.mac.frames import plan_delta_regions
+from src.mac.snapshot import save_snapshot
 from src.mac.tree import MacUITreeBuilder
 from src.utils import time_execution_async
 from src.agent.output_schemas import OutputSchemas
@@ -53,12 +67,6 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar('T', bound=BaseModel)
 
-def screenshot_to_dataurl(screenshot):
-    img_byte_arr = io.BytesIO()
-    screenshot.save(img_byte_arr, format='PNG')
-    base64_encoded = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-    return f'data:image/png;base64,{base64_encoded}'
-
 def _get_installed_app_names() -> list[str]:
     """
     Returns a list of application names (minus ".app") 
@@ -134,6 +142,19 @@ class Agent:
         register_done_callback: Callable[['AgentHistoryList'], None] | None = None,
         tool_calling_method: Optional[str] = 'auto',
         agent_id: Optional[str] = None,
+        image_format: Optional[str] = None,
+        delta_screenshots: bool = False,
+        keyframe_interval: int = 5,
+        screenshot_writer: Optional[ScreenshotWriter] = None,
+        screenshot_ring: Optional[ScreenshotRing] = None,
+        delta_ui_state: bool = False,
+        ui_state_full_every: int = 5,
+        tree_snapshot_dir: Optional[str] = None,
+        tree_deadline: Optional[float] = None,
+        tree_max_nodes: Optional[int] = None,
+        ui_state_max_tokens: Optional[int] = UI_STATE_MAX_TOKENS,
+        multi_window: bool = False,
+        incremental_tree: bool = False,
     ):
         self.current_time = datetime.now()
         self.wait_this_step = False
@@ -148,13 +169,47 @@ class Agent:
 
         self.include_attributes = include_attributes
         self.max_error_length = max_error_length
-        self.screenshot_annotated = None
         self.short_memory_len = short_memory_len
         self.max_input_tokens = max_input_tokens
         self.save_temp_file_path = os.path.join(os.path.dirname(__file__), 'temp_files')
         self.use_ui = use_ui
 
-        self.mac_tree_builder = MacUITreeBuilder()
+        # tree_deadline (seconds) and tree_max_nodes bound the UI tree build of every step;
+        # a huge app then yields a partial element list instead of stalling the step.
+        # multi_window also lists the app's panels and secondary windows, front to back;
+        # incremental_tree patches the tree from accessibility notifications between steps
+        self.mac_tree_builder = MacUITreeBuilder(
+            build_deadline=tree_deadline, max_nodes=tree_max_nodes, multi_window=multi_window,
+            incremental=incremental_tree,
+        )
+        # Apps that quit since the last state message, reported by the builder's process monitor
+        self._terminated_pids = []
+        self.mac_tree_builder.process_monitor.on_terminated(self._on_app_terminated)
+        self.image_provider = image_provider(llm)
+        # image_format overrides the per-provider default ('png', 'jpeg' or 'webp')
+        self.screenshot_encoder = ScreenshotEncoder(get_profile(image_format, self.image_provider))
+        # Delta mode sends a half-resolution frame plus full-resolution crops of what changed
+        # since the last keyframe; a full keyframe goes out every `keyframe_interval` steps
+        self.delta_screenshots = delta_screenshots
+        self.keyframe_interval = keyframe_interval
+        self._keyframe = None
+        self._keyframe_step = 0
+        self._last_image_content = None
+        # Debug screenshots are written to images/ off the hot path
+        self.screenshot_writer = screenshot_writer or ScreenshotWriter()
+        # Opt-in: pass a ScreenshotRing to keep recent frames compressed under a byte cap, for
+        # screenshot_annotated / previous_screenshot. Off by default, as every changed frame
+        # costs a PNG compression
+        self.screenshots = screenshot_ring
+        # Delta mode keeps the full UI element list as a baseline message and sends only what
+        # changed relative to it; see src.agent.ui_state
+        self.ui_state = UIStateDelta(full_every=ui_state_full_every) if delta_ui_state else None
+        # Larger element lists keep their shallowest elements, see MacElementNode._get_visible_clickable_elements_string
+        self.ui_state_max_tokens = ui_state_max_tokens
+        # Each step's UI tree is saved here (src.mac.snapshot format) for replay and measurements
+        self.tree_snapshot_dir = tree_snapshot_dir
+        if tree_snapshot_dir:
+            os.makedirs(tree_snapshot_dir, exist_ok=True)
         self.controller = controller
         self.max_actions_per_step = max_actions_per_step
         self.last_step_action = None
@@ -224,6 +279,15 @@ class Agent:
         self.ActionModel = self.controller.registry.create_action_model()
         self.AgentOutput = AgentOutput.type_with_custom_actions(self.ActionModel)
 
+    def _on_app_terminated(self, pid: int) -> None:
+        """Stop targeting an app that quit and tell the model in the next state message"""
+        self._terminated_pids.append(pid)
+        if self.last_pid == pid:
+            self.last_pid = None
+        for r in self._last_result or []:
+            if r.current_app_pid == pid:
+                r.current_app_pid = None
+
     def get_last_pid(self) -> Optional[int]:
         latest_pid = self.last_pid
         if self._last_result:
@@ -281,15 +345,50 @@ class Agent:
         
         try:
             #---------------------------
-            # 1) Build the UI tree and capture a screenshot
+            # 1) Capture a screenshot and build the UI tree,
+            #    the screenshot is encoded off-loop while the tree is walked
             #---------------------------
-            
+            screenshot = self.mac_tree_builder.capture_screenshot()
+            screen_unchanged = (
+                screenshot is not None
+                and self.mac_tree_builder.screen_unchanged
+                and self._last_image_content is not None
+            )
+            if screenshot is None:
+                # The capture failed and was logged; carry on with the UI tree alone
+                image_jobs = None
+            elif screen_unchanged:
+                # Same frame as last step: reuse its data URLs, nothing to encode
+                logger.debug('Screen unchanged, reusing the previous encoded screenshot')
+                image_jobs = None
+            else:
+                image_jobs = self._submit_screenshot(screenshot)
+            frame_job = None
+            if self.screenshots is not None and screenshot is not None:
+                if self.mac_tree_builder.screen_unchanged:
+                    self.screenshots.add_unchanged(self.n_steps)
+                else:
+                    frame_job = asyncio.create_task(asyncio.to_thread(self.screenshots.add, self.n_steps, screenshot))
+
+            snapshot_job = None
+            tree_truncated = False
             logger.debug(f'Last PID: {self.last_pid}')
             if self.use_ui:
                 self.last_pid = self.get_last_pid()
                 root = await self.mac_tree_builder.build_tree(self.last_pid)
+                crawl_stats = self.mac_tree_builder.last_crawl_stats
+                tree_truncated = bool(root and crawl_stats and crawl_stats.truncated)
             # if root and self.use_ui:
-                state = root._get_visible_clickable_elements_string() if root else "No UI tree found."
+                state = root._get_visible_clickable_elements_string(self.ui_state_max_tokens) if root else "No UI tree found."
+                if root and self.tree_snapshot_dir:
+                    path = os.path.join(self.tree_snapshot_dir, f'tree_{self.n_steps}.json.gz')
+                    snapshot_job = asyncio.create_task(asyncio.to_thread(save_snapshot, root, path))
+                if self.ui_state and self.n_steps >= 2:
+                    baseline, state = self.ui_state.update(root, state if root else '')
+                    if baseline is not None:
+                        self.agent_message_manager.set_ui_baseline(baseline)
+                    if not root:
+                        state = "No UI tree found."
             else:
                 state = ''
             if self.n_steps == 1:
@@ -297,58 +396,68 @@ class Agent:
                 app_list = ', '.join(apps)
                 state = f'The available apps in this macbook is: {app_list}'
             self.save_memory()
+            if image_jobs:
+                image_content = await self._collect_images(image_jobs)
+            elif screenshot is None:
+                image_content = ([], [])
+            else:
+                image_content = self._last_image_content
+            self._last_image_content = image_content if screenshot is not None else None
+            if frame_job:
+                await frame_job
+            if snapshot_job:
+                await snapshot_job
+            regions, image_items = image_content
+            # The state message is pruned after every step, so the image is still attached;
+            # the note lets the model know its last actions had no visible effect.
+            screen_note = 'The screen has not changed since the previous step.\n\n' if screen_unchanged else ''
+            if screenshot is None:
+                screen_note = 'No screenshot could be captured this step, rely on the UI element list.\n\n'
+            if self._terminated_pids:
+                pids = ', '.join(str(pid) for pid in self._terminated_pids)
+                screen_note += f'The app you were using (PID {pids}) has quit. Open it again if it is still needed.\n\n'
+                self._terminated_pids.clear()
+            if tree_truncated:
+                screen_note += 'The UI element list is incomplete: the app has more elements than could be read this step. Use the screenshot for anything missing from it.\n\n'
+            screen_note += self._image_note(regions, screen_unchanged)
             
             # ---------------------------
             # 2) Define the input message for the agent
             # ---------------------------
+            save_debug_images = screenshot is not None and self.screenshot_writer.should_save(self.n_steps)
             if self.n_steps >= 2:
-                self.previous_screenshot = self.screenshot_annotated
-                screenshot = self.mac_tree_builder.capture_screenshot()
-                if self.use_ui:
+                if self.use_ui and save_debug_images:
                     annotated_screenshot = self.mac_tree_builder.annotate_screenshot(root)
-                    screenshot_filename = f'images/screenshot_to_use_{self.n_steps}.png'
-                    annotated_screenshot.save(screenshot_filename) 
-                # self.screenshot_annotated = annotated_screenshot or screenshot
-                self.screenshot_annotated = screenshot # Use annotated screenshot if you like
-                # delete the local save later
-                screenshot.save(f'images/screenshot_{self.n_steps}.png')
+                    await self.screenshot_writer.save(annotated_screenshot, f'screenshot_to_use_{self.n_steps}.png')
+                if save_debug_images:
+                    await self.screenshot_writer.save(screenshot, f'screenshot_{self.n_steps}.png')
                 if self.use_ui:
                     state_content = [
                         {
                             "type": "text",
-                            "content": f"State is: {state}\n\n The previous action is evaluated to be successful.\n\n Saved information memory: {self.infor_memory}\n\n"
+                            "content": f"State is: {state}\n\n {screen_note}The previous action is evaluated to be successful.\n\n Saved information memory: {self.infor_memory}\n\n"
                             f"{self.short_memory}"
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": screenshot_to_dataurl(self.screenshot_annotated)},
-                        }
+                        *image_items,
                     ]
                 else:
                     state_content = [
                         {
                             "type": "text",
-                            "content": f"The previous action is evaluated to be successful.\n\n Saved information memory: {self.infor_memory}\n\n"
+                            "content": f"{screen_note}The previous action is evaluated to be successful.\n\n Saved information memory: {self.infor_memory}\n\n"
                             f"{self.short_memory}"
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": screenshot_to_dataurl(self.screenshot_annotated)},
-                        }
+                        *image_items,
                     ]
             else:
-                screenshot = self.mac_tree_builder.capture_screenshot()
-                self.screenshot_annotated = screenshot
-                screenshot.save(f'images/screenshot_{self.n_steps}.png')
+                if save_debug_images:
+                    await self.screenshot_writer.save(screenshot, f'screenshot_{self.n_steps}.png')
                 state_content = [
                     {
                         "type": "text",
                         "content": f"State is: {state}"
                     },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": screenshot_to_dataurl(screenshot)},
-                    }]
+                    *image_items]
             self.agent_message_manager._remove_last_AIntool_message()
             self.agent_message_manager._remove_last_state_message()
             self.agent_message_manager.add_state_message(state_content, self._last_result, step_info)
@@ -379,11 +488,6 @@ class Agent:
             if information_stored != 'None':
                 self.infor_memory.append({f'Step {self.n_steps}, the information stored is: {information_stored}'})
             
-            if self.use_ui:
-                for i in range(len(model_output.action)):
-                    if 'open_app' in str(model_output.action[i]):
-                        logger.debug(f'Found open_app action, building the tree again')
-                        await self.mac_tree_builder.build_tree(self.get_last_pid())
             if len(self.last_step_action) == 0:
                 self.wait_this_step = True
             elif 'wait' in str(self.last_step_action[0]):
@@ -412,6 +516,75 @@ class Agent:
             if not self.wait_this_step:
                 self.n_steps += 1
 
+    @property
+    def screenshot_annotated(self) -> Optional[Image.Image]:
+        """This step's screenshot, decoded from the ring; None without a screenshot_ring"""
+        return self.screenshots.latest() if self.screenshots is not None else None
+
+    @property
+    def previous_screenshot(self) -> Optional[Image.Image]:
+        """The newest screenshot from an earlier step, decoded from the ring; None without a screenshot_ring"""
+        return self.screenshots.latest(before=self.n_steps) if self.screenshots is not None else None
+
+    def _submit_screenshot(self, screenshot: Image.Image) -> list:
+        """
+        Start encoding this step's images on the encoder pool, before the UI tree is built.
+        Images are sized to what the provider can use and to the tokens left in the context.
+        Returns (box, detail, future) triples where box is the normalized crop box, or None
+        for a whole frame.
+        """
+        budget = self.agent_message_manager.image_token_budget()
+        width, height = screenshot.size
+        if (
+            self.delta_screenshots
+            and self._keyframe is not None
+            and self.n_steps - self._keyframe_step < self.keyframe_interval
+        ):
+            regions = plan_delta_regions(self._keyframe, screenshot)
+            if regions:
+                images = [(None, screenshot.reduce(2))]
+                for x0, y0, x1, y1 in regions:
+                    box = (x0 / width, y0 / height, x1 / width, y1 / height)
+                    images.append((box, screenshot.crop((x0, y0, x1, y1))))
+                cost = sum(image_tokens(self.image_provider, *image.size) for _, image in images)
+                if cost <= budget:
+                    logger.debug(f'Sending {len(regions)} changed regions instead of a full frame')
+                    return [(box, 'high', self.screenshot_encoder.submit(image)) for box, image in images]
+
+        self._keyframe = screenshot
+        self._keyframe_step = self.n_steps
+        fit_width, fit_height, detail = fit_to_budget(self.image_provider, width, height, budget)
+        if (fit_width, fit_height) != (width, height):
+            logger.debug(f'Sending screenshot at {fit_width}x{fit_height} ({detail}) to fit {budget} tokens')
+        return [(None, detail, self.screenshot_encoder.submit(screenshot, size=(fit_width, fit_height)))]
+
+    async def _collect_images(self, jobs: list) -> tuple[list[tuple], list[dict]]:
+        """Await the encoded images; returns the crop boxes (none for a whole frame) and the image items"""
+        encoded = await asyncio.gather(*(future for _, _, future in jobs))
+        items = []
+        for (_, detail, _), image in zip(jobs, encoded):
+            image_url = {"url": image.data_url}
+            if self.image_provider in OPENAI_PROVIDERS:
+                image_url["detail"] = detail
+            items.append({"type": "image_url", "image_url": image_url})
+        return [box for box, _, _ in jobs[1:]], items
+
+    @staticmethod
+    def _image_note(regions: list[tuple], reused: bool) -> str:
+        """Describe the crops attached after a half-resolution frame; reused images are not news"""
+        if not regions:
+            return ''
+        if reused:
+            lines = ['The images are those of the previous step: the whole screen at half resolution, '
+                     'then regions of it at full resolution in this order (normalized x0, y0, x1, y1):']
+        else:
+            lines = ['The first image is the whole screen at half resolution. The screen changed only in '
+                     'the regions below, each attached at full resolution in this order '
+                     '(normalized x0, y0, x1, y1):']
+        for i, box in enumerate(regions, start=1):
+            lines.append(f'{i}. ({box[0]:.3f}, {box[1]:.3f}, {box[2]:.3f}, {box[3]:.3f})')
+        return '\n'.join(lines) + '\n\n'
+
     async def _handle_step_error(self, error: Exception) -> list[ActionResult]:
         include_trace = logger.isEnabledFor(logging.DEBUG)
         error_msg = AgentError.format_error(error, include_trace=include_trace)
@@ -574,6 +747,8 @@ class Agent:
         except Exception:
             logger.exception('Error running agent')
             raise
+        finally:
+            self.screenshot_writer.close()
 
 
     def _too_many_failures(self) -> bool:
@@ -609,4 +784,5 @@ class Agent:
             include_attributes=self.include_attributes,
             max_error_length=self.max_error_length,
             max_actions_per_step=self.max_actions_per_step,
+            image_provider=self.image_provider,
         )
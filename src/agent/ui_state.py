@@ -0,0 +1,142 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from src.mac.element import MacElementNode
+from src.mac.paths import element_keys
+
+logger = logging.getLogger(__name__)
+
+FULL_LIST_NOTE = 'The UI element list is given in full above.'
+UNCHANGED_NOTE = 'The UI element list above is unchanged.'
+
+
+def state_lines(root: MacElementNode) -> Dict[str, str]:
+    """Accessibility path -> line, for the elements listed in the UI state, in listing order"""
+    lines = {}
+    for node, path, _ in element_keys(root):
+        line = node._state_line()
+        if line is not None:
+            # Paths can repeat for identical siblings; the line, minus its index, keeps them apart
+            key, body, n = path, split_line(line)[1], 1
+            while key in lines:
+                key, n = f'{path}#{body}#{n}', n + 1
+            lines[key] = line
+    return lines
+
+
+def split_line(line: str) -> Tuple[str, str]:
+    """(highlight index, rest) of a UI state line; the index shifts whenever an element is added before it"""
+    index, sep, rest = line.partition('[:]')
+    return (index, sep + rest) if sep else ('', line)
+
+
+def renumbering(moves: List[Tuple[int, int]]) -> str:
+    """'12-40 → 13-41, 55 → 50' for (old, new) index pairs in listing order, runs with the same shift merged"""
+    runs = []
+    for old, new in moves:
+        if runs and new - old == runs[-1][2] - runs[-1][0] and old > runs[-1][1]:
+            runs[-1][1], runs[-1][3] = old, new
+        else:
+            runs.append([old, old, new, new])
+    return ', '.join(
+        f'{first} → {new_first}' if first == last else f'{first}-{last} → {new_first}-{new_last}'
+        for first, last, new_first, new_last in runs
+    )
+
+
+class UIStateDelta:
+    """
+    Sends the UI element list in full only every `full_every` steps. The full list becomes a
+    baseline message that stays in the conversation (MessageManager.set_ui_baseline), and
+    the state messages in between carry only the lines added, removed or changed since
+    that baseline, and the current index of every baseline element whose index moved.
+    Lines are compared without their index, so an element added near the top costs one
+    line and one renumbered range, not a changed line for everything below it. A new
+    baseline is sent sooner when the delta grows past `max_delta_ratio` of the full list
+    or the app changes.
+    """
+
+    def __init__(self, full_every: int = 5, max_delta_ratio: float = 0.5):
+        self.full_every = max(1, full_every)
+        self.max_delta_ratio = max_delta_ratio
+        self._baseline: Optional[Dict[str, str]] = None
+        self._baseline_pid = None
+        self._steps_since_full = 0
+        self.last_mode = None  # 'full', 'delta' or None when there was no list
+
+    def reset(self) -> None:
+        self._baseline = None
+        self._baseline_pid = None
+        self._steps_since_full = 0
+
+    def update(self, root: Optional[MacElementNode], full_text: str) -> Tuple[Optional[str], str]:
+        """
+        (baseline, state) for this step. `full_text` is the complete list as the agent would
+        send it, '' when there is none. `baseline` is the text of a new baseline message, ''
+        to drop the current one, or None to keep it; `state` goes into the state message.
+        """
+        if root is None or not full_text:
+            self.last_mode = None
+            dropped = '' if self._baseline is not None else None
+            self.reset()
+            return dropped, full_text
+        lines = state_lines(root)
+        if len(lines) > full_text.count('\n') + 1:
+            # The list was cut to its token budget; track only the elements it shows
+            listed = set(full_text.split('\n'))
+            lines = {key: line for key, line in lines.items() if line in listed}
+        if self._baseline is None or self._baseline_pid != root.app_pid or self._steps_since_full >= self.full_every:
+            return self._full(root, lines, full_text)
+
+        baseline = self._baseline
+        added, changed, moves = [], [], []
+        for key, line in lines.items():
+            if key not in baseline:
+                added.append(line)
+                continue
+            old_index, old_body = split_line(baseline[key])
+            index, body = split_line(line)
+            if body != old_body:
+                changed.append(line)
+            elif index != old_index and old_index.isdigit() and index.isdigit():
+                moves.append((int(old_index), int(index)))
+        removed = [line for key, line in baseline.items() if key not in lines]
+        if added and removed:
+            # A sibling inserted before an element changes its path but not its line
+            gone: Dict[str, List[str]] = {}
+            for line in removed:
+                gone.setdefault(split_line(line)[1], []).append(line)
+            still_added = []
+            for line in added:
+                index, body = split_line(line)
+                if gone.get(body):
+                    old_index = split_line(gone[body].pop(0))[0]
+                    if index != old_index and old_index.isdigit() and index.isdigit():
+                        moves.append((int(old_index), int(index)))
+                else:
+                    still_added.append(line)
+            added = still_added
+            removed = [line for lines_ in gone.values() for line in lines_]
+        if len(added) + len(changed) + len(removed) > self.max_delta_ratio * max(len(lines), 1):
+            return self._full(root, lines, full_text)
+
+        self._steps_since_full += 1
+        self.last_mode = 'delta'
+        if not (added or changed or removed or moves):
+            return None, UNCHANGED_NOTE
+        unchanged = len(lines) - len(added) - len(changed)
+        parts = [f'Changes to the UI element list above ({unchanged} elements are as listed there):']
+        if moves:
+            moves.sort(key=lambda move: move[0])
+            parts.append(f'Renumbered, index above → current index: {renumbering(moves)}')
+        parts.extend(f'+ {line}' for line in added)
+        parts.extend(f'~ {line}' for line in changed)
+        parts.extend(f'- {line}' for line in removed)
+        return None, '\n'.join(parts)
+
+    def _full(self, root: MacElementNode, lines: Dict[str, str], full_text: str) -> Tuple[str, str]:
+        self._baseline = lines
+        self._baseline_pid = root.app_pid
+        self._steps_since_full = 1
+        self.last_mode = 'full'
+        return full_text, FULL_LIST_NOTE
@@ -29,6 +29,7 @@ class ActionResult(BaseModel):
     include_in_memory: bool = False  # whether to include in past messages as context or not
     current_app_pid: Optional[int] = None
     action_is_valid: Optional[bool] = True
+    hit_element: Optional[str] = None  # the UI element a pointer action landed on, if the tree has one there
 
 
 class AgentBrain(BaseModel):
@@ -23,6 +23,7 @@ from src.controller.views import (
 
 
 from src.mac.actions import type_into, press, _scroll_invisible_at_position, move_to, left_click_pixel, right_click_pixel, press_combination, drag_pixel
+from src.mac.spatial import center
 from src.mac.tree import MacUITreeBuilder
 from src.utils import time_execution_async, time_execution_sync
 
@@ -143,11 +144,28 @@ def has_app_windows(pid: int) -> bool:
     return False
 
 class Controller:
+	# Action name -> the parameter holding the point it acts on
+	POINTER_ACTIONS = {
+		'Click': 'position',
+		'RightSingle': 'position',
+		'move_mouse': 'position',
+		'scroll_up': 'position',
+		'scroll_down': 'position',
+		'Drag': 'position1',
+	}
+	# Only clicks are moved; a drag or scroll target need not be an element's center
+	SNAP_ACTIONS = {'Click', 'RightSingle'}
+
 	def __init__(
 		self,
 		exclude_actions: list[str] = [],
+		snap_clicks: bool = False,
+		snap_distance: float = 0.02,
 	):
 		self.exclude_actions = exclude_actions
+		# Move clicks to the center of the element under (or within snap_distance of) the point
+		self.snap_clicks = snap_clicks
+		self.snap_distance = snap_distance
 		self.registry = Registry(exclude_actions)
 		self._register_default_actions()
 		self.mac_tree_builder = MacUITreeBuilder()
@@ -461,7 +479,15 @@ class Controller:
 		results = []
 		if action_valid:
 			for i, action in enumerate(actions):
-				results.append(await self.act(action, mac_tree_builder))
+				target = self._pointer_target(action, mac_tree_builder)
+				result = await self.act(action, mac_tree_builder)
+				if mac_tree_builder is not None and self._is_pointer_action(action):
+					mac_tree_builder.require_full_rebuild()
+				if target is not None and not result.error:
+					result.hit_element = target._format_short_element()
+					if result.extracted_content:
+						result.extracted_content += f' on {result.hit_element}'
+				results.append(result)
 				await asyncio.sleep(0.5)
 
 				logger.debug(f'Executed action {i + 1} / {len(actions)}')
@@ -472,6 +498,28 @@ class Controller:
 		else:
 			return [ActionResult(error="Invalid action, index is out of the UI Tree. Please use the screenshot to determine the correct pixel to act on.",include_in_memory=True)]
 
+	def _is_pointer_action(self, action: ActionModel) -> bool:
+		return any(params and name in self.POINTER_ACTIONS for name, params in action.model_dump(exclude_unset=True).items())
+
+	def _pointer_target(self, action: ActionModel, mac_tree_builder: Optional[MacUITreeBuilder]):
+		"""The element a pointer action lands on, snapping clicks to its center when enabled"""
+		if mac_tree_builder is None:
+			return None
+		for action_name, params in action.model_dump(exclude_unset=True).items():
+			field = self.POINTER_ACTIONS.get(action_name)
+			if not params or field is None or not params.get(field):
+				continue
+			x, y = params[field][:2]
+			index = mac_tree_builder.spatial_index
+			snap = self.snap_clicks and action_name in self.SNAP_ACTIONS
+			target = index.nearest(x, y, self.snap_distance) if snap else index.hit(x, y)
+			if target is not None and snap:
+				snapped = list(center(target))
+				logger.debug(f'Snapping {action_name} from {[x, y]} to {snapped}, the center of {target}')
+				setattr(getattr(action, action_name), field, snapped)
+			return target
+		return None
+
 	@time_execution_sync('--act')
 	async def act(self, action: ActionModel, mac_tree_builder: MacUITreeBuilder) -> ActionResult:
 		"""Execute an action"""
@@ -14,6 +14,7 @@ from ApplicationServices import (
 from pynput.keyboard import Controller
 from typing import Optional
 from src.mac.element import MacElementNode
+from src.mac.geometry import screen_geometry
 
 logger = logging.getLogger(__name__)
 
@@ -25,11 +26,8 @@ kb = Controller()
 # ------------------------------------------------
 
 def _get_screen_size():
-    """Return (width, height) of the main display in pixels."""
-    display_id = Quartz.CGMainDisplayID()
-    width = Quartz.CGDisplayPixelsWide(display_id)
-    height = Quartz.CGDisplayPixelsHigh(display_id)
-    return width, height
+    """Return (width, height) of the main display in points (cached, see src.mac.geometry)."""
+    return screen_geometry().size
 
 def _get_current_mouse_position():
     """Return the current mouse cursor position as a (x, y) tuple in absolute pixels."""
@@ -57,7 +55,7 @@ def _post_mouse_event(x, y, event_type, button):
     Quartz.CGEventPost(Quartz.kCGSessionEventTap, event)
 
 async def flash_click_highlight(x, y, radius=16, duration=1.0):
-    screen_width, screen_height = pyautogui.size()
+    screen_width, screen_height = _get_screen_size()
     y = screen_height - y  # Convert to Quartz's coordinate system
     """Red ring for <duration>s; returns immediately (no seg-fault)."""
     # -- create overlay window ------------------------------------------------
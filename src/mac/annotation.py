@@ -0,0 +1,132 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from src.mac.element import MacElementNode
+
+logger = logging.getLogger(__name__)
+
+COLOR_PALETTE = ['red', 'blue', 'green', 'yellow', 'purple']
+FONT_SIZE = 16
+
+
+class AnnotationRenderer:
+    """
+    Draws highlight boxes and index labels onto a screenshot.
+
+    The font, the digit glyphs and the label bitmaps built from them are cached for the
+    lifetime of the renderer. Box outlines are written straight into a NumPy copy of the
+    frame in one vectorised pass per edge.
+    """
+
+    def __init__(self, font_size: int = FONT_SIZE, palette: Sequence[str] = COLOR_PALETTE):
+        self.font_size = font_size
+        self.palette = [ImageColor.getrgb(color) for color in palette]
+        self._font: Optional[ImageFont.ImageFont] = None
+        self._glyphs: Dict[str, Tuple[int, int, int, Image.Image]] = {}  # char -> (dx, dy, advance, mask)
+        self._labels: Dict[str, Tuple[int, int, Image.Image]] = {}  # text -> (dx, dy, mask)
+
+    @property
+    def font(self) -> ImageFont.ImageFont:
+        if self._font is None:
+            self._font = ImageFont.load_default().font_variant(size=self.font_size)
+        return self._font
+
+    def _glyph(self, char: str) -> Tuple[int, int, int, Image.Image]:
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            left, top, right, bottom = self.font.getbbox(char)
+            mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+            ImageDraw.Draw(mask).text((-left, -top), char, fill=255, font=self.font)
+            glyph = (left, top, int(round(self.font.getlength(char))), mask)
+            self._glyphs[char] = glyph
+        return glyph
+
+    def _label(self, text: str) -> Tuple[int, int, Image.Image]:
+        """Label bitmap composed from cached digit glyphs, so only ten glyphs are ever rasterised"""
+        label = self._labels.get(text)
+        if label is None:
+            glyphs = [self._glyph(char) for char in text]
+            top = min(g[1] for g in glyphs)
+            bottom = max(g[1] + g[3].height for g in glyphs)
+            width = sum(g[2] for g in glyphs[:-1]) + glyphs[-1][0] + glyphs[-1][3].width
+            mask = Image.new('L', (max(1, width), max(1, bottom - top)), 0)
+            x = 0
+            for left, glyph_top, advance, glyph in glyphs:
+                mask.paste(glyph, (x + left, glyph_top - top))
+                x += advance
+            label = (0, top, mask)
+            self._labels[text] = label
+        return label
+
+    @staticmethod
+    def collect_boxes(root: MacElementNode) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Flatten the on-screen highlighted elements of a tree into
+        boxes (N, 4) of normalized x, y, w, h and their highlight indexes (N,).
+        """
+        boxes: List[Tuple[float, float, float, float]] = []
+        indexes: List[int] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.on_screen and node.highlight_index is not None:
+                position = node.attributes.get('position')
+                size = node.attributes.get('size')
+                if position and size:
+                    boxes.append((position[0], position[1], size[0], size[1]))
+                    indexes.append(int(node.highlight_index))
+            stack.extend(reversed(node.children))
+        return np.array(boxes, dtype=np.float64).reshape(-1, 4), np.array(indexes, dtype=np.int64)
+
+    def render(
+        self,
+        screenshot: Image.Image,
+        boxes: np.ndarray,
+        indexes: np.ndarray,
+        clip: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Image.Image:
+        """
+        Draw `boxes` (normalized x, y, w, h) onto a copy of `screenshot`.
+        `clip` is an optional (x0, y0, x1, y1) pixel rectangle boxes are clipped to, e.g. the window.
+        """
+        image = screenshot if screenshot.mode in ('RGB', 'RGBA') else screenshot.convert('RGB')
+        pixels = np.array(image)
+        height, width = pixels.shape[:2]
+        if len(boxes):
+            wx1, wy1, wx2, wy2 = clip if clip else (0, 0, width, height)
+            x0 = np.maximum(boxes[:, 0] * width, wx1)
+            y0 = np.maximum(boxes[:, 1] * height, wy1)
+            x1 = np.minimum((boxes[:, 0] + boxes[:, 2]) * width, wx2)
+            y1 = np.minimum((boxes[:, 1] + boxes[:, 3]) * height, wy2)
+            x0, y0 = np.clip(x0, 0, width - 1).astype(np.int64), np.clip(y0, 0, height - 1).astype(np.int64)
+            x1, y1 = np.clip(x1, 0, width - 1).astype(np.int64), np.clip(y1, 0, height - 1).astype(np.int64)
+            keep = (x1 >= x0) & (y1 >= y0)
+            x0, y0, x1, y1, indexes = x0[keep], y0[keep], x1[keep], y1[keep], indexes[keep]
+            colors = np.array(self.palette, dtype=np.uint8)[indexes % len(self.palette)]
+            if pixels.shape[2] == 4:
+                colors = np.concatenate([colors, np.full((len(colors), 1), 255, dtype=np.uint8)], axis=1)
+
+            # Horizontal edges, then vertical edges, each as one fancy-indexed assignment
+            for row in (y0, y1):
+                ys, xs, color = _expand_runs(row, x0, x1 - x0 + 1, colors)
+                pixels[ys, xs] = color
+            for column in (x0, x1):
+                xs, ys, color = _expand_runs(column, y0, y1 - y0 + 1, colors)
+                pixels[ys, xs] = color
+
+        annotated = Image.fromarray(pixels)
+        if len(boxes):
+            for x, y, number, color in zip(x0.tolist(), y0.tolist(), indexes.tolist(), colors.tolist()):
+                dx, dy, mask = self._label(str(number))
+                annotated.paste(tuple(color), (x + dx, y + dy, x + dx + mask.width, y + dy + mask.height), mask)
+        return annotated
+
+
+def _expand_runs(fixed: np.ndarray, start: np.ndarray, length: np.ndarray, colors: np.ndarray):
+    """Pixel coordinates of N straight runs: `fixed` is the constant axis, runs go from `start` for `length`."""
+    total = int(length.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(length) - length, length)
+    return np.repeat(fixed, length), np.repeat(start, length) + offsets, np.repeat(colors, length, axis=0)
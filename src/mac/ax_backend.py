@@ -0,0 +1,286 @@
+import itertools
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Error codes from AXError.h, so the fake backend needs no ApplicationServices
+AX_ERROR_SUCCESS = 0
+AX_ERROR_FAILURE = -25200
+AX_ERROR_ATTRIBUTE_UNSUPPORTED = -25205
+AX_ERROR_NO_VALUE = -25212
+# kAXValueCGPointType / kAXValueCGSizeType
+AX_VALUE_CG_POINT = 1
+AX_VALUE_CG_SIZE = 2
+
+# Everything MacUITreeBuilder reads for one node, fetched in a single request
+NODE_ATTRIBUTES = (
+    'AXRole',
+    'AXTitle',
+    'AXValue',
+    'AXDescription',
+    'AXEnabled',
+    'AXSubrole',
+    'AXPosition',
+    'AXSize',
+    'AXChildren',
+)
+# With visibility culling the bounds are read first, the rest only for elements that are kept
+GEOMETRY_ATTRIBUTES = ('AXPosition', 'AXSize')
+DETAIL_ATTRIBUTES = tuple(attribute for attribute in NODE_ATTRIBUTES if attribute not in GEOMETRY_ATTRIBUTES)
+# What multi-window mode reads of every window to order, filter and cache them
+WINDOW_ATTRIBUTES = ('AXTitle', 'AXPosition', 'AXSize', 'AXMinimized')
+
+
+@dataclass
+class AXCallStats:
+    """Accessibility IPC round trips made, and what fetching one attribute at a time would have cost"""
+    calls: int = 0
+    unbatched_calls: int = 0
+    elements: int = 0
+
+    @property
+    def saved(self) -> int:
+        return self.unbatched_calls - self.calls
+
+    def reset(self) -> None:
+        self.calls = self.unbatched_calls = self.elements = 0
+
+    def __str__(self) -> str:
+        return (f'{self.calls} AX calls for {self.elements} elements '
+                f'({self.unbatched_calls} unbatched, {self.saved} saved)')
+
+
+class AXBackend(ABC):
+    """
+    How MacUITreeBuilder talks to the accessibility API.
+
+    Values come back as plain Python: AXPosition and AXSize as (x, y) / (w, h) tuples in
+    screen points, AXChildren as a list. Missing or unsupported attributes are None.
+    """
+
+    def __init__(self):
+        self.stats = AXCallStats()
+        # Backends are called from the parallel crawl's worker threads
+        self._stats_lock = threading.Lock()
+
+    def _count(self, calls: int = 1, unbatched: int = 1, elements: int = 0) -> None:
+        with self._stats_lock:
+            self.stats.calls += calls
+            self.stats.unbatched_calls += unbatched
+            self.stats.elements += elements
+
+    @abstractmethod
+    def application(self, pid: int) -> Any:
+        """The application element for `pid`"""
+
+    @abstractmethod
+    def copy_attribute(self, element: Any, attribute: str) -> Tuple[int, Any]:
+        """(error, value) for one attribute, like AXUIElementCopyAttributeValue"""
+
+    @abstractmethod
+    def fetch(self, element: Any, attributes: Sequence[str] = NODE_ATTRIBUTES) -> Dict[str, Any]:
+        """Several attributes of one element in as few round trips as the backend allows"""
+
+    @abstractmethod
+    def actions(self, element: Any) -> List[str]:
+        """Action names of an element, empty if it has none"""
+
+    @abstractmethod
+    def attribute_names(self, element: Any) -> List[str]:
+        """Every attribute the element supports"""
+
+    def element_key(self, element: Any) -> Hashable:
+        """
+        A cheap hashable identity for `element`, equal for two references to the same UI
+        element. Used to skip elements already crawled and to key context nodes.
+        """
+        return element
+
+    def attribute(self, element: Any, attribute: str) -> Any:
+        """One attribute's value, None on any error"""
+        error, value = self.copy_attribute(element, attribute)
+        return value if error == AX_ERROR_SUCCESS else None
+
+
+class SystemAXBackend(AXBackend):
+    """
+    The macOS accessibility API through PyObjC.
+
+    `fetch` uses AXUIElementCopyMultipleAttributeValues, one IPC round trip per element
+    instead of one per attribute. With `batch=False`, or if the batched call fails for an
+    element, attributes are read one by one.
+    """
+
+    def __init__(self, batch: bool = True):
+        super().__init__()
+        import ApplicationServices as AS
+        import CoreFoundation as CF
+
+        self._as = AS
+        self._cf = CF
+        self.batch = batch
+
+    def application(self, pid: int) -> Any:
+        return self._as.AXUIElementCreateApplication(pid)
+
+    def element_key(self, element: Any) -> Hashable:
+        # PyObjC hashes CF objects with CFHash and compares them with CFEqual, so the
+        # element is its own key; formatting its description is what this avoids
+        return element
+
+    def copy_attribute(self, element: Any, attribute: str) -> Tuple[int, Any]:
+        self._count()
+        try:
+            error, value = self._as.AXUIElementCopyAttributeValue(element, attribute, None)
+        except Exception as e:
+            logger.debug(f"Exception getting attribute '{attribute}': {e}")
+            return AX_ERROR_FAILURE, None
+        if error != AX_ERROR_SUCCESS:
+            return error, None
+        return error, self._to_python(attribute, value)
+
+    def fetch(self, element: Any, attributes: Sequence[str] = NODE_ATTRIBUTES) -> Dict[str, Any]:
+        self._count(0, 0, elements=1)
+        if self.batch:
+            try:
+                error, values = self._as.AXUIElementCopyMultipleAttributeValues(element, list(attributes), 0, None)
+            except Exception as e:
+                logger.debug(f'Batched attribute fetch failed: {e}')
+                error, values = AX_ERROR_FAILURE, None
+            if error == AX_ERROR_SUCCESS and values is not None and len(values) == len(attributes):
+                self._count(1, len(attributes))
+                return {
+                    attribute: None if self._is_error(value) else self._to_python(attribute, value)
+                    for attribute, value in zip(attributes, values)
+                }
+            # The failed batch still cost a round trip; the per-attribute calls below count themselves
+            self._count(1, 0)
+        return {attribute: self.attribute(element, attribute) for attribute in attributes}
+
+    def actions(self, element: Any) -> List[str]:
+        self._count()
+        try:
+            error, actions = self._as.AXUIElementCopyActionNames(element, None)
+            if error == AX_ERROR_SUCCESS and actions:
+                return list(actions)
+        except Exception as e:
+            logger.debug(f'Error getting actions: {e}')
+        return []
+
+    def attribute_names(self, element: Any) -> List[str]:
+        self._count()
+        try:
+            error, names = self._as.AXUIElementCopyAttributeNames(element, None)
+            if error == AX_ERROR_SUCCESS and names:
+                return list(names)
+        except Exception as e:
+            logger.debug(f'Error retrieving attribute names: {e}')
+        return []
+
+    def _is_error(self, value: Any) -> bool:
+        """Failed attributes come back from the batched call as AXValues of type kAXValueAXErrorType"""
+        AS = self._as
+        try:
+            return (
+                value is None
+                or (self._cf.CFGetTypeID(value) == AS.AXValueGetTypeID() and AS.AXValueGetType(value) == AS.kAXValueAXErrorType)
+            )
+        except Exception:
+            return False
+
+    def _to_python(self, attribute: str, value: Any) -> Any:
+        if attribute == 'AXPosition':
+            point = self._axvalue(value, AX_VALUE_CG_POINT)
+            return (point.x, point.y) if point is not None else None
+        if attribute == 'AXSize':
+            size = self._axvalue(value, AX_VALUE_CG_SIZE)
+            return (size.width, size.height) if size is not None else None
+        if attribute == 'AXChildren' and value is not None:
+            return list(value)
+        return value
+
+    def _axvalue(self, value: Any, value_type: int) -> Any:
+        """The CGPoint / CGSize inside an AXValue, read structurally rather than from its description"""
+        if not value or self._as.AXValueGetType(value) != value_type:
+            return None
+        ok, unpacked = self._as.AXValueGetValue(value, value_type, None)
+        return unpacked if ok else None
+
+
+class FakeAXElement:
+    """An in-memory accessibility element for FakeAXBackend"""
+
+    _ids = itertools.count()
+
+    def __init__(self, role: str, actions: Sequence[str] = (), children: Sequence['FakeAXElement'] = (), **attributes):
+        self.id = next(self._ids)
+        self.actions = list(actions)
+        self.attributes = {'AXRole': role, **{f'AX{key}': value for key, value in attributes.items()}}
+        self.attributes['AXChildren'] = []
+        for child in children:
+            self.append(child)
+
+    def append(self, child: 'FakeAXElement') -> 'FakeAXElement':
+        """Add `child` as the last child and point its AXParent here"""
+        self.attributes['AXChildren'].append(child)
+        child.attributes['AXParent'] = self
+        return child
+
+    def __repr__(self) -> str:
+        return f'<FakeAXElement {self.attributes["AXRole"]} #{self.id}>'
+
+
+class FakeAXBackend(AXBackend):
+    """
+    Serves FakeAXElement trees keyed by pid, so tree building runs without macOS.
+
+    Attribute keyword names drop the 'AX' prefix: FakeAXElement('AXButton', Title='OK',
+    Position=(10, 10), Size=(80, 24), actions=['AXPress']). `latency` seconds are slept on
+    every call to stand in for the IPC round trip. With `batch=False` a fetch costs one call
+    per attribute, like the unbatched system backend.
+    """
+
+    def __init__(self, apps: Dict[int, FakeAXElement], latency: float = 0.0, batch: bool = True):
+        super().__init__()
+        self.apps = apps
+        self.latency = latency
+        self.batch = batch
+
+    def _round_trip(self, unbatched: int = 1) -> None:
+        self._count(1, unbatched)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def application(self, pid: int) -> Any:
+        return self.apps.get(pid)
+
+    def element_key(self, element: Any) -> Hashable:
+        return element.id
+
+    def copy_attribute(self, element: Any, attribute: str) -> Tuple[int, Any]:
+        self._round_trip()
+        if element is None:
+            return AX_ERROR_FAILURE, None
+        if attribute not in element.attributes:
+            return AX_ERROR_ATTRIBUTE_UNSUPPORTED, None
+        return AX_ERROR_SUCCESS, element.attributes[attribute]
+
+    def fetch(self, element: Any, attributes: Sequence[str] = NODE_ATTRIBUTES) -> Dict[str, Any]:
+        self._count(0, 0, elements=1)
+        if not self.batch:
+            return {attribute: self.attribute(element, attribute) for attribute in attributes}
+        self._round_trip(len(attributes))
+        return {attribute: element.attributes.get(attribute) for attribute in attributes}
+
+    def actions(self, element: Any) -> List[str]:
+        self._round_trip()
+        return list(element.actions)
+
+    def attribute_names(self, element: Any) -> List[str]:
+        self._round_trip()
+        return list(element.attributes)
@@ -0,0 +1,159 @@
+import glob
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Normalized (x, y, w, h) of a window, as stored in MacUITreeBuilder.app_window
+Window = Tuple[float, float, float, float]
+
+
+class CaptureBackend(ABC):
+    """
+    Source of screenshots for MacUITreeBuilder.
+
+    Frames are returned at `scale` times the physical display resolution (0.5 by default,
+    i.e. the logical resolution on a Retina display). When `window` is given, only that
+    part of the screen needs to be real; the rest of the frame may be left black, so that
+    normalized coordinates keep referring to the whole screen.
+    """
+
+    scale: float = 0.5
+
+    @abstractmethod
+    def capture(self, window: Optional[Window] = None) -> Image.Image:
+        ...
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """The original path: grab the full-resolution screen, then shrink it"""
+
+    def __init__(self, scale: float = 0.5):
+        self.scale = scale
+
+    def capture(self, window: Optional[Window] = None) -> Image.Image:
+        import pyautogui
+
+        screenshot = pyautogui.screenshot()
+        screenshot.thumbnail((int(screenshot.width * self.scale), int(screenshot.height * self.scale)))
+        if window:
+            screenshot = _blank_outside(screenshot, window)
+        return screenshot
+
+
+class QuartzCapture(CaptureBackend):
+    """
+    Captures through CGWindowListCreateImage at nominal (1x) resolution, so on a Retina
+    display the window server hands back the half-size frame directly instead of a full
+    Retina capture that is then resized. Window mode reads only the window rectangle.
+
+    CGWindowListCreateImage is deprecated and obsolete from macOS 15; the first capture
+    that fails switches this backend to PyAutoGUICapture for good.
+    """
+
+    def __init__(self, scale: float = 0.5, display_id: Optional[int] = None):
+        import Quartz.CoreGraphics as CG
+
+        self._cg = CG
+        self.scale = scale
+        self.display_id = display_id if display_id is not None else CG.CGMainDisplayID()
+        self._fallback: Optional[CaptureBackend] = None
+
+    def _target_size(self) -> Tuple[int, int]:
+        CG = self._cg
+        mode = CG.CGDisplayCopyDisplayMode(self.display_id)
+        return (
+            int(CG.CGDisplayModeGetPixelWidth(mode) * self.scale),
+            int(CG.CGDisplayModeGetPixelHeight(mode) * self.scale),
+        )
+
+    def _grab(self, rect) -> Image.Image:
+        CG = self._cg
+        image_ref = CG.CGWindowListCreateImage(
+            rect,
+            CG.kCGWindowListOptionOnScreenOnly,
+            CG.kCGNullWindowID,
+            CG.kCGWindowImageNominalResolution,
+        )
+        if image_ref is None:
+            raise RuntimeError('CGWindowListCreateImage returned no image (is screen recording allowed?)')
+        width = CG.CGImageGetWidth(image_ref)
+        height = CG.CGImageGetHeight(image_ref)
+        bytes_per_row = CG.CGImageGetBytesPerRow(image_ref)
+        data = CG.CGDataProviderCopyData(CG.CGImageGetDataProvider(image_ref))
+        image = Image.frombuffer('RGBA', (width, height), bytes(data), 'raw', 'BGRA', bytes_per_row, 1)
+        return image.convert('RGB')
+
+    def capture(self, window: Optional[Window] = None) -> Image.Image:
+        if self._fallback is None:
+            try:
+                return self._capture(window)
+            except Exception as e:
+                logger.warning(f'Quartz capture failed, falling back to pyautogui: {e}')
+                self._fallback = PyAutoGUICapture(self.scale)
+        return self._fallback.capture(window)
+
+    def _capture(self, window: Optional[Window]) -> Image.Image:
+        CG = self._cg
+        bounds = CG.CGDisplayBounds(self.display_id)
+        size = self._target_size()
+        if not window:
+            image = self._grab(bounds)
+            return image if image.size == size else image.resize(size, Image.BILINEAR)
+
+        x, y, w, h = window
+        screen_w, screen_h = bounds.size.width, bounds.size.height
+        rect = CG.CGRectMake(
+            bounds.origin.x + x * screen_w, bounds.origin.y + y * screen_h, w * screen_w, h * screen_h
+        )
+        crop = self._grab(rect)
+        box = (int(x * size[0]), int(y * size[1]), int((x + w) * size[0]), int((y + h) * size[1]))
+        if crop.size != (box[2] - box[0], box[3] - box[1]):
+            crop = crop.resize((max(1, box[2] - box[0]), max(1, box[3] - box[1])), Image.BILINEAR)
+        frame = Image.new('RGB', size)
+        frame.paste(crop, box[:2])
+        return frame
+
+
+class FakeCapture(CaptureBackend):
+    """
+    Replays recorded frames (PNG paths, a directory of PNGs, or PIL images) in order,
+    looping at the end. Needs no display, so capture-dependent code can run on Linux.
+    """
+
+    def __init__(self, frames: Union[str, Sequence[Union[str, Image.Image]]], loop: bool = True):
+        if isinstance(frames, str):
+            frames = sorted(glob.glob(os.path.join(frames, '*.png')))
+        if not frames:
+            raise ValueError('FakeCapture needs at least one frame')
+        self._frames: List[Image.Image] = []
+        for frame in frames:
+            image = Image.open(frame) if isinstance(frame, str) else frame
+            image.load()
+            self._frames.append(image)
+        self.loop = loop
+        self.position = 0
+        self.captures = 0
+
+    def capture(self, window: Optional[Window] = None) -> Image.Image:
+        image = self._frames[self.position].copy()
+        self.captures += 1
+        if self.position + 1 < len(self._frames):
+            self.position += 1
+        elif self.loop:
+            self.position = 0
+        if window:
+            image = _blank_outside(image, window)
+        return image
+
+
+def _blank_outside(image: Image.Image, window: Window) -> Image.Image:
+    x, y, w, h = window
+    box = (int(x * image.width), int(y * image.height), int((x + w) * image.width), int((y + h) * image.height))
+    frame = Image.new(image.mode, image.size)
+    frame.paste(image.crop(box), box[:2])
+    return frame
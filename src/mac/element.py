@@ -1,47 +1,244 @@
 # --- START OF FILE mac_use/mac/element.py ---
-from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
-from functools import cached_property
+import sys
+import weakref
+from collections import deque
+from collections.abc import MutableMapping
+from typing import Optional, Dict, List, Any, Iterator, Tuple
 import logging
 logger = logging.getLogger(__name__)
-@dataclass
+
+# Attributes the tree builder sets on nearly every node; each gets a slot on MacElementNode
+# instead of a key in a per-node dict
+NODE_ATTRIBUTE_SLOTS = {
+    'title': '_title',
+    'value': '_value',
+    'description': '_description',
+    'enabled': '_enabled',
+    'subrole': '_subrole',
+    'actions': '_actions',
+    'position': '_position',
+    'size': '_size',
+}
+# Bounds are kept as bare floats and handed out as tuples
+_PAIR_SLOTS = {'_position': ('_x', '_y'), '_size': ('_w', '_h')}
+
+# Budget for the UI element list in the prompt, and the characters-per-token estimate used
+# for it (MessageManager makes the same estimate for models without a tokenizer)
+UI_STATE_MAX_TOKENS = 10000
+ESTIMATED_CHARS_PER_TOKEN = 3
+
+_MISSING = object()
+# One shared tuple per distinct action list; most elements have one of a handful
+_interned_actions: Dict[tuple, tuple] = {}
+
+
+def _intern_actions(actions) -> tuple:
+    key = tuple(sys.intern(action) if isinstance(action, str) else action for action in actions)
+    return _interned_actions.setdefault(key, key)
+
+
+class NodeAttributes(MutableMapping):
+    """
+    The `attributes` dict of a MacElementNode, as a view over the node's slots. Keys
+    outside NODE_ATTRIBUTE_SLOTS live in a small dict that only exists once one is set.
+    """
+
+    __slots__ = ('_node',)
+
+    def __init__(self, node: 'MacElementNode'):
+        self._node = node
+
+    def __getitem__(self, key: str) -> Any:
+        slot = NODE_ATTRIBUTE_SLOTS.get(key)
+        if slot is None:
+            extra = self._node._extra
+            if extra is None:
+                raise KeyError(key)
+            return extra[key]
+        value = getattr(self._node, slot)
+        if value is _MISSING:
+            raise KeyError(key)
+        # Callers get the list they always got; the node keeps the shared tuple
+        return list(value) if slot == '_actions' else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        slot = NODE_ATTRIBUTE_SLOTS.get(key)
+        if slot is None:
+            if self._node._extra is None:
+                self._node._extra = {}
+            self._node._extra[key] = value
+        elif slot == '_actions':
+            self._node._actions = _intern_actions(value)
+        elif slot in _PAIR_SLOTS:
+            first, second = _PAIR_SLOTS[slot]
+            # No bounds (None) reads back as a missing key
+            x, y = (value[0], value[1]) if value is not None else (_MISSING, _MISSING)
+            setattr(self._node, first, x)
+            setattr(self._node, second, y)
+        elif slot == '_subrole' and isinstance(value, str):
+            self._node._subrole = sys.intern(value)
+        else:
+            setattr(self._node, slot, value)
+
+    def __delitem__(self, key: str) -> None:
+        slot = NODE_ATTRIBUTE_SLOTS.get(key)
+        if slot is None:
+            if self._node._extra is None:
+                raise KeyError(key)
+            del self._node._extra[key]
+        elif getattr(self._node, slot) is _MISSING:
+            raise KeyError(key)
+        else:
+            for name in _PAIR_SLOTS.get(slot, (slot,)):
+                setattr(self._node, name, _MISSING)
+
+    def __iter__(self) -> Iterator[str]:
+        node = self._node
+        for key, slot in NODE_ATTRIBUTE_SLOTS.items():
+            if getattr(node, slot) is not _MISSING:
+                yield key
+        if node._extra:
+            yield from node._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        """A plain dict of the attributes, read straight from the slots"""
+        node = self._node
+        values = {}
+        for key, slot in NODE_ATTRIBUTE_SLOTS.items():
+            value = getattr(node, slot)
+            if value is not _MISSING:
+                values[key] = list(value) if slot == '_actions' else value
+        if node._extra:
+            values.update(node._extra)
+        return values
+
+    def __contains__(self, key: object) -> bool:
+        slot = NODE_ATTRIBUTE_SLOTS.get(key)
+        if slot is None:
+            return self._node._extra is not None and key in self._node._extra
+        return getattr(self._node, slot) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class MacElementNode:
-    """Represents a UI element in macOS with enhanced accessibility information"""
-    # Required fields
-    role: str
-    identifier: str
-    attributes: Dict[str, Any]
-    is_visible: bool
-    app_pid: int
-    on_screen: bool
-
-    # Optional fields
-    children: List['MacElementNode'] = field(default_factory=list)
-    parent: Optional['MacElementNode'] = None
-    is_interactive: bool = False
-    highlight_index: Optional[int] = None
-    _element = None  # Store AX element reference
+    """
+    Represents a UI element in macOS with enhanced accessibility information.
+
+    Slotted to keep trees of tens of thousands of nodes small: the common attributes are
+    slots behind the `attributes` mapping, roles and action lists are interned, and the
+    parent link is a weak reference, so a tree has no reference cycles and is freed as soon
+    as its root is dropped. The tree above a node must be held elsewhere (normally by its
+    root) for `parent` to resolve.
+    """
+
+    __slots__ = (
+        'role', '_identifier', 'is_visible', 'app_pid', 'on_screen', 'children', '_parent',
+        'is_interactive', 'highlight_index', '_element', '_accessibility_path', '_extra',
+        '_title', '_value', '_description', '_enabled', '_subrole', '_actions', '_x', '_y', '_w', '_h',
+        '__weakref__',
+    )
+
+    def __init__(
+        self,
+        role: str,
+        identifier: Optional[str],
+        attributes: Dict[str, Any],
+        is_visible: bool,
+        app_pid: int,
+        on_screen: bool,
+        children: Optional[List['MacElementNode']] = None,
+        parent: Optional['MacElementNode'] = None,
+        is_interactive: bool = False,
+        highlight_index: Optional[int] = None,
+    ):
+        self.role = sys.intern(role) if isinstance(role, str) else role
+        self._identifier = identifier
+        self.is_visible = is_visible
+        self.app_pid = app_pid
+        self.on_screen = on_screen
+        self.children = children if children is not None else []
+        self.parent = parent
+        self.is_interactive = is_interactive
+        self.highlight_index = highlight_index
+        self._element = None  # Store AX element reference
+        self._accessibility_path = None
+        self._clear_attributes()
+        if attributes:
+            self.attributes.update(attributes)
+
+    @property
+    def identifier(self) -> Optional[str]:
+        """The AX element's description, formatted on first use when the crawl passed None"""
+        if self._identifier is None and self._element is not None:
+            self._identifier = str(self._element)
+        return self._identifier
+
+    @identifier.setter
+    def identifier(self, identifier: Optional[str]) -> None:
+        self._identifier = identifier
+
+    @property
+    def parent(self) -> Optional['MacElementNode']:
+        return self._parent() if self._parent is not None else None
+
+    @parent.setter
+    def parent(self, parent: Optional['MacElementNode']) -> None:
+        # Siblings share one weakref object, CPython hands out the same ref per target
+        self._parent = weakref.ref(parent) if parent is not None else None
+
+    @property
+    def attributes(self) -> NodeAttributes:
+        return NodeAttributes(self)
+
+    @attributes.setter
+    def attributes(self, attributes: Dict[str, Any]) -> None:
+        values = dict(attributes)
+        self._clear_attributes()
+        self.attributes.update(values)
+
+    def _clear_attributes(self) -> None:
+        self._title = self._value = self._description = self._enabled = self._subrole = _MISSING
+        self._actions = self._x = self._y = self._w = self._h = _MISSING
+        self._extra = None
+
+    @property
+    def _position(self) -> Any:
+        return (self._x, self._y) if self._x is not _MISSING else _MISSING
+
+    @property
+    def _size(self) -> Any:
+        return (self._w, self._h) if self._w is not _MISSING else _MISSING
 
     @property
     def actions(self) -> List[str]:
         """Get the list of available actions for this element."""
-        list_actions = self.attributes.get('actions', [])
-        return list_actions
+        return list(self._actions) if self._actions is not _MISSING else []
 
     @property
     def enabled(self) -> bool:
         """Check if the element is enabled."""
-        return self.attributes.get('enabled', True)
+        return self._enabled if self._enabled is not _MISSING else True
 
     @property
     def position(self) -> Optional[tuple]:
         """Get the element's position."""
-        return self.attributes.get('position')
+        return (self._x, self._y) if self._x is not _MISSING else None
 
     @property
     def size(self) -> Optional[tuple]:
         """Get the element's size."""
-        return self.attributes.get('size')
+        return (self._w, self._h) if self._w is not _MISSING else None
 
     def __repr__(self) -> str:
         """Enhanced string representation including more attributes."""
@@ -121,94 +318,89 @@ class MacElementNode:
         return f'{prefix}[:]{role_part}'
 
     # ------------------------------------------------------------------------
-    # 1) The "original" version with more details
+    # The UI element list sent to the model
     # ------------------------------------------------------------------------
+    def _state_line(self) -> Optional[str]:
+        """This element's line in the UI state sent to the model, None if it is not listed"""
+        if not self.highlight_index or not self.on_screen:
+            return None
+        if self.role in ['AXStaticText', 'AXGroup', 'AXImage']:
+            return None
+        attributes = self.attributes
+        attrs_str = ''
+        important_attrs = ['title', 'value', 'description','position','size']
+        for key in important_attrs:
+            if key in attributes:
+                if key == 'position':
+                    attrs_str += f' Top left: "{attributes[key]}"'
+                else:
+                    attrs_str += f'(w,h): "{attributes[key]}"'
+        if attrs_str == '':
+            return None
+        return f'{self.highlight_index}[:]<{self.role}{attrs_str}>'
+
+    def iter_state_lines(self) -> Iterator[Tuple['MacElementNode', int, str]]:
+        """(node, depth, line) for each element listed in the UI state, in pre-order, walking the tree lazily"""
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            line = node._state_line()
+            if line is not None:
+                yield node, depth, line
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
     def _get_visible_clickable_elements_string_short(self) -> str:
         """Convert the UI tree to a string representation focusing on interactive and context elements"""
-        formatted_text = []
-        def process_node(node: 'MacElementNode', depth: int) -> None:
-            # Build attributes string
-            if not node.highlight_index or not node.on_screen:
-                pass
-            elif node.role in ['AXStaticText', 'AXGroup', 'AXImage']:
-                pass
-            else:
-                attrs_str = ''
-                important_attrs = ['title', 'value', 'description','position','size']
-                # logger.debug(f'Processing node: {node.role} with attributes: {node.attributes}')
-                for key in important_attrs:
-                    if key in node.attributes:
-                        if key == 'position':
-                            attrs_str += f' Top left: "{node.attributes[key]}"'
-                        else:
-                            attrs_str += f'(w,h): "{node.attributes[key]}"'
-                if attrs_str != '':
-                    formatted_text.append(
-                        f'{node.highlight_index}[:]<{node.role}{attrs_str}>'
-                    )
-
-            for child in node.children:
-                process_node(child, depth + 1)
-
-        process_node(self, 0)
-        return '\n'.join(formatted_text)
+        return '\n'.join(line for _, _, line in self.iter_state_lines())
 
-    # ------------------------------------------------------------------------
-    # 2) The "short" version with fewer details
-    # ------------------------------------------------------------------------
-    def _get_visible_clickable_elements_string_original(self) -> str:
+    def _ranked_state_lines(self) -> Iterator[Tuple[Tuple[int, ...], str]]:
         """
-        Short version: 
-        Omits duplicates based on (role, description) to reduce length, 
-        uses `_format_short_element` for a more condensed view.
+        (position in the tree, line) for each listed element, best first: on screen before off
+        screen, interactive before not, then shallowest first, ties going to the earlier element.
+        The walk is breadth-first, so the best-ranked elements are yielded as it reaches them and
+        a consumer can stop early; any others wait until the walk is done.
         """
-        formatted_text = []
-        def process_node(node: 'MacElementNode', depth: int) -> None:
-            # Build attributes string
-            if not node.highlight_index or not node.on_screen:
-                pass
-            attrs_str = ''
-            important_attrs = ['title', 'value', 'description', 'enabled','position','size']
-            # logger.debug(f'Processing node: {node.role} with attributes: {node.attributes}')
-            for key in important_attrs:
-                if key in node.attributes:
-                    if key == 'position':
-                        attrs_str += f' Top left: "{node.attributes[key]}"'
-                    else:
-                        attrs_str += f'(w,h): "{node.attributes[key]}"'
-
-
-            formatted_text.append(
-                f'{node.highlight_index}[:]<{node.role}{attrs_str}> [interactive]'
-            )
-            # Check if this is a context element (non-interactive AXStaticText or read-only AXTextField)
-            if (node.role in ['AXStaticText', 'AXTextField'] and 
-                  not node.is_interactive and 
-                  (node.parent is None or node.parent.role == 'AXWindow' or node.parent.is_interactive)):
-                # Context element with "_" index
-                formatted_text.append(
-                    f'_[:]<{node.role}{attrs_str}> [context]'
-                )
-
-            for child in node.children:
-                process_node(child, depth + 1)
-
-        process_node(self, 0)
-        return '\n'.join(formatted_text)
-
-    def _get_visible_clickable_elements_string(self) -> str:
-        def count_tokens(text: str, estimated_tokens_per_character: int = 3) -> int:
-            return len(text) // estimated_tokens_per_character
-        total_tokens = count_tokens(self._get_visible_clickable_elements_string_original())
-        if total_tokens > 10000:
-            # Return the short version
-            logger.debug('Token count exceeded 10000, Do not use UI')
-            return ''
-        else:
-            # Return the short version
-            logger.debug(f'Token count is {total_tokens}, using original version.')
-            return self._get_visible_clickable_elements_string_short()
-        
+        later: Dict[Tuple[bool, bool], List[Tuple[Tuple[int, ...], str]]] = {}
+        queue = deque([(self, ())])
+        while queue:
+            node, position = queue.popleft()
+            line = node._state_line()
+            if line is not None:
+                rank = (not node.on_screen, not node.is_interactive)
+                if rank == (False, False):
+                    yield position, line
+                else:
+                    later.setdefault(rank, []).append((position, line))
+            queue.extend((child, position + (i,)) for i, child in enumerate(node.children))
+        for rank in sorted(later):
+            yield from later[rank]
+
+    def _get_visible_clickable_elements_string(self, max_tokens: Optional[int] = UI_STATE_MAX_TOKENS) -> str:
+        """
+        The UI element list sent to the model, listed in tree order. Elements are taken in the
+        order of _ranked_state_lines until the next one would go past `max_tokens` (estimated at
+        ESTIMATED_CHARS_PER_TOKEN characters each); the walk stops there and a closing line says
+        more were left out. None lists everything.
+        """
+        budget = None if max_tokens is None else max_tokens * ESTIMATED_CHARS_PER_TOKEN
+        kept = []
+        used = 0
+        complete = True
+        for position, line in self._ranked_state_lines():
+            # +1 for the newline joining the lines
+            if budget is not None and used + len(line) + 1 > budget:
+                complete = False
+                break
+            used += len(line) + 1
+            kept.append((position, line))
+        kept.sort()
+        text = '\n'.join(line for _, line in kept)
+        if complete:
+            logger.debug(f'Token count is {used // ESTIMATED_CHARS_PER_TOKEN}, listing every element.')
+            return text
+        logger.debug(f'UI element list reached {max_tokens} tokens, listing {len(kept)} elements')
+        return f'{text}\n... more elements not listed, use the screenshot for them'
+
     def get_detailed_info(self) -> str:
         """Return a detailed string with all attributes of the element."""
         details =[
@@ -244,9 +436,11 @@ class MacElementNode:
             result += "\n" + child.get_detailed_string(indent + 2)
         return result
 
-    @cached_property
+    @property
     def accessibility_path(self) -> str:
-        """Generate a unique path to this element including more identifiers."""
+        """Generate a unique path to this element including more identifiers (computed once, see invalidate_path)."""
+        if self._accessibility_path is not None:
+            return self._accessibility_path
         path_components = []
         current = self
         while current.parent is not None:
@@ -275,23 +469,31 @@ class MacElementNode:
             current = current.parent
 
         path_components.reverse()
-        return '/' + '/'.join(path_components)
+        self._accessibility_path = '/' + '/'.join(path_components)
+        return self._accessibility_path
+
+    def invalidate_path(self) -> None:
+        """Forget the cached accessibility_path after siblings or titles on the way up changed"""
+        self._accessibility_path = None
 
     def find_element_by_path(self, path: str) -> Optional['MacElementNode']:
-        """Find an element using its accessibility path."""
-        if self.accessibility_path == path:
-            return self
-        for child in self.children:
-            result = child.find_element_by_path(path)
-            if result:
-                return result
-        return None
+        """
+        Find an element using its accessibility path. Indexes this subtree for one lookup;
+        for repeated lookups keep a PathIndex (MacUITreeBuilder.path_index for the current tree).
+        """
+        from src.mac.paths import PathIndex
+        return PathIndex(self).get(path)
 
     def find_elements_by_action(self, action: str) -> List['MacElementNode']:
-        """Find all elements that support a specific action."""
+        """
+        Find all elements that support a specific action, in pre-order. Walks this subtree;
+        for the current tree MacUITreeBuilder.element_index.by_action answers without a walk.
+        """
         elements = []
-        if action in self.actions:
-            elements.append(self)
-        for child in self.children:
-            elements.extend(child.find_elements_by_action(action))
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._actions is not _MISSING and action in node._actions:
+                elements.append(node)
+            stack.extend(reversed(node.children))
         return elements
@@ -0,0 +1,71 @@
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from src.mac.element import MacElementNode
+
+
+class ElementIndex:
+    """
+    Lookups into the current tree, filled in as the crawl builds nodes: highlighted elements
+    by highlight index and the other way round, context elements (listed without an index)
+    by their AXBackend.element_key, and every node by role and by action. Per-role and
+    per-action lists keep crawl order, which is pre-order except in the middle of a parallel
+    or budgeted crawl; MacUITreeBuilder._reindex rebuilds the whole index in pre-order.
+    """
+
+    def __init__(self):
+        self._highlighted: Dict[int, MacElementNode] = {}
+        self._highlight_of: Dict[MacElementNode, int] = {}
+        self._context: Dict[Hashable, MacElementNode] = {}
+        self._by_role: Dict[str, List[MacElementNode]] = {}
+        self._by_action: Dict[str, List[MacElementNode]] = {}
+
+    def clear(self) -> None:
+        self._highlighted.clear()
+        self._highlight_of.clear()
+        self._context.clear()
+        self._by_role.clear()
+        self._by_action.clear()
+
+    def add(self, node: MacElementNode) -> None:
+        """Index a new node by role and actions"""
+        self._by_role.setdefault(node.role, []).append(node)
+        for action in node.actions:
+            self._by_action.setdefault(action, []).append(node)
+
+    def set_highlight(self, index: int, node: MacElementNode) -> None:
+        self._highlighted[index] = node
+        self._highlight_of[node] = index
+
+    def set_context(self, key: Hashable, node: MacElementNode) -> None:
+        self._context[key] = node
+
+    def __len__(self) -> int:
+        return len(self._highlighted)
+
+    def get(self, index: int) -> Optional[MacElementNode]:
+        """The element with this highlight index"""
+        return self._highlighted.get(index)
+
+    def highlight_of(self, node: MacElementNode) -> Optional[int]:
+        return self._highlight_of.get(node)
+
+    def highlighted(self) -> Iterator[Tuple[int, MacElementNode]]:
+        return iter(self._highlighted.items())
+
+    def has_context(self, key: Hashable) -> bool:
+        return key in self._context
+
+    def context(self, key: Hashable) -> Optional[MacElementNode]:
+        return self._context.get(key)
+
+    def by_role(self, role: str) -> List[MacElementNode]:
+        return list(self._by_role.get(role, ()))
+
+    def by_action(self, action: str) -> List[MacElementNode]:
+        return list(self._by_action.get(action, ()))
+
+    def roles(self) -> List[str]:
+        return list(self._by_role)
+
+    def actions(self) -> List[str]:
+        return list(self._by_action)
@@ -0,0 +1,107 @@
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Side of the square pixel block averaged into one fingerprint cell
+FINGERPRINT_BLOCK = 8
+# Max per-cell grey-level difference still treated as the same frame. Screen captures have no
+# sensor noise, so this only absorbs rounding; even a single typed period moves the cells it
+# covers by 3+ levels. Reporting "changed" wrongly only costs an encode.
+FINGERPRINT_TOLERANCE = 2
+
+
+def frame_fingerprint(image: Image.Image, block: int = FINGERPRINT_BLOCK) -> np.ndarray:
+    """
+    Perceptual fingerprint of a frame: the greyscale image box-averaged down by `block`.
+    A 1512x982 frame becomes a 189x123 uint8 array, cheap to keep and to compare.
+    """
+    grey = image.convert('L').reduce(block)
+    return np.asarray(grey, dtype=np.uint8)
+
+
+def fingerprints_match(a: Optional[np.ndarray], b: Optional[np.ndarray], tolerance: int = FINGERPRINT_TOLERANCE) -> bool:
+    """True if two fingerprints describe the same screen content"""
+    if a is None or b is None or a.shape != b.shape:
+        return False
+    diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+    return int(diff.max(initial=0)) <= tolerance
+
+
+# Delta screenshots: the changed part of a frame is compared block by block against a keyframe
+DELTA_BLOCK = 32
+DELTA_PIXEL_TOLERANCE = 16
+# Give up on deltas and send a full frame past this share of changed area or region count
+DELTA_MAX_CHANGED_RATIO = 0.3
+DELTA_MAX_REGIONS = 4
+
+Box = Tuple[int, int, int, int]
+
+
+def changed_regions(previous: Image.Image, current: Image.Image, block: int = DELTA_BLOCK,
+                    tolerance: int = DELTA_PIXEL_TOLERANCE, padding: int = 1) -> List[Box]:
+    """
+    Bounding boxes (x0, y0, x1, y1) in pixels of the areas that differ between two frames.
+    Frames are compared in `block`-sized tiles; changed tiles are grown by `padding` tiles so
+    nearby edits (e.g. a label and its text field) merge into one region.
+    """
+    width, height = current.size
+    if previous.size != current.size:
+        return [(0, 0, width, height)]
+
+    a = np.asarray(previous.convert('L'), dtype=np.int16)
+    b = np.asarray(current.convert('L'), dtype=np.int16)
+    rows, cols = -(-height // block), -(-width // block)
+    diff = np.zeros((rows * block, cols * block), dtype=np.int16)
+    diff[:height, :width] = np.abs(a - b)
+    changed = diff.reshape(rows, block, cols, block).max(axis=(1, 3)) > tolerance
+    if not changed.any():
+        return []
+
+    for _ in range(padding):
+        grown = changed.copy()
+        grown[1:, :] |= changed[:-1, :]
+        grown[:-1, :] |= changed[1:, :]
+        grown[:, 1:] |= changed[:, :-1]
+        grown[:, :-1] |= changed[:, 1:]
+        changed = grown
+
+    # Connected components over the tile grid (4-neighbourhood)
+    regions = []
+    seen = np.zeros_like(changed)
+    for r, c in np.argwhere(changed):
+        if seen[r, c]:
+            continue
+        seen[r, c] = True
+        stack = [(r, c)]
+        r0, c0, r1, c1 = r, c, r, c
+        while stack:
+            y, x = stack.pop()
+            r0, c0, r1, c1 = min(r0, y), min(c0, x), max(r1, y), max(c1, x)
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < rows and 0 <= nx < cols and changed[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    stack.append((ny, nx))
+        regions.append((
+            int(c0 * block), int(r0 * block),
+            int(min((c1 + 1) * block, width)), int(min((r1 + 1) * block, height)),
+        ))
+    return regions
+
+
+def plan_delta_regions(keyframe: Image.Image, current: Image.Image) -> Optional[List[Box]]:
+    """
+    Regions worth sending as crops instead of a full frame, or None when a full frame is the
+    better choice (nothing changed, too much changed, or the change is too scattered).
+    """
+    regions = changed_regions(keyframe, current)
+    if not regions or len(regions) > DELTA_MAX_REGIONS:
+        return None
+    width, height = current.size
+    changed_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if changed_area > DELTA_MAX_CHANGED_RATIO * width * height:
+        return None
+    return regions
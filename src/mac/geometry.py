@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenGeometry:
+    """
+    Main display size in points and its backing scale factor, queried once and cached.
+
+    The cache is dropped when Quartz reports a display reconfiguration (resolution change,
+    display plugged in or out). That callback is only delivered while a run loop is pumped,
+    which the agent does not always do, so cached values also expire after `max_age` seconds.
+    """
+
+    def __init__(self, display_id: Optional[int] = None, max_age: Optional[float] = 5.0):
+        self.display_id = display_id
+        self.max_age = max_age
+        # (size, scale, time queried), replaced as a whole so readers never see half of it
+        self._cached: Optional[Tuple[Tuple[float, float], float, float]] = None
+        self._lock = threading.Lock()
+        self._callback = None
+        self._register()
+
+    def _register(self) -> None:
+        import Quartz
+
+        self._quartz = Quartz
+
+        def reconfigured(display, flags, user_info):
+            # Called once before (BeginConfiguration) and once after the change
+            if not flags & Quartz.kCGDisplayBeginConfigurationFlag:
+                logger.debug(f'Display {display} reconfigured, dropping cached screen geometry')
+                self.invalidate()
+
+        try:
+            Quartz.CGDisplayRegisterReconfigurationCallback(reconfigured, None)
+            # Keep a reference, Quartz only holds a raw pointer to the callback
+            self._callback = reconfigured
+        except Exception as e:
+            logger.debug(f'Could not register for display reconfiguration: {e}')
+
+    def _query(self) -> Tuple[Tuple[float, float], float]:
+        """(width, height) in points and backing pixels per point of the display"""
+        Quartz = self._quartz
+        display_id = self.display_id if self.display_id is not None else Quartz.CGMainDisplayID()
+        bounds = Quartz.CGDisplayBounds(display_id)
+        mode = Quartz.CGDisplayCopyDisplayMode(display_id)
+        width, height = bounds.size.width, bounds.size.height
+        scale = Quartz.CGDisplayModeGetPixelWidth(mode) / width if mode and width else 1.0
+        return (width, height), scale
+
+    def _fresh(self, cached) -> bool:
+        return cached is not None and (self.max_age is None or time.monotonic() - cached[2] < self.max_age)
+
+    def _refresh(self) -> Tuple[Tuple[float, float], float]:
+        """(size, scale), from the cache or queried again; invalidate() may run at any time"""
+        cached = self._cached
+        if not self._fresh(cached):
+            with self._lock:
+                cached = self._cached
+                if not self._fresh(cached):
+                    size, scale = self._query()
+                    cached = self._cached = (size, scale, time.monotonic())
+        return cached[0], cached[1]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached = None
+
+    @property
+    def size(self) -> Tuple[float, float]:
+        """Display (width, height) in points, the unit of accessibility and mouse event coordinates"""
+        return self._refresh()[0]
+
+    @property
+    def scale(self) -> float:
+        """Backing pixels per point, 2.0 on a Retina display"""
+        return self._refresh()[1]
+
+    def normalize(self, x: float, y: float) -> Tuple[float, float]:
+        """Points (a position or a size) to fractions of the screen"""
+        width, height = self.size
+        return x / width, y / height
+
+    def to_points(self, x: float, y: float) -> Tuple[float, float]:
+        """Fractions of the screen to points"""
+        width, height = self.size
+        return x * width, y * height
+
+
+class FixedScreenGeometry(ScreenGeometry):
+    """A display of a given size that never changes, for running without Quartz"""
+
+    def __init__(self, size: Tuple[float, float] = (1512, 982), scale: float = 2.0):
+        self._fixed = (tuple(size), scale)
+        super().__init__(max_age=None)
+
+    def _register(self) -> None:
+        pass
+
+    def _query(self) -> Tuple[Tuple[float, float], float]:
+        return self._fixed
+
+
+_default: Optional[ScreenGeometry] = None
+
+
+def screen_geometry() -> ScreenGeometry:
+    """The process-wide geometry of the main display"""
+    global _default
+    if _default is None:
+        _default = ScreenGeometry()
+    return _default
+
+
+def set_screen_geometry(geometry: ScreenGeometry) -> None:
+    """Replace the process-wide geometry, e.g. with a FixedScreenGeometry off macOS"""
+    global _default
+    _default = geometry
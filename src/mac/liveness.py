@@ -0,0 +1,139 @@
+import logging
+import os
+import select
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def pid_exists(pid: int) -> bool:
+    """Signal 0 probe: permission and existence checks only, nothing is delivered"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class ProcessMonitor:
+    """
+    Whether app processes are still running, without forking `ps` for every question.
+
+    Watched pids are registered with a kqueue NOTE_EXIT filter where the platform has one
+    (macOS), so an exit is known as soon as `poll` drains the queue. Elsewhere, and for pids
+    that are not watched, a signal 0 probe answers and is cached for `ttl` seconds.
+    Callbacks registered with `on_terminated` are called once for each watched pid that
+    exits, from whichever call to `poll` (or `is_alive`) notices it.
+    """
+
+    def __init__(self, ttl: float = 1.0, use_kqueue: bool = True):
+        self.ttl = ttl
+        self._kqueue = select.kqueue() if use_kqueue and hasattr(select, 'kqueue') else None
+        self._watched: Set[int] = set()
+        self._exited: Set[int] = set()
+        self._probed: Dict[int, tuple] = {}  # pid -> (alive, monotonic time of the probe)
+        self._callbacks: List[Callable[[int], None]] = []
+        self._lock = threading.Lock()
+
+    def on_terminated(self, callback: Callable[[int], None]) -> None:
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[int], None]) -> None:
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def watch(self, pid: int) -> None:
+        """Report `pid`'s exit to the callbacks. Watching a pid again forgets an earlier exit."""
+        with self._lock:
+            # An exited pid stays watched until unwatched, so its exit can be forgotten here
+            if pid in self._watched and pid not in self._exited:
+                return
+            self._exited.discard(pid)
+            self._probed.pop(pid, None)
+            self._watched.add(pid)
+            if self._kqueue is None:
+                return
+            try:
+                self._kqueue.control([self._event(pid, select.KQ_EV_ADD | select.KQ_EV_ONESHOT)], 0, 0)
+                return
+            except ProcessLookupError:
+                pass
+            except OSError as e:
+                logger.debug(f'Could not register exit notification for PID {pid}: {e}')
+                return
+        # Already gone before we started watching
+        self._terminated([pid])
+
+    def unwatch(self, pid: int) -> None:
+        with self._lock:
+            if pid not in self._watched:
+                return
+            self._watched.discard(pid)
+            if self._kqueue is not None and pid not in self._exited:
+                try:
+                    self._kqueue.control([self._event(pid, select.KQ_EV_DELETE)], 0, 0)
+                except OSError:
+                    pass
+
+    def watching(self, pid: int) -> bool:
+        return pid in self._watched
+
+    def poll(self) -> List[int]:
+        """Collect exits of watched pids without blocking and notify the callbacks; returns them"""
+        if self._kqueue is not None:
+            exited = [
+                event.ident for event in self._kqueue.control(None, max(1, len(self._watched)), 0)
+                if event.fflags & select.KQ_NOTE_EXIT
+            ]
+        else:
+            exited = [pid for pid in list(self._watched) if pid not in self._exited and not self._probe(pid)]
+        if exited:
+            self._terminated(exited)
+        return exited
+
+    def is_alive(self, pid: int) -> bool:
+        self.poll()
+        if pid in self._exited:
+            return False
+        if pid in self._watched and self._kqueue is not None:
+            return True
+        return self._probe(pid)
+
+    def _probe(self, pid: int) -> bool:
+        now = time.monotonic()
+        cached = self._probed.get(pid)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        alive = pid_exists(pid)
+        self._probed[pid] = (alive, now)
+        return alive
+
+    def _event(self, pid: int, flags: int):
+        return select.kevent(pid, filter=select.KQ_FILTER_PROC, flags=flags, fflags=select.KQ_NOTE_EXIT)
+
+    def _terminated(self, pids: List[int]) -> None:
+        with self._lock:
+            new = [pid for pid in pids if pid in self._watched and pid not in self._exited]
+            self._exited.update(new)
+            for pid in new:
+                self._probed[pid] = (False, time.monotonic())
+        for pid in new:
+            logger.info(f'Process with PID {pid} has terminated')
+            for callback in list(self._callbacks):
+                try:
+                    callback(pid)
+                except Exception as e:
+                    logger.error(f'Error in termination callback for PID {pid}: {e}')
+
+    def close(self) -> None:
+        if self._kqueue is not None:
+            self._kqueue.close()
+            self._kqueue = None
+        self._watched.clear()
@@ -0,0 +1,152 @@
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Accessibility notification -> what MacUITreeBuilder has to redo for the element
+#   value:    re-read the element's own attributes
+#   children: rebuild the element's subtree
+#   created / destroyed: rebuild the subtree of the element's parent
+#   moved:    rebuild the element's subtree (a moved window means a full rebuild)
+#   window:   full rebuild
+NOTIFICATION_KINDS = {
+    'AXValueChanged': 'value',
+    'AXTitleChanged': 'value',
+    'AXSelectedTextChanged': 'value',
+    'AXCreated': 'created',
+    'AXUIElementDestroyed': 'destroyed',
+    'AXLayoutChanged': 'children',
+    'AXRowCountChanged': 'children',
+    'AXSelectedChildrenChanged': 'children',
+    'AXMoved': 'moved',
+    'AXResized': 'moved',
+    'AXWindowMoved': 'window',
+    'AXWindowResized': 'window',
+    'AXWindowCreated': 'window',
+    'AXMainWindowChanged': 'window',
+    'AXFocusedWindowChanged': 'window',
+}
+
+
+@dataclass
+class AXChange:
+    """One accessibility notification, reduced to the element and the kind of change"""
+    element: Any
+    kind: str
+    notification: str
+
+
+class NotificationSource(ABC):
+    """Delivers accessibility change notifications for the apps MacUITreeBuilder watches"""
+
+    @abstractmethod
+    def watch(self, pid: int, app_element: Any) -> bool:
+        """Start collecting notifications for `pid`. Returns False if that is not possible."""
+
+    @abstractmethod
+    def unwatch(self, pid: int) -> None:
+        ...
+
+    @abstractmethod
+    def drain(self, pid: int) -> List[AXChange]:
+        """Every change collected for `pid` since the last drain, oldest first"""
+
+    def watching(self, pid: int) -> bool:
+        return False
+
+
+class SystemNotificationSource(NotificationSource):
+    """
+    AXObserver per watched app, registered on the application element so notifications for
+    every descendant arrive. Nothing runs a CFRunLoop on the agent's thread, so `drain` pumps
+    the current run loop without blocking to deliver what is pending.
+    """
+
+    def __init__(self, notifications=tuple(NOTIFICATION_KINDS)):
+        import ApplicationServices as AS
+        import CoreFoundation as CF
+
+        self._as = AS
+        self._cf = CF
+        self.notifications = notifications
+        self._observers: Dict[int, Any] = {}
+        self._pending: Dict[int, List[AXChange]] = defaultdict(list)
+
+    def watching(self, pid: int) -> bool:
+        return pid in self._observers
+
+    def watch(self, pid: int, app_element: Any) -> bool:
+        if pid in self._observers:
+            return True
+        AS, CF = self._as, self._cf
+
+        def callback(observer, element, notification, refcon):
+            kind = NOTIFICATION_KINDS.get(str(notification))
+            if kind:
+                self._pending[pid].append(AXChange(element, kind, str(notification)))
+
+        try:
+            error, observer = AS.AXObserverCreate(pid, callback, None)
+            if error != AS.kAXErrorSuccess or observer is None:
+                logger.warning(f'Could not create an accessibility observer for pid {pid} (error: {error})')
+                return False
+            for notification in self.notifications:
+                error = AS.AXObserverAddNotification(observer, app_element, notification, None)
+                if error not in (AS.kAXErrorSuccess, AS.kAXErrorNotificationAlreadyRegistered):
+                    logger.debug(f'{notification} not available for pid {pid} (error: {error})')
+            CF.CFRunLoopAddSource(CF.CFRunLoopGetCurrent(), AS.AXObserverGetRunLoopSource(observer), CF.kCFRunLoopDefaultMode)
+        except Exception as e:
+            logger.warning(f'Failed to set up accessibility observer for pid {pid}: {e}')
+            return False
+        # Keep the callback alive as long as the observer
+        self._observers[pid] = (observer, callback)
+        return True
+
+    def unwatch(self, pid: int) -> None:
+        entry = self._observers.pop(pid, None)
+        self._pending.pop(pid, None)
+        if entry:
+            AS, CF = self._as, self._cf
+            try:
+                CF.CFRunLoopRemoveSource(CF.CFRunLoopGetCurrent(), AS.AXObserverGetRunLoopSource(entry[0]), CF.kCFRunLoopDefaultMode)
+            except Exception as e:
+                logger.debug(f'Error removing accessibility observer for pid {pid}: {e}')
+
+    def drain(self, pid: int) -> List[AXChange]:
+        CF = self._cf
+        # Deliver queued notifications; returns kCFRunLoopRunHandledSource while there are more
+        while CF.CFRunLoopRunInMode(CF.kCFRunLoopDefaultMode, 0, True) == CF.kCFRunLoopRunHandledSource:
+            pass
+        return self._pending.pop(pid, [])
+
+
+class FakeNotificationSource(NotificationSource):
+    """Notifications posted by hand with `post`, for exercising incremental rebuilds without macOS"""
+
+    def __init__(self):
+        self._watched = set()
+        self._pending: Dict[int, List[AXChange]] = defaultdict(list)
+
+    def watching(self, pid: int) -> bool:
+        return pid in self._watched
+
+    def watch(self, pid: int, app_element: Any) -> bool:
+        self._watched.add(pid)
+        return True
+
+    def unwatch(self, pid: int) -> None:
+        self._watched.discard(pid)
+        self._pending.pop(pid, None)
+
+    def post(self, pid: int, element: Any, notification: str) -> None:
+        kind = NOTIFICATION_KINDS.get(notification)
+        if kind is None:
+            raise ValueError(f'Unknown notification {notification!r}')
+        if pid in self._watched:
+            self._pending[pid].append(AXChange(element, kind, notification))
+
+    def drain(self, pid: int) -> List[AXChange]:
+        return self._pending.pop(pid, [])
@@ -0,0 +1,83 @@
+import hashlib
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from src.mac.element import MacElementNode
+
+
+def element_keys(root: 'MacElementNode', path: str = '') -> Iterator[Tuple['MacElementNode', str, str]]:
+    """
+    (node, path, structural path) for every node below `root`, in pre-order. The path has
+    the format of MacElementNode.accessibility_path, computed top-down in one pass instead of
+    per node; the structural path leaves out titles and descriptions. `path` is the path of
+    `root` itself, '' for the root of a tree.
+    """
+    stack: List[Tuple['MacElementNode', str, str]] = [(root, path, '')]
+    while stack:
+        node, path, structural = stack.pop()
+        if node is not root:
+            yield node, path, structural
+        if not node.children:
+            continue
+        same_role: Dict[str, int] = {}
+        for child in node.children:
+            same_role[child.role] = same_role.get(child.role, 0) + 1
+        seen: Dict[str, int] = {}
+        keyed = []
+        for child in node.children:
+            role = child.role
+            if same_role[role] > 1:
+                seen[role] = seen.get(role, 0) + 1
+                component = f'{role}[{seen[role]}]'
+            else:
+                component = role
+            attributes = child.attributes
+            identifiers = []
+            if 'title' in attributes:
+                identifiers.append(f"title={attributes['title']}")
+            if 'description' in attributes:
+                identifiers.append(f"desc={attributes['description']}")
+            labelled = f"{component}({','.join(identifiers)})" if identifiers else component
+            keyed.append((child, f'{path}/{labelled}', f'{structural}/{component}'))
+        stack.extend(reversed(keyed))
+
+
+def path_hash(path: str) -> str:
+    """A short digest of an accessibility path, the same in every process (unlike hash())"""
+    return hashlib.blake2b(path.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class PathIndex:
+    """
+    Accessibility path, and path_hash, to node for a tree or subtree, built in one top-down
+    pass. Building it also fills each node's cached accessibility_path. Where paths repeat
+    (identical siblings without a title) the first node in pre-order wins, as with a search.
+    """
+
+    def __init__(self, root: 'MacElementNode'):
+        self._by_path: Dict[str, 'MacElementNode'] = {}
+        self._by_hash: Optional[Dict[str, 'MacElementNode']] = None
+        # A subtree's paths continue its root's, which is computed upwards once
+        base = root.accessibility_path if root.parent is not None else ''
+        self._add(root, base or '/')
+        for node, path, _ in element_keys(root, base):
+            self._add(node, path)
+
+    def _add(self, node: 'MacElementNode', path: str) -> None:
+        node._accessibility_path = path
+        self._by_path.setdefault(path, node)
+
+    def __len__(self) -> int:
+        return len(self._by_path)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._by_path
+
+    def get(self, path: str) -> Optional['MacElementNode']:
+        return self._by_path.get(path)
+
+    def get_by_hash(self, digest: str) -> Optional['MacElementNode']:
+        """The node whose path has this path_hash; the digests are computed on first use"""
+        if self._by_hash is None:
+            self._by_hash = {path_hash(path): node for path, node in self._by_path.items()}
+        return self._by_hash.get(digest)
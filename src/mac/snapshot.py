@@ -0,0 +1,238 @@
+import gzip
+import json
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.mac.element import MacElementNode
+from src.mac.paths import element_keys
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Node flags, packed into one int per node
+_VISIBLE, _ON_SCREEN, _INTERACTIVE = 1, 2, 4
+
+
+def dump_tree(root: MacElementNode) -> Dict[str, Any]:
+    """
+    A tree as compact, JSON-ready data. Nodes are listed in pre-order as rows of
+    [parent row, role, identifier, flags, highlight index, x, y, w, h, other attributes],
+    with roles, subroles and action names stored once in a string table. The identifier
+    is stored only if it was already formatted; the AX element is not described again.
+    """
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    rows = []
+    stack: List[Tuple[MacElementNode, int]] = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        attributes = node.attributes.copy()
+        position = attributes.pop('position', None) or (None, None)
+        size = attributes.pop('size', None) or (None, None)
+        if 'subrole' in attributes:
+            attributes['subrole'] = intern(attributes['subrole'])
+        if 'actions' in attributes:
+            attributes['actions'] = [intern(action) for action in attributes['actions']]
+        flags = (_VISIBLE if node.is_visible else 0) | (_ON_SCREEN if node.on_screen else 0) \
+            | (_INTERACTIVE if node.is_interactive else 0)
+        row = len(rows)
+        rows.append([parent, intern(node.role), node._identifier, flags, node.highlight_index,
+                     position[0], position[1], size[0], size[1], attributes])
+        stack.extend((child, row) for child in reversed(node.children))
+    return {'version': SNAPSHOT_VERSION, 'pid': root.app_pid, 'strings': strings, 'nodes': rows}
+
+
+def load_tree(data: Dict[str, Any]) -> MacElementNode:
+    """Rebuild a tree from dump_tree output. Nodes have no AX element behind them."""
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported tree snapshot version: {data.get("version")}')
+    strings, pid = data['strings'], data['pid']
+    nodes: List[MacElementNode] = []
+    for parent, role, identifier, flags, highlight_index, x, y, w, h, attributes in data['nodes']:
+        attributes = dict(attributes)
+        if 'subrole' in attributes:
+            attributes['subrole'] = strings[attributes['subrole']]
+        if 'actions' in attributes:
+            attributes['actions'] = [strings[action] for action in attributes['actions']]
+        if x is not None:
+            attributes['position'] = (x, y)
+        if w is not None:
+            attributes['size'] = (w, h)
+        node = MacElementNode(
+            role=strings[role],
+            identifier=identifier,
+            attributes=attributes,
+            is_visible=bool(flags & _VISIBLE),
+            app_pid=pid,
+            on_screen=bool(flags & _ON_SCREEN),
+            parent=nodes[parent] if parent >= 0 else None,
+            is_interactive=bool(flags & _INTERACTIVE),
+            highlight_index=highlight_index,
+        )
+        if parent >= 0:
+            nodes[parent].children.append(node)
+        nodes.append(node)
+    return nodes[0]
+
+
+def dumps(root: MacElementNode) -> bytes:
+    # Attribute values the AX API hands out are mostly strings and numbers; anything else is kept as text
+    return json.dumps(dump_tree(root), separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+def loads(payload: bytes) -> MacElementNode:
+    return load_tree(json.loads(payload))
+
+
+def save_snapshot(root: MacElementNode, path: Union[str, Path]) -> None:
+    """Write a tree to `path`, gzip-compressed if it ends in .gz"""
+    path = Path(path)
+    payload = dumps(root)
+    if path.suffix == '.gz':
+        payload = gzip.compress(payload, compresslevel=6)
+    path.write_bytes(payload)
+
+
+def load_snapshot(path: Union[str, Path]) -> MacElementNode:
+    path = Path(path)
+    payload = path.read_bytes()
+    if path.suffix == '.gz':
+        payload = gzip.decompress(payload)
+    return loads(payload)
+
+
+# ----------------------------------------------------------------------------
+# Structural diff
+# ----------------------------------------------------------------------------
+
+@dataclass
+class ElementChange:
+    """An element present in both trees whose content differs"""
+    key: str
+    old: MacElementNode
+    new: MacElementNode
+    fields: List[str]
+
+
+@dataclass
+class TreeDiff:
+    """
+    What changed between two trees, elements matched by their accessibility path.
+
+    The highlight index is not content: an element inserted near the top shifts the index
+    of every listed element below it. Matched elements whose index moved are listed in
+    `renumbered` as (old, new) pairs, whether or not their content changed too, and a diff
+    with nothing but renumbering is empty.
+    """
+    added: List[MacElementNode] = field(default_factory=list)
+    removed: List[MacElementNode] = field(default_factory=list)
+    changed: List[ElementChange] = field(default_factory=list)
+    renumbered: List[Tuple[MacElementNode, MacElementNode]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self) -> str:
+        summary = f'{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed'
+        return f'{summary}, {len(self.renumbered)} renumbered' if self.renumbered else summary
+
+
+def _content(node: MacElementNode) -> Dict[str, Any]:
+    content = node.attributes.copy()
+    content.update(
+        role=node.role,
+        is_visible=node.is_visible,
+        on_screen=node.on_screen,
+        is_interactive=node.is_interactive,
+    )
+    return content
+
+
+def _changed_fields(old: MacElementNode, new: MacElementNode) -> List[str]:
+    a, b = _content(old), _content(new)
+    return [name for name in dict.fromkeys([*a, *b]) if a.get(name) != b.get(name)]
+
+
+def _labelled_paths(keys) -> Dict[int, str]:
+    """
+    id(node) -> its path built from roles, titles and descriptions only, for nodes from
+    element_keys. Unlike the accessibility path it has no sibling ordinals, so it survives
+    an element of the same role being inserted or removed above.
+    """
+    paths: Dict[int, str] = {}
+    for node, _, _ in keys:
+        attributes = node.attributes
+        labels = [f'{name}={attributes[attribute]}' for name, attribute in (('title', 'title'), ('desc', 'description'))
+                  if attribute in attributes]
+        parent = node.parent
+        paths[id(node)] = f"{paths.get(id(parent), '') if parent is not None else ''}/{node.role}({','.join(labels)})"
+    return paths
+
+
+def diff_trees(old: Optional[MacElementNode], new: Optional[MacElementNode]) -> TreeDiff:
+    """
+    Added, removed and changed elements from `old` to `new`. Elements are matched on their
+    accessibility path first. Elements left over on either side are then matched on the
+    path without sibling ordinals, so a button inserted above others of its role does not
+    turn them into changes, and last on the structural path, so a retitled button shows
+    up as changed rather than removed and added.
+    """
+    diff = TreeDiff()
+
+    def compare(path: str, previous: MacElementNode, node: MacElementNode) -> None:
+        fields = _changed_fields(previous, node)
+        if fields:
+            diff.changed.append(ElementChange(path, previous, node, fields))
+        if previous.highlight_index != node.highlight_index:
+            diff.renumbered.append((previous, node))
+
+    old_keys = list(element_keys(old)) if old is not None else []
+    new_keys = list(element_keys(new)) if new is not None else []
+
+    def by_path(keys) -> Dict[str, MacElementNode]:
+        # Identical paths (same role and title among siblings) are told apart by occurrence
+        occurrences: Counter = Counter()
+        mapping = {}
+        for node, path, _ in keys:
+            occurrences[path] += 1
+            mapping[path if occurrences[path] == 1 else f'{path}#{occurrences[path]}'] = node
+        return mapping
+
+    old_paths, new_paths = by_path(old_keys), by_path(new_keys)
+    for path, node in new_paths.items():
+        previous = old_paths.get(path)
+        if previous is not None:
+            compare(path, previous, node)
+
+    unmatched_old = {id(node) for path, node in old_paths.items() if path not in new_paths}
+    unmatched_new = {id(node) for path, node in new_paths.items() if path not in old_paths}
+    structural_paths = {id(node): structural for node, _, structural in (*old_keys, *new_keys)}
+    labelled_paths = {**_labelled_paths(old_keys), **_labelled_paths(new_keys)}
+    # Left over elements are paired in order, on the path without sibling ordinals, then on the structural path
+    for fallback in (labelled_paths, structural_paths):
+        candidates: Dict[str, List[MacElementNode]] = {}
+        for node, _, _ in old_keys:
+            if id(node) in unmatched_old:
+                candidates.setdefault(fallback[id(node)], []).append(node)
+        for node, path, _ in new_keys:
+            previous = candidates.get(fallback[id(node)]) if id(node) in unmatched_new else None
+            if previous:
+                previous = previous.pop(0)
+                unmatched_old.discard(id(previous))
+                unmatched_new.discard(id(node))
+                compare(path, previous, node)
+    diff.added = [node for node, _, _ in new_keys if id(node) in unmatched_new]
+    diff.removed = [node for node, _, _ in old_keys if id(node) in unmatched_old]
+    return diff
@@ -0,0 +1,87 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.mac.element import MacElementNode
+
+Bounds = Tuple[float, float, float, float]
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the normalized screen holding the bounds of tree nodes, for mapping
+    the model's click coordinates to elements. Each node is listed in every cell its bounds
+    overlap, so a point query only looks at the nodes of one cell.
+    """
+
+    def __init__(self, nodes: Iterable[MacElementNode], cells: int = 32):
+        self.cells = cells
+        self._grid: Dict[Tuple[int, int], List[Tuple[Bounds, MacElementNode]]] = {}
+        self._count = 0
+        for node in nodes:
+            position, size = node.position, node.size
+            if not position or not size or size[0] <= 0 or size[1] <= 0:
+                continue
+            x, y = position
+            bounds = (x, y, x + size[0], y + size[1])
+            entry = (bounds, node)
+            column1, row1 = self._cell(bounds[0], bounds[1])
+            column2, row2 = self._cell(bounds[2], bounds[3])
+            for column in range(column1, column2 + 1):
+                for row in range(row1, row2 + 1):
+                    self._grid.setdefault((column, row), []).append(entry)
+            self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        last = self.cells - 1
+        return min(max(int(x * self.cells), 0), last), min(max(int(y * self.cells), 0), last)
+
+    def hit(self, x: float, y: float) -> Optional[MacElementNode]:
+        """The smallest element containing (x, y), i.e. the innermost of nested ones"""
+        best, best_area = None, math.inf
+        for (x1, y1, x2, y2), node in self._grid.get(self._cell(x, y), ()):
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                area = (x2 - x1) * (y2 - y1)
+                if area < best_area:
+                    best, best_area = node, area
+        return best
+
+    def nearest(self, x: float, y: float, max_distance: float = 0.02) -> Optional[MacElementNode]:
+        """
+        The element containing (x, y), else the one whose bounds are closest to it, if that
+        is within `max_distance` (in screen fractions). Searches outward ring by ring.
+        """
+        node = self.hit(x, y)
+        if node is not None:
+            return node
+        column, row = self._cell(x, y)
+        best, best_distance = None, max_distance
+        cell_size = 1 / self.cells
+        for ring in range(self.cells):
+            # Everything in this ring is at least (ring - 1) cells away
+            if (ring - 1) * cell_size > best_distance:
+                break
+            for cell in self._ring(column, row, ring):
+                for (x1, y1, x2, y2), candidate in self._grid.get(cell, ()):
+                    distance = math.hypot(max(x1 - x, 0, x - x2), max(y1 - y, 0, y - y2))
+                    if distance <= best_distance:
+                        best, best_distance = candidate, distance
+        return best
+
+    def _ring(self, column: int, row: int, ring: int):
+        if ring == 0:
+            yield column, row
+            return
+        for c in range(column - ring, column + ring + 1):
+            yield c, row - ring
+            yield c, row + ring
+        for r in range(row - ring + 1, row + ring):
+            yield column - ring, r
+            yield column + ring, r
+
+
+def center(node: MacElementNode) -> Tuple[float, float]:
+    (x, y), (w, h) = node.position, node.size
+    return x + w / 2, y + h / 2
@@ -1,10 +1,15 @@
 # --- START OF FILE mac_use/mac/tree.py ---
 import asyncio
 import re
+from dataclasses import dataclass, field
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 # --- START OF FILE mac_use/mac/actions.py ---
 import logging
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import pyautogui
 from PIL import Image, ImageDraw
 import Cocoa
@@ -41,12 +46,107 @@ from ApplicationServices import (
     kAXWindowsAttribute,
 )
 from CoreFoundation import CFRunLoopAddSource, CFRunLoopGetCurrent, kCFRunLoopDefaultMode
+from src.mac.annotation import AnnotationRenderer
+from src.mac.ax_backend import (
+    DETAIL_ATTRIBUTES,
+    GEOMETRY_ATTRIBUTES,
+    NODE_ATTRIBUTES,
+    WINDOW_ATTRIBUTES,
+    AXBackend,
+    AXCallStats,
+    SystemAXBackend,
+)
+from src.mac.capture import CaptureBackend, QuartzCapture
 from src.mac.element import MacElementNode
+from src.mac.element_index import ElementIndex
+from src.mac.frames import frame_fingerprint, fingerprints_match
+from src.mac.geometry import ScreenGeometry, screen_geometry
+from src.mac.liveness import ProcessMonitor
+from src.mac.observer import AXChange, NotificationSource, SystemNotificationSource
+from src.mac.paths import PathIndex
+from src.mac.spatial import SpatialIndex
 import Quartz.CoreGraphics as CG
 from Foundation import NSArray, NSMutableArray
 from PIL import ImageFont  # Add this import
 from AppKit import NSScreen
 
+# How far, in node geometry, is_visible lets an element overhang the app window
+WINDOW_TOLERANCE = 5
+
+
+@dataclass(frozen=True)
+class WindowFrame:
+    """
+    A window's node geometry, which is_visible tests the window's elements against, and the
+    viewport off-screen culling uses for them (see MacUITreeBuilder._window_frame)
+    """
+    position: Tuple[float, float]
+    size: Tuple[float, float]
+    viewport: Tuple[float, float, float, float]
+
+
+@dataclass
+class CrawlBudget:
+    """
+    Time and node limits for a crawl. A window's budget has the build's as its `parent`,
+    which is spent along with it and also has to hold out.
+    """
+    deadline_at: Optional[float] = None  # time.monotonic()
+    max_nodes: Optional[int] = None
+    parent: Optional['CrawlBudget'] = None
+    nodes: int = 0
+    truncated: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def starting_now(cls, seconds: Optional[float], max_nodes: Optional[int], parent: Optional['CrawlBudget'] = None) -> 'CrawlBudget':
+        return cls(time.monotonic() + seconds if seconds is not None else None, max_nodes, parent)
+
+    def spend(self) -> None:
+        # Windows crawled on separate threads share the build's budget
+        with self._lock:
+            self.nodes += 1
+        if self.parent is not None:
+            self.parent.spend()
+
+    def exhausted(self) -> bool:
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            return True
+        return self.parent is not None and self.parent.exhausted()
+
+
+@dataclass
+class CrawlStats:
+    """
+    Elements the last build looked at, turned into nodes, and pruned as off screen with their
+    subtrees. `skipped` elements were left unread, with their subtrees, because the build ran
+    out of time or nodes or a list had more than max_children entries; the tree is then
+    partial and `truncated` is set.
+    """
+    visited: int = 0
+    emitted: int = 0
+    culled: int = 0
+    skipped: int = 0
+    truncated: bool = False
+    windows: int = 0  # multi-window mode: windows in the tree, and those reused from the last one
+    reused_windows: int = 0
+
+    def reset(self) -> None:
+        self.visited = self.emitted = self.culled = self.skipped = 0
+        self.windows = self.reused_windows = 0
+        self.truncated = False
+
+    def __str__(self) -> str:
+        text = f'{self.visited} elements visited, {self.emitted} nodes emitted, {self.culled} subtrees culled'
+        if self.windows:
+            text += f', {self.windows} windows ({self.reused_windows} reused)'
+        if self.truncated:
+            text += f', truncated with {self.skipped} elements skipped'
+        return text
+
+
 def convert_nsarray(value):
     """Convert NSArray/NSMutableArray to Python list recursively"""
     if isinstance(value, (NSArray, NSMutableArray)):
@@ -57,18 +157,102 @@ logger = logging.getLogger(__name__)
 
 
 class MacUITreeBuilder:
-    def __init__(self):
+    def __init__(
+        self,
+        capture_backend: Optional[CaptureBackend] = None,
+        capture_window_only: bool = False,
+        ax_backend: Optional[AXBackend] = None,
+        notification_source: Optional[NotificationSource] = None,
+        incremental: bool = False,
+        crawl_workers: int = 1,
+        geometry: Optional[ScreenGeometry] = None,
+        process_monitor: Optional[ProcessMonitor] = None,
+        cull_offscreen: bool = False,
+        build_deadline: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+        multi_window: bool = False,
+        max_windows: int = 4,
+        window_deadline: Optional[float] = None,
+        window_max_nodes: Optional[int] = None,
+    ):
         self.highlight_index = 0
-        self._element_cache = {}
-        self._observers = {}
+        # Highlighted and context elements, and every node by role and action; see ElementIndex
+        self.element_index = ElementIndex()
+        # AXBackend.element_key of every element crawled this build
         self._processed_elements = set()
+        self._processed_lock = threading.Lock()
         self._current_app_pid = None
         self.max_depth = 30
         self.max_children = 250
+        # The crawl hands control back to the event loop every this many nodes (0 = never)
+        self.yield_every = 200
+        # Threads crawling sibling subtrees in parallel; 1 crawls serially on the event loop
+        self.crawl_workers = max(1, crawl_workers)
+        self._crawl_pool = None
         self._screenshot = None
+        # All accessibility reads go through the backend, which batches a node's attributes
+        self.ax = ax_backend or SystemAXBackend()
+        self.last_build_stats = None
+        # Read an element's bounds first and skip it, and everything below it, when it lies
+        # entirely outside the screen and the app window. Costs visible elements a second
+        # round trip, so it pays off on long scroll views, lists and outlines.
+        self.cull_offscreen = cull_offscreen
+        self.crawl_stats = CrawlStats()
+        self.last_crawl_stats = None
+        self._viewport = (0.0, 0.0, 1.0, 1.0)
+        self._frame = None  # WindowFrame of the main window, see _update_viewport
+        # Budget for one build_tree call, in seconds and in nodes. Once either is used up the
+        # crawl stops and returns what it has, flagged in last_crawl_stats.truncated. A
+        # budgeted crawl runs breadth-first, so the partial tree holds the top of the window
+        # (toolbars, sidebars, the first rows of lists) rather than one deep branch.
+        self.build_deadline = build_deadline
+        self.max_nodes = max_nodes
+        self._budget = None  # CrawlBudget of the build in progress, None when unbounded
+        self._budget_used_up = False
+        # Crawl the app's on-screen windows (panels, palettes, secondary documents) rather than
+        # just the main one: up to `max_windows`, front to back, each on its own thread and
+        # under its own budget within the build's. Background windows whose title and bounds
+        # have not changed are reused from the previous tree for `background_refresh_every`
+        # builds before they are crawled again.
+        self.multi_window = multi_window
+        self.max_windows = max(1, max_windows)
+        self.window_deadline = window_deadline
+        self.window_max_nodes = window_max_nodes
+        self.background_refresh_every = 5
+        self._window_cache = {}  # element_key -> (signature, node, builds since it was crawled, context entries)
+        self._window_pool = None
+        # Cached display size used to normalize element geometry
+        self.geometry = geometry or screen_geometry()
+        # Knows when the target app quits; the agent subscribes to the same monitor
+        self.process_monitor = process_monitor or ProcessMonitor()
+        self.process_monitor.on_terminated(self._app_terminated)
+        # With accessibility notifications, build_tree patches the previous tree where the app
+        # reported changes instead of crawling the whole window again. Opt-in: scrolling, among
+        # other changes, posts no notification, see require_full_rebuild
+        self.incremental = incremental
+        self.notifications = notification_source or (SystemNotificationSource() if incremental else None)
+        self.full_rebuild_every = 10   # builds; a safety net for changes no notification reports
+        self.max_patched_nodes = 50    # more changed elements than this and a full crawl is cheaper
+        self.last_build_mode = None    # 'full' or 'incremental'
+        self._builds_since_full = 0
+        self._observed_pid = None
+        self._window_node = None
+        self._nodes = {}  # AX element -> its node in the current tree
+        self._spatial_index = None  # see spatial_index
+        self._path_index = None  # see path_index
+        self.capture_backend = capture_backend or QuartzCapture()
+        # Only read the app window's pixels, the rest of the frame stays black
+        self.capture_window_only = capture_window_only
+        # Annotation is rendered lazily, see annotated_screenshot
         self._annotated_screenshot = None
+        self._annotated_for = None
+        self._annotator = AnnotationRenderer()
+        self._root = None
         self.app_window = None
         self.window_count = 0
+        # Fingerprint of the last frame that differed from its predecessor
+        self._frame_fingerprint = None
+        self.screen_unchanged = False
 
         # Define interactive actions we care about
         self.INTERACTIVE_ACTIONS = {
@@ -90,56 +274,41 @@ class MacUITreeBuilder:
             'AXScrollDownByPage'
         }
 
-    def _setup_observer(self, pid: int) -> bool:
-        """Setup accessibility observer for an application"""
-        return True  #  Temporarily always return True
+    def _setup_observer(self, pid: int, app_ref: 'AXUIElement') -> bool:
+        """Watch the app for accessibility notifications; False means every build crawls the whole window"""
+        if not self.incremental or self.notifications is None:
+            return False
+        if self._observed_pid not in (None, pid):
+            self.notifications.unwatch(self._observed_pid)
+            self._observed_pid = None
+        if not self.notifications.watch(pid, app_ref):
+            return False
+        self._observed_pid = pid
+        return True
 
     def _get_attribute(self, element: 'AXUIElement', attribute: str) -> any:
-        """Safely get an accessibility attribute with error reporting"""
-        try:
-            error, value_ref = AXUIElementCopyAttributeValue(element, attribute, None)
-            if error == kAXErrorSuccess:
-                return value_ref
-            elif error == kAXErrorAttributeUnsupported:
-                # logger.debug(f"Attribute '{attribute}' is not supported for this element.")
-                return None
-            else:
-                # logger.debug(f"Error getting attribute '{attribute}': {error}")
-                return None
-        except Exception as e:
-            # logger.debug(f"Exception getting attribute '{attribute}': {str(e)}")
-            return None
+        """Safely get an accessibility attribute, None on any error"""
+        return self.ax.attribute(element, attribute)
 
     def _get_actions(self, element: 'AXUIElement') -> List[str]:
         """Get available actions for an element with proper error handling"""
-        try:
-            error, actions = AXUIElementCopyActionNames(element, None)
-            if error == kAXErrorSuccess and actions:
-                # Convert NSArray to Python list
-                return list(actions)
-            return []
-        except Exception as e:
-            logger.debug(f'Error getting actions: {e}')
-            return []
+        return self.ax.actions(element)
 
     def _get_all_attributes(self, element: 'AXUIElement') -> Dict[str, any]:
         """
         Retrieve all available attributes from an accessibility element.
-        This uses AXUIElementCopyAttributeNames to get a list of all supported attributes,
-        then fetches each attribute's value.
+        This gets the list of all supported attributes, then fetches their values in one batch.
         """
-        attributes = {}
-        try:
-            error, attribute_names = AXUIElementCopyAttributeNames(element, None)
-            if error == kAXErrorSuccess and attribute_names:
-                for attr in list(attribute_names):
-                    attributes[attr] = self._get_attribute(element, attr)
-        except Exception as e:
-            logger.debug(f"Error retrieving all attributes: {e}")
-        return attributes
+        attribute_names = self.ax.attribute_names(element)
+        if not attribute_names:
+            return {}
+        return self.ax.fetch(element, attribute_names)
 
-    def _is_interactive(self, element: 'AXUIElement', role: str, actions: List[str]) -> bool:
-        """Determine if an element is truly interactive based on its role and actions."""
+    def _is_interactive(self, element: 'AXUIElement', role: str, actions: List[str], enabled: Optional[bool] = None) -> bool:
+        """
+        Determine if an element is truly interactive based on its role and actions.
+        `enabled` is the already fetched AXEnabled value; it is read from the element if None.
+        """
         if not actions:
             return False
 
@@ -149,36 +318,319 @@ class MacUITreeBuilder:
 
         # Special handling for text input fields
         if 'AXSetValue' in actions and role == 'AXTextField':
-            enabled = self._get_attribute(element, 'AXEnabled')
-            return bool(enabled)
+            return bool(enabled if enabled is not None else self._get_attribute(element, 'AXEnabled'))
 
         # Special handling for buttons with AXPress
         if 'AXPress' in actions and role in ['AXButton', 'AXLink']:
-            enabled = self._get_attribute(element, 'AXEnabled')
-            return bool(enabled)
+            return bool(enabled if enabled is not None else self._get_attribute(element, 'AXEnabled'))
 
         return has_interactive or has_scroll
 
-    async def _process_element(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode] = None, depth: int = 0) -> Optional[MacElementNode]:
-        """Process a single UI element"""
-        element_identifier = str(element)
+    async def _process_element(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode] = None, depth: int = 0, frame: Optional[WindowFrame] = None) -> Optional[MacElementNode]:
+        """
+        Build the subtree under `element` with an explicit stack instead of recursion, so deep
+        trees cannot hit the recursion limit and no coroutine is created per node. Nodes are
+        visited in the same pre-order as before, so highlight indexes do not change. Control
+        goes back to the event loop every `yield_every` nodes.
+
+        With `crawl_workers` > 1 the subtrees are crawled on a thread pool instead, see
+        _crawl_parallel. A build with a time or node budget crawls breadth-first, see
+        _crawl_breadth_first. `frame` is the window the subtree belongs to, the main one by
+        default.
+        """
+        if self._budgeted():
+            return await self._crawl_breadth_first(element, pid, parent, depth, frame)
+        if self.crawl_workers > 1:
+            return await self._crawl_parallel(element, pid, parent, depth, frame)
+        top = None
+        for visited, node in enumerate(self._walk(element, pid, parent, depth, frame), start=1):
+            if top is None:
+                top = node
+            if self.yield_every and visited % self.yield_every == 0:
+                await asyncio.sleep(0)
+        return top
+
+    def _walk(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode], depth: int, frame: Optional[WindowFrame] = None):
+        """Pre-order crawl below `element`, yielding each node once it is attached; the first is the top"""
+        stack = [(element, parent, depth, True)]
+        while stack:
+            current, current_parent, current_depth, is_top = stack.pop()
+            node, children = self._build_node(current, pid, current_parent, current_depth, frame)
+            if node is None:
+                continue
+            # The caller attaches the top node itself
+            if not is_top and current_parent is not None:
+                current_parent.children.append(node)
+            # Reversed so the first child is popped, and numbered, first
+            stack.extend((child, node, current_depth + 1, False) for child in reversed(children))
+            yield node
+
+    async def _crawl_breadth_first(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode], depth: int, frame: Optional[WindowFrame] = None) -> Optional[MacElementNode]:
+        """Breadth-first crawl under the build's budget, handing control back every `yield_every` nodes"""
+        top = None
+        for visited, node in enumerate(self._walk_breadth_first(element, pid, parent, depth, self._budget, frame), start=1):
+            if top is None:
+                top = node
+            if self.yield_every and visited % self.yield_every == 0:
+                await asyncio.sleep(0)
+        return top
+
+    def _walk_breadth_first(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode], depth: int, budget: 'CrawlBudget', frame: Optional[WindowFrame] = None):
+        """
+        Crawl the subtree under `element` level by level until `budget` runs out, yielding
+        each node once it is attached; the first is the top, which the caller attaches.
+        Stopping at any point leaves a well-formed tree. Highlight indexes come out in
+        breadth-first order and are renumbered in pre-order by the caller (_reindex).
+        """
+        top, children = self._build_node(element, pid, parent, depth, frame)
+        if top is None:
+            return
+        budget.spend()
+        yield top
+        frontier = deque((child, top, depth + 1) for child in children)
+        while frontier:
+            if budget.exhausted():
+                budget.truncated = True
+                self._truncated(len(frontier))
+                self._budget_used_up = True
+                logger.warning(f'UI tree budget used up after {budget.nodes} nodes under {top.role}, '
+                               f'{len(frontier)} elements left unread')
+                return
+            current, current_parent, current_depth = frontier.popleft()
+            node, children = self._build_node(current, pid, current_parent, current_depth, frame)
+            if node is not None:
+                budget.spend()
+                current_parent.children.append(node)
+                frontier.extend((child, node, current_depth + 1) for child in children)
+                yield node
+
+    async def _crawl_windows(self, app_ref: 'AXUIElement', main_window_ref: 'AXUIElement', root: MacElementNode) -> Optional[MacElementNode]:
+        """
+        Multi-window mode: attach the app's on-screen windows to `root` in z-order, frontmost
+        first, and return the main window's node. The frontmost and the main window are
+        always crawled; other windows come from the previous tree while unchanged.
+        """
+        pid = self._current_app_pid
+        main_key = self.ax.element_key(main_window_ref)
+        windows = self._on_screen_windows(app_ref)
+        if not any(key == main_key for _, key, _ in windows):
+            windows = [(main_window_ref, main_key, None), *windows][:self.max_windows]
+
+        if self._window_pool is None:
+            self._window_pool = ThreadPoolExecutor(max_workers=self.max_windows, thread_name_prefix='ax-window')
+        loop = asyncio.get_running_loop()
+        slots: List[Optional[MacElementNode]] = [None] * len(windows)
+        crawls, budgets = {}, {}
+        previous_cache, self._window_cache = self._window_cache, {}
+        for z, (window, key, signature) in enumerate(windows):
+            cached = previous_cache.get(key)
+            if (z > 0 and key != main_key and signature is not None and cached is not None
+                    and cached[0] == signature and cached[2] + 1 < self.background_refresh_every):
+                slots[z] = self._reuse_window(cached[1], root, cached[3])
+                self._window_cache[key] = (signature, cached[1], cached[2] + 1, cached[3])
+                with self._processed_lock:
+                    self.crawl_stats.reused_windows += 1
+                continue
+            budget = CrawlBudget.starting_now(self.window_deadline, self.window_max_nodes, parent=self._budget)
+            budgets[z] = budget
+            # Elements of other windows are visible within their own window, not the main one
+            frame = self._frame
+            if key != main_key and signature is not None and signature[1] and signature[2]:
+                frame = self._window_frame(*self._node_geometry(signature[1], signature[2]))
+            crawls[z] = loop.run_in_executor(self._window_pool, self._crawl_window, window, pid, root, budget, frame)
+
+        for z, node in zip(crawls, await asyncio.gather(*crawls.values())):
+            slots[z] = node
+            window, key, signature = windows[z]
+            # A window cut short by its budget is crawled again next time
+            if node is not None and signature is not None and not budgets[z].truncated:
+                self._window_cache[key] = (signature, node, 0, self._context_entries(node))
+        self.crawl_stats.windows = sum(1 for node in slots if node is not None)
+
+        root.children = [node for node in slots if node is not None]
+        main_z = next(z for z, (_, key, _) in enumerate(windows) if key == main_key)
+        return slots[main_z]
+
+    def _on_screen_windows(self, app_ref: 'AXUIElement') -> List[tuple]:
+        """(window, element key, signature) for up to max_windows of the app's windows in AXWindows (z-)order"""
+        error, windows = self.ax.copy_attribute(app_ref, kAXWindowsAttribute)
+        if error != kAXErrorSuccess or not windows:
+            return []
+        found = []
+        for window in convert_nsarray(windows):
+            values = self.ax.fetch(window, WINDOW_ATTRIBUTES)
+            if values['AXMinimized'] or self._off_screen(values['AXPosition'], values['AXSize']):
+                continue
+            signature = (values['AXTitle'], values['AXPosition'], values['AXSize'])
+            found.append((window, self.ax.element_key(window), signature))
+            if len(found) == self.max_windows:
+                break
+        return found
+
+    def _off_screen(self, position: Optional[tuple], size: Optional[tuple]) -> bool:
+        """True if bounds miss the screen entirely; elements without bounds count as on screen"""
+        if not position or not size or size[0] <= 0 or size[1] <= 0:
+            return False
+        x, y = self._normalize_point(position)
+        w, h = self._normalize_point(size)
+        return x + w <= 0 or x >= 1 or y + h <= 0 or y >= 1
+
+    def _crawl_window(self, window: 'AXUIElement', pid: int, root: MacElementNode, budget: 'CrawlBudget', frame: Optional[WindowFrame]) -> Optional[MacElementNode]:
+        """Crawl one window breadth-first under its budget, judging visibility against `frame`; runs on the window pool"""
+        top = None
+        try:
+            for node in self._walk_breadth_first(window, pid, root, 0, budget, frame):
+                if top is None:
+                    top = node
+        except Exception as e:
+            logger.error(f'Error crawling window: {e}')
+        return top
 
-        if element_identifier in self._processed_elements:
+    def _reuse_window(self, window_node: MacElementNode, root: MacElementNode, contexts: List[tuple]) -> MacElementNode:
+        """
+        Move a window's subtree from the previous tree under `root` and register its nodes
+        and its context entries (see _context_entries), which the new build's index lacks
+        """
+        window_node.parent = root
+        stack = [window_node]
+        # Window threads crawling other windows add to the same set and index
+        with self._processed_lock:
+            while stack:
+                node = stack.pop()
+                if node._element is not None:
+                    self._nodes[node._element] = node
+                    self._processed_elements.add(self.ax.element_key(node._element))
+                stack.extend(node.children)
+            for key, node in contexts:
+                self.element_index.set_context(key, node)
+        return window_node
+
+    def _context_entries(self, window_node: MacElementNode) -> List[tuple]:
+        """(element key, node) of the context elements under a crawled window, kept with it in the window cache"""
+        entries = []
+        stack = [window_node]
+        while stack:
+            node = stack.pop()
+            if node.highlight_index is None and node._element is not None:
+                key = self.ax.element_key(node._element)
+                if self.element_index.context(key) is node:
+                    entries.append((key, node))
+            stack.extend(node.children)
+        return entries
+
+    def _budgeted(self) -> bool:
+        return self._budget is not None
+
+    def _truncated(self, skipped: int) -> None:
+        with self._processed_lock:
+            self.crawl_stats.skipped += skipped
+            self.crawl_stats.truncated = True
+
+    async def _crawl_parallel(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode], depth: int, frame: Optional[WindowFrame] = None) -> Optional[MacElementNode]:
+        """
+        Crawl the subtree under `element` on `crawl_workers` threads sharing one work queue.
+        A worker crawls depth-first on its own stack and hands sibling subtrees to the queue
+        whenever it runs low, so one large subtree does not leave the other workers idle.
+        Nodes go into pre-sized child slots, so the merged tree has the same shape and order
+        as a serial crawl; highlight indexes are then assigned in one pass by the caller
+        (_reindex).
+        """
+        top, children = self._build_node(element, pid, parent, depth, frame)
+        if top is None:
             return None
+        top.children = [None] * len(children)
+        work = queue.Queue()
+        state = {'outstanding': len(children), 'lock': threading.Lock(), 'frame': frame}
+        for slot, child in enumerate(children):
+            work.put((top, slot, child, depth + 1))
+        if not children:
+            return top
+        if self._crawl_pool is None:
+            self._crawl_pool = ThreadPoolExecutor(max_workers=self.crawl_workers, thread_name_prefix='ax-crawl')
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._crawl_pool, self._crawl_worker, work, state, pid)
+            for _ in range(self.crawl_workers)
+        ))
+        # Drop the slots of elements that produced no node
+        stack = [top]
+        while stack:
+            node = stack.pop()
+            if None in node.children:
+                node.children = [child for child in node.children if child is not None]
+            stack.extend(node.children)
+        return top
+
+    def _crawl_worker(self, work: 'queue.Queue', state: dict, pid: int) -> None:
+        while True:
+            job = work.get()
+            if job is None:
+                return
+            try:
+                stack = [job]
+                while stack:
+                    node_parent, slot, element, depth = stack.pop()
+                    node, children = self._build_node(element, pid, node_parent, depth, state['frame'])
+                    node_parent.children[slot] = node
+                    if node is None or not children:
+                        continue
+                    node.children = [None] * len(children)
+                    jobs = [(node, i, child, depth + 1) for i, child in enumerate(children)]
+                    if len(jobs) > 1 and work.qsize() < self.crawl_workers:
+                        # Others may be idle: share all but the first child
+                        with state['lock']:
+                            state['outstanding'] += len(jobs) - 1
+                        for shared in jobs[1:]:
+                            work.put(shared)
+                        jobs = jobs[:1]
+                    stack.extend(reversed(jobs))
+            except Exception as e:
+                logger.error(f'Error crawling subtree: {e}')
+            finally:
+                with state['lock']:
+                    state['outstanding'] -= 1
+                    finished = state['outstanding'] == 0
+                if finished:
+                    # Wake every worker up to exit
+                    for _ in range(self.crawl_workers):
+                        work.put(None)
+
+    def _build_node(self, element: 'AXUIElement', pid: int, parent: Optional[MacElementNode], depth: int, frame: Optional[WindowFrame] = None) -> Tuple[Optional[MacElementNode], list]:
+        """
+        Process a single UI element; returns its node and the child elements still to visit.
+        Visibility is judged against `frame`, the element's window, by default the main one.
+        May run on several threads at once (parallel crawl, multi-window mode).
+        """
+        key = self.ax.element_key(element)
+        frame = frame or self._frame
 
-        self._processed_elements.add(element_identifier)
+        with self._processed_lock:
+            if key in self._processed_elements:
+                return None, []
+            self._processed_elements.add(key)
+            self.crawl_stats.visited += 1
 
         try:
-            role = self._get_attribute(element, kAXRoleAttribute)
+            if self.cull_offscreen and depth > 0:
+                values = self.ax.fetch(element, GEOMETRY_ATTRIBUTES)
+                if self._outside_viewport(values['AXPosition'], values['AXSize'], frame.viewport if frame else None):
+                    with self._processed_lock:
+                        self.crawl_stats.culled += 1
+                    return None, []
+                values.update(self.ax.fetch(element, DETAIL_ATTRIBUTES))
+            else:
+                # One round trip for every attribute the node needs
+                values = self.ax.fetch(element, NODE_ATTRIBUTES)
+            role = values[kAXRoleAttribute]
             if not role:
-                return None
+                return None, []
 
             actions = self._get_actions(element)
 
             # Create node with enhanced attributes
             node = MacElementNode(
                 role=role,
-                identifier=element_identifier,
+                identifier=None,  # formatted from the element only if asked for
                 attributes={},
                 is_visible=True, # it means accessible, but may not be on the screen
                 on_screen=False,  # it means on the screen
@@ -186,16 +638,17 @@ class MacUITreeBuilder:
                 app_pid=pid,
             )
             node._element = element
+            self._nodes[element] = node
 
             # Store the actions in the node's attributes for reference
             if actions:
                 node.attributes['actions'] = actions
 
-            title = self._get_attribute(element, kAXTitleAttribute)
-            value = self._get_attribute(element, kAXValueAttribute)
-            description = self._get_attribute(element, kAXDescriptionAttribute)
-            is_enabled = self._get_attribute(element, 'AXEnabled')
-            subrole = self._get_attribute(element, 'AXSubrole')
+            title = values[kAXTitleAttribute]
+            value = values[kAXValueAttribute]
+            description = values[kAXDescriptionAttribute]
+            is_enabled = values['AXEnabled']
+            subrole = values['AXSubrole']
             if title:
                 node.attributes['title'] = title
             if value:
@@ -208,20 +661,7 @@ class MacUITreeBuilder:
             if subrole:
                 node.attributes['subrole'] = subrole
 
-            raw_pos  = self._convert_axvalue_to_point(self._get_attribute(element, 'AXPosition'))
-            raw_size = self._convert_axvalue_to_size(self._get_attribute(element, 'AXSize'))
-
-            # NEW: round each float to 3 dp before saving
-            position = tuple(round(v, 3) for v in raw_pos)     # (x, y) → (x.xxx, y.yyy)
-            size     = tuple(round(v, 3) for v in raw_size)
-            x0, y0 = position
-            w, h = size
-            x0 = x0 + 0.1*w
-            y0 = y0 + 0.1*h
-            w = w * 0.8
-            h = h * 0.8
-            position = (x0, y0)  # Now stored as (x,y) tuple
-            size = (w, h)        # Now stored as (w,h) tuple
+            position, size = self._node_geometry(values['AXPosition'], values['AXSize'])
 
             node.attributes.update({
                 'position': position,  # Now stored as (x,y) tuple
@@ -229,12 +669,12 @@ class MacUITreeBuilder:
             })
 
             def is_visible(element):
-                if not self.app_window:
+                if not frame:
                     return False
                 # Element must have valid position/size data
                 screen_width, screen_height = self._screenshot.size
-                wx, wy = self.app_window['position']
-                ww, wh = self.app_window['size']
+                wx, wy = frame.position
+                ww, wh = frame.size
                 window_bounds = (wx, wy, wx + ww, wy + wh)
 
                 pos = element.attributes.get('position')
@@ -261,10 +701,10 @@ class MacUITreeBuilder:
                 if window_bounds:
                     wx1, wy1, wx2, wy2 = window_bounds
                     window_overlap = (
-                        x >= wx1-5 and
-                        elem_right <= wx2+5 and
-                        y >= wy1-5 and
-                        elem_bottom <= wy2+5
+                        x >= wx1-WINDOW_TOLERANCE and
+                        elem_right <= wx2+WINDOW_TOLERANCE and
+                        y >= wy1-WINDOW_TOLERANCE and
+                        elem_bottom <= wy2+WINDOW_TOLERANCE
                     )
                     if not window_overlap:
                         return False
@@ -276,7 +716,7 @@ class MacUITreeBuilder:
             else:
                 node.on_screen = False
 
-            node.is_interactive = self._is_interactive(element, role, actions)
+            node.is_interactive = self._is_interactive(element, role, actions, is_enabled)
             important_attrs = ['title', 'value', 'description', 'enabled','position','size']
             should_add = False
             x0,y0 = node.attributes.get('position', (0, 0))
@@ -287,53 +727,223 @@ class MacUITreeBuilder:
                 for attr in important_attrs:
                     if attr in node.attributes and node.attributes[attr] is not None:
                         should_add = True
-            if should_add:
-                if node.is_interactive and node not in ['AXGroup', 'AXImage', 'AXSplitGroup', 'AXScrollArea']:
-                    node.highlight_index = self.highlight_index
-                    self._element_cache[self.highlight_index] = node
-                    self.highlight_index += 1
-                else:
-                    node.highlight_index = None
-                    self._element_cache[f'ctx_{element_identifier}'] = node
-
-            # Process children
-            children_ref = self._get_attribute(element, kAXChildrenAttribute)
+            # Other threads number and index their nodes too
+            with self._processed_lock:
+                self.element_index.add(node)
+                if should_add:
+                    if node.is_interactive and node not in ['AXGroup', 'AXImage', 'AXSplitGroup', 'AXScrollArea']:
+                        node.highlight_index = self.highlight_index
+                        self.element_index.set_highlight(self.highlight_index, node)
+                        self.highlight_index += 1
+                    else:
+                        node.highlight_index = None
+                        self.element_index.set_context(key, node)
+
+            # Children are visited by the caller
+            children_list = []
+            children_ref = values[kAXChildrenAttribute]
             if children_ref and depth < self.max_depth:
                 try:
-                    children_count = len(list(children_ref))
-                    if children_count > self.max_children:
-                        logger.error(f"Max children limit ({self.max_children}) exceeded for element {role}. Found {children_count} children. Some elements will not be processed.")
-
                     children_list = convert_nsarray(children_ref)
-                    for child in children_list:
-                        child_node = await self._process_element(child, pid, node, depth + 1)
-                        if child_node:
-                            node.children.append(child_node)
+                    if len(children_list) > self.max_children:
+                        logger.error(f"Max children limit ({self.max_children}) exceeded for element {role}. Found {len(children_list)} children, only the first {self.max_children} are processed.")
+                        self._truncated(len(children_list) - self.max_children)
+                        children_list = children_list[:self.max_children]
                 except Exception as e:
                     logger.warning(f"Error processing children: {e}")
+                    children_list = []
             elif children_ref and depth >= self.max_depth:
                 logger.error(f"Max depth limit ({self.max_depth}) reached for element {role}. Children at depth {depth} will not be processed.")
 
-            return node
+            with self._processed_lock:
+                self.crawl_stats.emitted += 1
+            return node, children_list
 
         except Exception as e:
             logger.error(f'Error processing element: {str(e)}')
-            return None
+            return None, []
+
+    def _can_patch(self, pid: int) -> bool:
+        return (
+            self._root is not None
+            and self._window_node is not None
+            and self._root.app_pid == pid
+            and self._builds_since_full < self.full_rebuild_every
+        )
+
+    async def _apply_changes(self, changes: List[AXChange]) -> bool:
+        """
+        Patch the current tree for `changes`: re-read the attributes of elements whose value
+        changed, and re-crawl only the subtrees whose children changed. Returns False, without
+        touching the tree, when only a full crawl will do (window changes, unknown elements).
+        """
+        refresh: Dict[int, MacElementNode] = {}
+        rebuild: Dict[int, MacElementNode] = {}
+        for change in changes:
+            if change.kind == 'window':
+                return False
+            node = self._nodes.get(change.element)
+            if change.kind == 'value':
+                # Elements outside the tree (filtered out or never crawled) do not matter
+                if node is not None:
+                    refresh[id(node)] = node
+                continue
+            if change.kind == 'destroyed':
+                if node is None:
+                    continue
+                target = node.parent
+            elif change.kind == 'created':
+                target = self._known_ancestor(change.element)
+            else:
+                target = node if node is not None else self._known_ancestor(change.element)
+            if target is None or target is self._root or target is self._window_node:
+                return False
+            rebuild[id(target)] = target
+            if len(refresh) + len(rebuild) > self.max_patched_nodes:
+                return False
+
+        def covered(node: MacElementNode) -> bool:
+            parent = node.parent
+            while parent is not None:
+                if id(parent) in rebuild:
+                    return True
+                parent = parent.parent
+            return False
+
+        subtrees = [node for node in rebuild.values() if not covered(node)]
+        refreshed = [node for key, node in refresh.items() if key not in rebuild and not covered(node)]
+        for node in refreshed:
+            self._refresh_node(node)
+        for node in subtrees:
+            await self._rebuild_subtree(node)
+        if changes:
+            self._reindex()
+            self._annotated_for = None
+        logger.debug(f'Patched the UI tree: {len(refreshed)} elements refreshed, {len(subtrees)} subtrees rebuilt')
+        return True
+
+    def _known_ancestor(self, element: 'AXUIElement', max_levels: int = 8) -> Optional[MacElementNode]:
+        """Closest ancestor of `element` that has a node in the current tree"""
+        for _ in range(max_levels):
+            element = self._get_attribute(element, 'AXParent')
+            if element is None:
+                return None
+            node = self._nodes.get(element)
+            if node is not None:
+                return node
+        return None
+
+    def _depth(self, node: MacElementNode) -> int:
+        """Crawl depth of a node; the window is at depth 0"""
+        depth = 0
+        parent = node.parent
+        while parent is not None and parent is not self._root:
+            depth += 1
+            parent = parent.parent
+        return depth
+
+    def _forget(self, node: MacElementNode) -> None:
+        """Drop a subtree from the element lookups so it can be crawled again"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._nodes.pop(current._element, None)
+            self._processed_elements.discard(self.ax.element_key(current._element))
+            stack.extend(current.children)
+
+    def _replace_child(self, node: MacElementNode, replacement: Optional[MacElementNode]) -> None:
+        siblings = node.parent.children
+        index = next(i for i, child in enumerate(siblings) if child is node)
+        if replacement is None:
+            del siblings[index]
+        else:
+            siblings[index] = replacement
+
+    def _refresh_node(self, node: MacElementNode) -> None:
+        """Re-read one element's attributes in place, keeping its children"""
+        self._processed_elements.discard(self.ax.element_key(node._element))
+        fresh, _ = self._build_node(node._element, node.app_pid, node.parent, self._depth(node), self._frame_of(node))
+        if fresh is None:
+            self._forget(node)
+            self._replace_child(node, None)
+            return
+        node.role = fresh.role
+        node.attributes = fresh.attributes
+        node.is_visible = fresh.is_visible
+        node.on_screen = fresh.on_screen
+        node.is_interactive = fresh.is_interactive
+        node.highlight_index = fresh.highlight_index
+        self._nodes[node._element] = node
+
+    async def _rebuild_subtree(self, node: MacElementNode) -> None:
+        self._forget(node)
+        fresh = await self._process_element(node._element, node.app_pid, node.parent, self._depth(node), self._frame_of(node))
+        self._replace_child(node, fresh)
+
+    def _frame_of(self, node: MacElementNode) -> Optional[WindowFrame]:
+        """The frame of the window `node` is in: the main window's, or in multi-window mode its own"""
+        window = node
+        while window.parent is not None and window.parent is not self._root:
+            window = window.parent
+        if window is self._window_node or window.parent is not self._root:
+            return self._frame
+        position, size = window.attributes.get('position'), window.attributes.get('size')
+        return self._window_frame(position, size) if position and size else self._frame
+
+    def _reindex(self, root: Optional[MacElementNode] = None) -> None:
+        """
+        Renumber highlight indexes in crawl order after a patch or a parallel crawl and rebuild
+        the element index. A pass over the in-memory tree, no accessibility calls.
+        """
+        previous = self.element_index
+        self.element_index = ElementIndex()
+        self.highlight_index = 0
+        stack = list(reversed((root or self._root).children))
+        while stack:
+            node = stack.pop()
+            # Sibling positions and titles along the path may have changed
+            node.invalidate_path()
+            self.element_index.add(node)
+            if node.highlight_index is not None:
+                node.highlight_index = self.highlight_index
+                self.element_index.set_highlight(self.highlight_index, node)
+                self.highlight_index += 1
+            elif node._element is not None:
+                key = self.ax.element_key(node._element)
+                if previous.has_context(key):
+                    self.element_index.set_context(key, node)
+            stack.extend(reversed(node.children))
+
+    def _app_terminated(self, pid: int) -> None:
+        """ProcessMonitor callback: drop everything held for an app that quit"""
+        if pid == self._current_app_pid:
+            logger.error(f"Process with PID {pid} is no longer running")
+            self.cleanup()
 
     def cleanup(self):
         """Cleanup observers and release resources"""
-        # Clear the element cache to prevent holding on to stale references
-        self._element_cache.clear()
+        # Clear the element index to prevent holding on to stale references
+        self.element_index.clear()
+        self._window_cache.clear()
+        self._spatial_index = None
+        self._path_index = None
         # Clear processed elements set
         self._processed_elements.clear()
         # Reset highlight index
         self.highlight_index = 0
         # Reset current app PID
         self._current_app_pid = None
+        self._root = None
+        self._window_node = None
+        self._nodes.clear()
+        self._annotated_for = None
+        self._annotated_screenshot = None
+        if self._observed_pid is not None:
+            self.notifications.unwatch(self._observed_pid)
+            self._observed_pid = None
 
-        # Force garbage collection to release any Objective-C references
-        import gc
-        gc.collect()
+        # Nodes only hold weak references to their parents, so dropping the root frees the
+        # tree and its AX element references without a garbage collection pass
 
         # Log the cleanup
         logger.debug("MacUITreeBuilder cleanup completed: all references released")
@@ -341,167 +951,226 @@ class MacUITreeBuilder:
     def reset_state(self):
         """Reset the state between major steps"""
         self.highlight_index = 0  # Reset index
-        self._element_cache.clear()  # Clear cache
+        self.element_index.clear()  # Clear cache
+        self._window_cache.clear()
+        self._spatial_index = None
+        self._path_index = None
         self._processed_elements.clear()  # Clear processed set
+        self._nodes.clear()
+        self.require_full_rebuild()
 
         # Don't reset _current_app_pid here as it's needed for continuity between steps
 
         # Log the reset
         logger.debug("MacUITreeBuilder state reset")
 
+    def require_full_rebuild(self) -> None:
+        """
+        Make the next build crawl everything rather than patch. The controller calls this after
+        pointer actions: a scroll or drag moves elements without any notification.
+        """
+        self._builds_since_full = self.full_rebuild_every
+
     def capture_screenshot(self) -> Image.Image:
         """Capture a screenshot of the current screen"""
         try:
             logger.debug('Capturing screenshot............................................................')
-            screenshot = pyautogui.screenshot()
-            screenshot.thumbnail((screenshot.width // 2, screenshot.height // 2))
+            screenshot = self.capture_backend.capture(self._capture_window())
+            fingerprint = frame_fingerprint(screenshot)
+            # Compare against the last *changed* frame so slow drift is not hidden step by step
+            self.screen_unchanged = fingerprints_match(self._frame_fingerprint, fingerprint)
+            if not self.screen_unchanged:
+                self._frame_fingerprint = fingerprint
+            else:
+                logger.debug('Screen unchanged since the previous capture')
             self._screenshot = screenshot
             return self._screenshot
         except Exception as e:
             logger.error(f"Failed to capture screenshot: {e}")
             return None
 
-    def _convert_axvalue_to_point(self, axvalue) -> Optional[tuple]:
-        """Convert AXValue (CGPoint) to Python tuple (x, y)"""
-        if axvalue and AXValueGetType(axvalue) == 1:
-            axvalue = str(axvalue)
-            pattern = r'x:([-+]?\d+\.?\d*)\s+y:([-+]?\d+\.?\d*)'
-            match = re.search(pattern, axvalue)
-
-            if match:
-                # divide the coordinates by the screen size to normalize them
-                x = float(match.group(1)) / pyautogui.size()[0]
-                y = float(match.group(2)) / pyautogui.size()[1]
-                return (x, y)
-            else:
-                logger.debug(f'Failed to match pattern: {axvalue}')
-        return None
+    def _capture_window(self) -> Optional[tuple]:
+        """Normalized (x, y, w, h) of the app window for window-only capture"""
+        if not self.capture_window_only or not self.app_window:
+            return None
+        # Stored window geometry is inset by 10% per side like every node, undo that here
+        x, y = self.app_window['position']
+        w, h = self.app_window['size']
+        return (x - w / 8, y - h / 8, w / 0.8, h / 0.8)
 
-    def _convert_axvalue_to_size(self, axvalue) -> Optional[tuple]:
-        """Convert AXValue (CGSize) to Python tuple (width, height)"""
-        if axvalue and AXValueGetType(axvalue) == 2:
-            axvalue = str(axvalue)
-            pattern = r'w:([\d.]+)\s+h:([\d.]+)'
-            match = re.search(pattern, axvalue)
-
-            if match:
-                width = float(match.group(1)) / pyautogui.size()[0]
-                height = float(match.group(2)) / pyautogui.size()[1]
-                return (width, height)
-            else:
-                logger.debug(f'Failed to match pattern: {axvalue}')
-        return None
+    def _window_frame(self, position: tuple, size: tuple) -> WindowFrame:
+        """
+        The frame of a window with this node geometry. Its viewport is where a listed element
+        can lie: the normalized screen (only elements inside it get a highlight index) and the
+        window's node bounds widened by WINDOW_TOLERANCE, the rules is_visible applies.
+        """
+        (wx, wy), (ww, wh) = position, size
+        viewport = (
+            max(0.0, wx - WINDOW_TOLERANCE), max(0.0, wy - WINDOW_TOLERANCE),
+            min(1.0, wx + ww + WINDOW_TOLERANCE), min(1.0, wy + wh + WINDOW_TOLERANCE),
+        )
+        return WindowFrame(tuple(position), tuple(size), viewport)
+
+    def _update_viewport(self) -> None:
+        """Frame and viewport of the main window, the normalized screen until it is known"""
+        self._frame = self._window_frame(self.app_window['position'], self.app_window['size']) if self.app_window else None
+        self._viewport = self._frame.viewport if self._frame else (0.0, 0.0, 1.0, 1.0)
+
+    def _outside_viewport(self, position: Optional[tuple], size: Optional[tuple], viewport: Optional[tuple] = None) -> bool:
+        """
+        True if the element's bounds miss the viewport (by default the main window's)
+        entirely. Node geometry is the bounds inset by 10% per side, and a descendant's lies
+        inside the element's full bounds, so testing the full bounds never drops an element
+        the crawl would have listed. Elements without bounds, or with an empty size (often
+        groups whose children are laid out elsewhere), are kept.
+        """
+        if not position or not size or size[0] <= 0 or size[1] <= 0:
+            return False
+        x, y = self._normalize_point(position)
+        w, h = self._normalize_point(size)
+        vx1, vy1, vx2, vy2 = viewport or self._viewport
+        return x + w <= vx1 or x >= vx2 or y + h <= vy1 or y >= vy2
+
+    def _node_geometry(self, position: tuple, size: tuple) -> Tuple[tuple, tuple]:
+        """(position, size) as nodes store them: normalized, rounded to 3 dp, inset by 10% per side"""
+        raw_pos  = self._normalize_point(position)
+        raw_size = self._normalize_point(size)
+
+        # NEW: round each float to 3 dp before saving
+        position = tuple(round(v, 3) for v in raw_pos)     # (x, y) → (x.xxx, y.yyy)
+        size     = tuple(round(v, 3) for v in raw_size)
+        x0, y0 = position
+        w, h = size
+        x0 = x0 + 0.1*w
+        y0 = y0 + 0.1*h
+        w = w * 0.8
+        h = h * 0.8
+        return (x0, y0), (w, h)
+
+    def _normalize_point(self, point: Optional[tuple]) -> Optional[tuple]:
+        """Divide an (x, y) position or (w, h) size in screen points by the screen size"""
+        if not point:
+            return None
+        return self.geometry.normalize(*point)
 
-    def annotate_screenshot(self, root: MacElementNode) -> Optional[Image.Image]:
+    def annotate_screenshot(self, root: Optional[MacElementNode]) -> Optional[Image.Image]:
+        """Render the highlight boxes of `root` onto the current screenshot (cached per screenshot/tree)"""
         if not self._screenshot:
             logger.debug('No screenshot available to annotate.')
             return None
+        if self._annotated_for is not None:
+            screenshot, annotated_root = self._annotated_for
+            if screenshot is self._screenshot and annotated_root is root:
+                return self._annotated_screenshot
 
-        annotated = self._screenshot.copy()
-        draw = ImageDraw.Draw(annotated)
         screen_width, screen_height = self._screenshot.size
-        font_size = 16  # Increase font size for visibility
-        font = ImageFont.load_default().font_variant(size=font_size)  # [1,4](@ref)
-        color_palette = ['red', 'blue', 'green', 'yellow', 'purple']
         # Get main window boundaries
         window_bounds = None
         try:
             if self.window_count == 1:
                 wx, wy = self.app_window['position']
-                wx *= screen_width
-                wy *= screen_height
                 ww, wh = self.app_window['size']
-                ww *= screen_width
-                wh *= screen_height
-                window_bounds = (wx, wy, wx + ww, wy + wh)
-        except:
-            ww, wh = screen_width, screen_height
-            window_bounds = (0, 0, ww, wh)
+                window_bounds = (wx * screen_width, wy * screen_height,
+                                 (wx + ww) * screen_width, (wy + wh) * screen_height)
+        except Exception:
             logger.error('Error getting window bounds')
 
-        def process_element(element):
-            try:
-                if element.on_screen and element.highlight_index is not None:
-                    x, y = element.attributes['position']
-                    x *= screen_width
-                    y *= screen_height
-                    w, h = element.attributes['size']
-                    w *= screen_width
-                    h *= screen_height
-                    wx1, wy1, wx2, wy2 = window_bounds
-                    right = min(x + w, wx2)
-                    x = max(x,wx1)
-                    bottom = min(y + h, wy2)
-                    y = max(y, wy1)
-                    # Draw annotation
-                    number = int(element.highlight_index)
-                    color = color_palette[number % len(color_palette)]
-                    draw.rectangle([x, y, right, bottom], width=1, outline=color)
-
-                    text = str(number)
-                    text_bbox = draw.textbbox((0, 0), text, font=font)  # Returns (left, top, right, bottom)
-                    text_height = text_bbox[3] - text_bbox[1]
-                    draw.text((x, y), text, fill=color, font=font)
-            except Exception as e:
-                # logger.warning(f"Annotation error: {str(e)}")
-                pass
-
-            for child in element.children:
-                process_element(child)
-
         if root:
             logger.debug(f'Starting annotation from root: {root.role}')
-            process_element(root)
+            boxes, indexes = self._annotator.collect_boxes(root)
+        else:
+            boxes, indexes = np.empty((0, 4)), np.empty(0, dtype=np.int64)
+        annotated = self._annotator.render(self._screenshot, boxes, indexes, clip=window_bounds)
         self._annotated_screenshot = annotated
+        self._annotated_for = (self._screenshot, root)
         return annotated
 
+    @property
+    def annotated_screenshot(self) -> Optional[Image.Image]:
+        """The annotated version of the current screenshot, rendered on first access"""
+        return self.annotate_screenshot(self._root)
+
     def get_vision_context(self) -> dict:
         """Get both UI tree and vision information"""
-        if not self._annotated_screenshot:
+        annotated = self.annotated_screenshot
+        if not annotated:
             return None
 
         return {
-            'screenshot': self._annotated_screenshot,
-            # 'ui_tree': self._element_cache
+            'screenshot': annotated,
+            # 'ui_tree': self.element_index
         }
 
-    async def build_tree(self, pid: Optional[int] = None) -> Optional[MacElementNode]:
-        """Build UI tree for a specific application"""
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """Grid over the highlighted, on-screen elements of the current tree; built on first use after a build"""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(
+                node for _, node in self.element_index.highlighted() if node.on_screen
+            )
+        return self._spatial_index
+
+    @property
+    def path_index(self) -> Optional[PathIndex]:
+        """Accessibility path (or its path_hash) to node for the current tree; built on first use after a build"""
+        if self._path_index is None:
+            self._path_index = PathIndex(self._root) if self._root is not None else None
+        return self._path_index
+
+    def find_by_path(self, path: str) -> Optional[MacElementNode]:
+        """The current tree's node at an accessibility path remembered from an earlier step"""
+        index = self.path_index
+        return index.get(path) if index is not None else None
+
+    def _finish_build(self, mode: str) -> None:
+        if self._budget_used_up:
+            # Patching a partial tree would keep whatever the budget cut off missing
+            self._builds_since_full = self.full_rebuild_every
+        self._spatial_index = None
+        self._path_index = None
+        self.last_build_mode = mode
+        self.last_build_stats = AXCallStats(**vars(self.ax.stats))
+        self.last_crawl_stats = CrawlStats(**vars(self.crawl_stats))
+        logger.debug(f'Tree built ({mode}) with {self.last_build_stats}; {self.last_crawl_stats}')
+
+    async def build_tree(self, pid: Optional[int] = None, deadline: Optional[float] = None) -> Optional[MacElementNode]:
+        """
+        Build UI tree for a specific application. `deadline` overrides build_deadline for this
+        call: after that many seconds the tree built so far is returned, see CrawlStats.truncated.
+        """
+        deadline = deadline if deadline is not None else self.build_deadline
+        if deadline is not None or self.max_nodes is not None:
+            self._budget = CrawlBudget.starting_now(deadline, self.max_nodes)
+        self._budget_used_up = False
         try:
-            # Reset processed elements and cache before building new tree
-            self._processed_elements.clear()
-            self._element_cache.clear()
-            self.highlight_index = 0
+            self.ax.stats.reset()
+            self.crawl_stats.reset()
+            self._update_viewport()
 
             if pid is None and self._current_app_pid is None:
                 logger.debug('No app is currently open - waiting for app to be launched')
                 raise ValueError('No app is currently open')
 
             if pid is not None:
+                if self._current_app_pid is not None and pid != self._current_app_pid:
+                    self.process_monitor.unwatch(self._current_app_pid)
                 # Always update with the latest PID if provided
                 self._current_app_pid = pid
 
-            # Verify the process is still running
-            import subprocess
-            try:
-                result = subprocess.run(['ps', '-p', str(self._current_app_pid)], capture_output=True, text=True)
-                if result.returncode != 0:
-                    logger.error(f"Process with PID {self._current_app_pid} is no longer running")
-                    self._current_app_pid = None
-                    self.cleanup()
-                    return None
-            except Exception as e:
-                logger.error(f"Error checking process status: {e}")
-
-            if not self._setup_observer(self._current_app_pid):
-                logger.warning('Failed to setup accessibility observer')
+            # Verify the process is still running; an exit found here reaches _app_terminated
+            pid = self._current_app_pid
+            if not self.process_monitor.watching(pid):
+                self.process_monitor.watch(pid)
+            if not self.process_monitor.is_alive(pid):
+                if self._current_app_pid is not None:
+                    self._app_terminated(pid)
                 return None
 
             logger.debug(f'Creating AX element for pid {self._current_app_pid}')
-            app_ref = AXUIElementCreateApplication(self._current_app_pid)
+            app_ref = self.ax.application(self._current_app_pid)
 
             logger.debug('Testing accessibility permissions (Role)...')
-            error, role_attr = AXUIElementCopyAttributeValue(app_ref, kAXRoleAttribute, None)
+            error, role_attr = self.ax.copy_attribute(app_ref, kAXRoleAttribute)
             if error == kAXErrorSuccess:
                 logger.debug(f'Successfully got role attribute: ({error}, {role_attr})')
             else:
@@ -516,9 +1185,24 @@ class MacUITreeBuilder:
                     self.cleanup()
                 return None
 
+            observing = self._setup_observer(self._current_app_pid, app_ref)
+            if not observing and self.incremental:
+                logger.warning('Failed to setup accessibility observer, crawling the whole window')
+            changes = self.notifications.drain(self._current_app_pid) if observing else []
+            if observing and self._can_patch(self._current_app_pid) and await self._apply_changes(changes):
+                self._builds_since_full += 1
+                self._finish_build('incremental')
+                return self._root
+
+            # Reset processed elements and cache before building new tree
+            self._processed_elements.clear()
+            self.element_index.clear()
+            self._nodes.clear()
+            self.highlight_index = 0
+
             root = MacElementNode(
                 role='application',
-                identifier=str(app_ref),
+                identifier=None,
                 attributes={},
                 is_visible=True,
                 app_pid=self._current_app_pid,
@@ -527,12 +1211,12 @@ class MacUITreeBuilder:
             root._element = app_ref
 
             logger.debug('Trying to get the main window...')
-            error, main_window_ref = AXUIElementCopyAttributeValue(app_ref, kAXMainWindowAttribute, None)
+            error, main_window_ref = self.ax.copy_attribute(app_ref, kAXMainWindowAttribute)
             if error == '-25212':
                 return None, "Window not found"
             if error != kAXErrorSuccess or not main_window_ref:
                 logger.warning(f'Could not get main window (error: {error}), trying fallback attribute AXWindows')
-                error, windows = AXUIElementCopyAttributeValue(app_ref, kAXWindowsAttribute, None)
+                error, windows = self.ax.copy_attribute(app_ref, kAXWindowsAttribute)
                 if error == kAXErrorSuccess and windows:
                     try:
                         windows_list = list(windows)
@@ -546,11 +1230,26 @@ class MacUITreeBuilder:
                 else:
                     logger.error(f'Fallback failed: could not get AXWindows (error: {error})')
 
+            window_node = None
+            previous_window = self.app_window
             if main_window_ref:
                 logger.debug(f'Found main window: {main_window_ref}')
-                window_node = await self._process_element(main_window_ref, self._current_app_pid, root)
-                if window_node:
-                    root.children.append(window_node)
+                # Judge visibility against the window as it is now; the last build may have
+                # seen another app's window, or none at all
+                bounds = self.ax.fetch(main_window_ref, GEOMETRY_ATTRIBUTES)
+                if bounds['AXPosition'] and bounds['AXSize']:
+                    main_pos, main_size = self._node_geometry(bounds['AXPosition'], bounds['AXSize'])
+                    self.app_window = {'position': main_pos, 'size': main_size}
+                    self._update_viewport()
+                if self.multi_window:
+                    window_node = await self._crawl_windows(app_ref, main_window_ref, root)
+                else:
+                    window_node = await self._process_element(main_window_ref, self._current_app_pid, root)
+                    if window_node:
+                        root.children.append(window_node)
+                if self.crawl_workers > 1 or self._budgeted() or self.multi_window:
+                    # Workers, or the breadth-first crawl, numbered elements out of pre-order
+                    self._reindex(root)
                 # Now that we have the main window node, store its position and size in self.app_window
                 main_pos = window_node.attributes.get('position')
                 main_size = window_node.attributes.get('size')
@@ -559,10 +1258,16 @@ class MacUITreeBuilder:
                         'position': main_pos,
                         'size': main_size
                     }
-                    self.window_count = 1
+                    self.window_count = len(root.children)
             else:
                 logger.error('Could not determine a main window for the application.')
 
+            self._root = root
+            self._window_node = window_node
+            # Visibility was judged against the old window geometry, so patching this tree
+            # would keep stale on_screen flags
+            self._builds_since_full = 0 if self.app_window == previous_window else self.full_rebuild_every
+            self._finish_build('full')
             return root
 
         except Exception as e:
@@ -571,3 +1276,5 @@ class MacUITreeBuilder:
                 import traceback
                 traceback.print_exc()
             return None
+        finally:
+            self._budget = None
@@ -0,0 +1,25 @@
+from src.mac import liveness
+from src.mac.liveness import ProcessMonitor
+
+
+def test_watching_again_forgets_an_exit(monkeypatch):
+    alive = {4242: True}
+    monkeypatch.setattr(liveness, 'pid_exists', lambda pid: alive[pid])
+    monitor = ProcessMonitor(ttl=0, use_kqueue=False)
+    exits = []
+    monitor.on_terminated(exits.append)
+
+    monitor.watch(4242)
+    assert monitor.poll() == []
+    alive[4242] = False
+    assert monitor.poll() == [4242]
+    assert not monitor.is_alive(4242)
+    assert exits == [4242]
+
+    # The pid is reused by a new process
+    alive[4242] = True
+    monitor.watch(4242)
+    assert monitor.is_alive(4242)
+    alive[4242] = False
+    assert monitor.poll() == [4242]
+    assert exits == [4242, 4242]
@@ -0,0 +1,15 @@
+from src.agent.prompts import AgentMessagePrompt
+
+
+def test_user_message_keeps_image_detail():
+    state_content = [
+        {'type': 'text', 'content': 'state'},
+        {'type': 'image_url', 'image_url': {'url': 'data:image/png;base64,AAAA', 'detail': 'low'}},
+        {'type': 'image_url', 'image_url': {'url': 'data:image/png;base64,BBBB'}},
+    ]
+    message = AgentMessagePrompt(state_content).get_user_message()
+    images = [item['image_url'] for item in message.content if item['type'] == 'image_url']
+    assert images == [
+        {'url': 'data:image/png;base64,AAAA', 'detail': 'low'},
+        {'url': 'data:image/png;base64,BBBB'},
+    ]
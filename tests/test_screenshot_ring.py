@@ -0,0 +1,15 @@
+from PIL import Image
+
+from src.agent.screenshot_ring import ScreenshotRing
+
+
+def test_unchanged_step_keeps_its_own_frame_counted():
+    ring = ScreenshotRing()
+    ring.add(1, Image.new('RGB', (64, 48), 'red'))
+    counted = ring.nbytes
+    frame = ring.add_unchanged(1)
+    assert not frame.shared
+    assert ring.nbytes == counted
+    ring.add_unchanged(2)
+    assert ring.nbytes == counted
+    assert len(ring) == 2
@@ -0,0 +1,33 @@
+from src.mac.element import MacElementNode
+from src.mac.snapshot import diff_trees
+
+
+def window(titles):
+    root = MacElementNode('AXApplication', None, {}, True, 1, True)
+    main = MacElementNode('AXWindow', None, {'title': 'Main'}, True, 1, True, parent=root)
+    root.children.append(main)
+    for index, title in enumerate(titles, start=1):
+        button = MacElementNode('AXButton', None, {'title': title}, True, 1, True, parent=main,
+                                is_interactive=True, highlight_index=index)
+        main.children.append(button)
+    return root
+
+
+def test_insertion_near_the_top_is_one_addition():
+    old = window(['Open', 'Save', 'Close'])
+    new = window(['New', 'Open', 'Save', 'Close'])
+    diff = diff_trees(old, new)
+    assert [node.attributes['title'] for node in diff.added] == ['New']
+    assert diff.removed == []
+    assert diff.changed == []
+    assert [(a.highlight_index, b.highlight_index) for a, b in diff.renumbered] == [(1, 2), (2, 3), (3, 4)]
+    assert str(diff) == '1 added, 0 removed, 0 changed, 3 renumbered'
+
+
+def test_renumbering_alone_is_an_empty_diff():
+    old = window(['Open', 'Save'])
+    new = window(['Open', 'Save'])
+    new.children[0].children[0].highlight_index = 5
+    diff = diff_trees(old, new)
+    assert not diff
+    assert len(diff.renumbered) == 1